@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'drf_spectacular',
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,16 +82,60 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# core.db adds health checks, pooling and pgbouncer support to Django's
+# PostgreSQL backend; see core/db/base.py for the extra keys.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds to keep a connection between requests; pooled
+        # connections go back to the pool after every request instead
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        # Set when DB_HOST is pgbouncer with pool_mode = transaction
+        'TRANSACTION_POOLING': os.environ.get('DB_TRANSACTION_POOLING', '0') == '1',
+        'POOL': {
+            'max_size': DB_POOL_SIZE,
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_age': int(os.environ.get('DB_POOL_MAX_AGE', 600)),
+        } if DB_POOL_SIZE else None,
     }
 }
 
+# DB_ENGINE=sqlite runs tests and benchmarks without PostgreSQL; search
+# falls back to substring matching there
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+    }
+
+# Read replicas as host[:port], comma separated; they share the primary's
+# name and credentials. Safe requests to the recipe and user views read
+# from them (core/db/router.py), except for a user who just wrote; that
+# flag is cached, so REDIS_URL is required to share it between workers.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        PORT=port or DATABASES['default']['PORT'],
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db.router.ReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+DATABASE_REPLICA_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -110,6 +156,30 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing; see user/hashers.py. Costs below are Django's defaults.
+PASSWORD_HASHER_CLASSES = {
+    'argon2': 'user.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'user.hashers.TunedBCryptSHA256PasswordHasher',
+    'pbkdf2': 'user.hashers.TunedPBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+# The first entry hashes new passwords, the rest verify existing ones
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+]
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 260000))
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 102400))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 8))
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+
+# 'asgi' runs read-heavy and password hashing views in their own thread
+# pools instead of Django's single thread for sync code (core/async_views.py)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+API_READ_WORKERS = int(os.environ.get('API_READ_WORKERS', 16))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -133,6 +203,22 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Recipe image uploads and the renditions generated from them
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024))
+RECIPE_IMAGE_UPLOAD_FORMATS = ['JPEG', 'PNG', 'WEBP', 'GIF']
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': (320, 320),
+    'medium': (1024, 1024),
+}
+RECIPE_IMAGE_RENDITION_FORMATS = ['webp', 'jpeg']
+RECIPE_IMAGE_QUALITY = 82
+RECIPE_IMAGE_PROCESSING = os.environ.get('RECIPE_IMAGE_PROCESSING', 'thread')
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+# Resumable uploads are assembled here, outside MEDIA_ROOT, until finalized
+RECIPE_UPLOAD_DIR = os.environ.get('RECIPE_UPLOAD_DIR', '/vol/web/uploads')
+RECIPE_UPLOAD_EXPIRY = int(os.environ.get('RECIPE_UPLOAD_EXPIRY', 24 * 60 * 60))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -140,11 +226,69 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipe-api',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+        },
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+RECIPE_CACHE_ENABLED = os.environ.get('RECIPE_CACHE_ENABLED', '1') == '1'
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
+# JSON renderer and parser for the API, see core/fastjson.py: 'orjson'
+# (falls back to the standard library when orjson isn't installed) or
+# 'stdlib' for DRF's own classes
+API_JSON_CLASSES = {
+  'orjson': ('core.fastjson.FastJSONRenderer', 'core.fastjson.FastJSONParser'),
+  'stdlib': ('rest_framework.renderers.JSONRenderer', 'rest_framework.parsers.JSONParser'),
+}
+API_JSON = os.environ.get('API_JSON', 'orjson')
+API_JSON_RENDERER, API_JSON_PARSER = API_JSON_CLASSES[API_JSON]
+
 REST_FRAMEWORK = {
   'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-  'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+  'DEFAULT_RENDERER_CLASSES': (
+    API_JSON_RENDERER,
+    'rest_framework.renderers.BrowsableAPIRenderer',
+  ),
+  'DEFAULT_PARSER_CLASSES': (
+    API_JSON_PARSER,
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
+  ),
+  'DEFAULT_AUTHENTICATION_CLASSES': ('user.authentication.TokenUserAuthentication',),
+  'DEFAULT_THROTTLE_CLASSES': (
+    'core.throttling.AnonBucketThrottle',
+    'core.throttling.UserBucketThrottle',
+  ),
+  'DEFAULT_THROTTLE_RATES': {
+    'anon': os.environ.get('THROTTLE_RATE_ANON', '60/min'),
+    'user': os.environ.get('THROTTLE_RATE_USER', '600/min'),
+    'auth': os.environ.get('THROTTLE_RATE_AUTH', '10/min'),
+  },
+  'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if os.environ.get('NUM_PROXIES') else None,
 }
 
+# Token-bucket state lives in this cache; use Redis to share it between
+# workers. The test runner switches throttling off (core/test_runner.py).
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1') == '1'
+THROTTLE_CACHE_ALIAS = 'default'
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
@@ -152,6 +296,33 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': False,
 }
 
+# Build request.user from access token claims instead of a User query;
+# active status is cached per process for USER_ACTIVE_CACHE_TTL seconds
+JWT_TOKEN_USER_MODE = os.environ.get('JWT_TOKEN_USER_MODE', '1') == '1'
+USER_ACTIVE_CACHE_TTL = int(os.environ.get('USER_ACTIVE_CACHE_TTL', 30))
+USER_ACTIVE_CACHE_SIZE = 10000
+# Validated access tokens kept per process; 0 disables the cache
+JWT_VALIDATION_CACHE_SIZE = int(os.environ.get('JWT_VALIDATION_CACHE_SIZE', 4096))
+
+# Per-route request metrics served at /api/metrics/ (core/metrics.py).
+# Only staff users and scrapers sending "Authorization: Bearer
+# <METRICS_TOKEN>" may read them. METRICS_PUBLIC=1 serves them to anyone;
+# set it only where the endpoint is unreachable from outside.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC', '0') == '1'
+# Log requests slower than this many seconds with their SQL; unset disables
+METRICS_SLOW_REQUEST_SECONDS = (
+  float(os.environ['METRICS_SLOW_REQUEST_SECONDS'])
+  if os.environ.get('METRICS_SLOW_REQUEST_SECONDS') else None
+)
+
 SPECTACULAR_SETTINGS = {
   'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+
+RECIPE_IMPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_IMPORT_CHUNK_SIZE', 500))
+RECIPE_EXPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 1000))
+
+# Render lists of recipes, tags and ingredients with FastListSerializer
+RECIPE_FAST_SERIALIZATION = os.environ.get('RECIPE_FAST_SERIALIZATION', '1') == '1'
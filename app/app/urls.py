@@ -21,6 +21,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from core.views import DatabaseMetricsView, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,6 +29,8 @@ urlpatterns = [
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),   
+    path('api/metrics/', metrics_view, name='metrics'),
+    path('api/metrics/db/', DatabaseMetricsView.as_view(), name='db-metrics'),
 ]
 
 if settings.DEBUG:
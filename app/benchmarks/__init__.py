@@ -0,0 +1,29 @@
+'''
+Microbenchmarks for hot paths of the API.
+
+They are not picked up by the default test run; run them explicitly:
+
+    python manage.py test benchmarks -p "bench_*.py"
+
+Each benchmark prints its timings and asserts only the coarse
+relationship it exists to demonstrate, so it stays stable on slow CI.
+'''
+import time
+
+
+def measure(func, number=1000, repeat=5):
+  '''Return the best per-call time of func in seconds'''
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for _ in range(number):
+      func()
+    best = min(best, (time.perf_counter() - start) / number)
+  return best
+
+
+def report(name, **timings):
+  parts = ', '.join(
+    f'{label} {seconds * 1e6:.1f}us' for label, seconds in timings.items()
+  )
+  print(f'\n[bench] {name}: {parts}')
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from benchmarks import measure, report
+from user.authentication import (
+  TokenUserAuthentication,
+  active_users,
+  validated_tokens,
+)
+from user.serializers import TokenObtainPairSerializer
+
+
+class AuthenticationBenchmark(TestCase):
+  def setUp(self):
+    active_users.clear()
+    validated_tokens.clear()
+    user = get_user_model().objects.create_user(
+      'bench@example.com', 'test1234'
+    )
+    token = TokenObtainPairSerializer.get_token(user).access_token
+    self.request = APIRequestFactory().get(
+      '/', HTTP_AUTHORIZATION=f'Bearer {token}'
+    )
+
+  def test_cached_validation_is_cheaper(self):
+    cached = TokenUserAuthentication()
+    uncached = JWTAuthentication()
+
+    model_user = measure(
+      lambda: uncached.authenticate(self.request), number=200
+    )
+    max_size, validated_tokens.max_size = validated_tokens.max_size, 0
+    try:
+      token_user = measure(lambda: cached.authenticate(self.request))
+    finally:
+      validated_tokens.max_size = max_size
+    validated_tokens.clear()
+    cached_token_user = measure(lambda: cached.authenticate(self.request))
+
+    report(
+      'authenticate',
+      jwt_with_user_query=model_user,
+      token_user=token_user,
+      token_user_cached=cached_token_user,
+    )
+    print(f'[bench] validation cache: {validated_tokens.stats()}')
+    self.assertLess(cached_token_user, token_user)
+    self.assertLess(token_user, model_user)
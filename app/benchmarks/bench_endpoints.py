@@ -0,0 +1,457 @@
+'''
+Query count, wall time and peak memory of every API route.
+
+Each dataset seeds one user with the given numbers of recipes, tags and
+ingredients, then calls every route in recipe.urls and user.urls. Every
+call runs in a transaction that is rolled back, so each one sees the
+same data. Requests authenticate with a real access token in the
+Authorization header; the JWT caches are emptied before the counted
+call, so its queries include the cold authentication path. Results
+are compared against endpoints_baseline.json, kept
+per database vendor, and the benchmark fails when a route:
+
+  * runs more queries than its baseline,
+  * allocates more than 1.5x its baseline peak memory (plus 64KB),
+  * or takes more than BENCH_TIME_TOLERANCE times its baseline time
+    (default 3, and never for less than 5ms of difference).
+
+Environment:
+
+  BENCH_DATASETS         comma separated; N seeds N recipes, tags and
+                         ingredients, R:T:I sets each (default 1,100).
+                         Anything from 1 to 100000 works.
+  BENCH_REPEAT           timed runs per route; the best counts (3)
+  BENCH_UPDATE_BASELINE  1 to record the results as the new baseline
+
+    DB_ENGINE=sqlite python manage.py test benchmarks -p bench_endpoints.py
+'''
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.uploads import create_upload
+from recipe.urls import router
+from user import urls as user_urls
+from user.authentication import active_users, validated_tokens
+
+BASELINE_PATH = Path(__file__).with_name('endpoints_baseline.json')
+SEED_BATCH_SIZE = 5000
+TAGS_PER_RECIPE = 3
+INGREDIENTS_PER_RECIPE = 5
+PASSWORD = 'benchpass123'
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+def parse_datasets(value):
+  datasets = []
+  for spec in filter(None, (part.strip() for part in value.split(','))):
+    counts = [int(n) for n in spec.split(':')]
+    recipes, tags, ingredients = counts if len(counts) == 3 else counts * 3
+    datasets.append((recipes, tags, ingredients))
+  return datasets
+
+
+def dataset_label(recipes, tags, ingredients):
+  return f'recipes={recipes} tags={tags} ingredients={ingredients}'
+
+
+def api_routes():
+  '''Every (route name, method) served by recipe.urls and user.urls'''
+  routes = set()
+  for namespace, patterns in (
+    ('recipe', router.urls), ('user', user_urls.urlpatterns)
+  ):
+    for pattern in patterns:
+      actions = getattr(pattern.callback, 'actions', None)
+      if actions is None:
+        view = pattern.callback.cls
+        actions = {
+          method: method for method in HTTP_METHODS if hasattr(view, method)
+        }
+      routes.update(
+        (f'{namespace}:{pattern.name}', method.upper())
+        for method in actions if method in HTTP_METHODS
+      )
+  return routes
+
+
+def batched(iterable, size):
+  iterator = iter(iterable)
+  while batch := list(islice(iterator, size)):
+    yield batch
+
+
+def seed(user, recipes, tags, ingredients):
+  '''Bulk insert the dataset for user; signals are skipped on purpose'''
+  for model, count in ((Tag, tags), (Ingredient, ingredients)):
+    prefix = model.__name__.lower()
+    objs = (model(user=user, name=f'{prefix} {i}') for i in range(count))
+    for batch in batched(objs, SEED_BATCH_SIZE):
+      model.objects.bulk_create(batch)
+  objs = (
+    Recipe(
+      user=user,
+      title=f'Recipe {i}',
+      time_minutes=5 + i % 120,
+      price=f'{1 + i % 50}.00',
+    )
+    for i in range(recipes)
+  )
+  for batch in batched(objs, SEED_BATCH_SIZE):
+    Recipe.objects.bulk_create(batch)
+
+  recipe_ids = list(
+    Recipe.objects.filter(user=user).values_list('id', flat=True)
+  )
+  for field, model, per_recipe in (
+    ('tags', Tag, TAGS_PER_RECIPE),
+    ('ingredients', Ingredient, INGREDIENTS_PER_RECIPE),
+  ):
+    related_ids = list(
+      model.objects.filter(user=user).values_list('id', flat=True)
+    )
+    if not related_ids:
+      continue
+    through = getattr(Recipe, field).through
+    column = f'{model.__name__.lower()}_id'
+    links = (
+      through(
+        recipe_id=recipe_id,
+        **{column: related_ids[(n + k) % len(related_ids)]},
+      )
+      for n, recipe_id in enumerate(recipe_ids)
+      for k in range(min(per_recipe, len(related_ids)))
+    )
+    for batch in batched(links, SEED_BATCH_SIZE):
+      through.objects.bulk_create(batch)
+
+
+def image_bytes():
+  buffer = BytesIO()
+  Image.new('RGB', (64, 48), color=(200, 120, 40)).save(buffer, format='PNG')
+  return buffer.getvalue()
+
+
+def recipe_payload(ctx):
+  return {
+    'title': 'Benchmark curry',
+    'time_minutes': 30,
+    'price': '7.50',
+    'tags': [{'name': 'tag 0'}, {'name': 'Benchmark'}],
+    'ingredients': [{'name': 'ingredient 0'}, {'name': 'Rice'}],
+  }
+
+
+def bulk_body(ctx):
+  rows = [dict(recipe_payload(ctx), title=f'Bulk {i}') for i in range(10)]
+  return '\n'.join(json.dumps(row) for row in rows)
+
+
+def new_upload(ctx, complete=False):
+  data = ctx['image']
+  recipe = Recipe.objects.get(pk=ctx['recipe'])
+  upload = create_upload(recipe, 'bench.png', len(data))
+  if complete:
+    with open(upload.path, 'wb') as part:
+      part.write(data)
+    upload.offset = len(data)
+    upload.save(update_fields=['offset'])
+  return upload.pk
+
+
+def recipe_url(name, *args):
+  return reverse(f'recipe:{name}', args=args)
+
+
+# (route, method) -> prepare(ctx), returning the request to time. Prepare
+# runs inside the rolled back transaction but outside the measurement.
+REQUESTS = {
+  ('recipe:api-root', 'GET'): lambda ctx: {'path': reverse('recipe:api-root')},
+  ('recipe:recipe-list', 'GET'): lambda ctx: {
+    'path': recipe_url('recipe-list'),
+  },
+  ('recipe:recipe-list', 'POST'): lambda ctx: {
+    'path': recipe_url('recipe-list'),
+    'data': recipe_payload(ctx),
+    'format': 'json',
+  },
+  ('recipe:recipe-bulk', 'POST'): lambda ctx: {
+    'path': recipe_url('recipe-bulk'), 'data': bulk_body(ctx),
+    'content_type': 'application/x-ndjson',
+  },
+  ('recipe:recipe-export', 'GET'): lambda ctx: {
+    'path': recipe_url('recipe-export'),
+  },
+  ('recipe:recipe-detail', 'GET'): lambda ctx: {
+    'path': recipe_url('recipe-detail', ctx['recipe']),
+  },
+  ('recipe:recipe-detail', 'PUT'): lambda ctx: {
+    'path': recipe_url('recipe-detail', ctx['recipe']),
+    'data': recipe_payload(ctx),
+    'format': 'json',
+  },
+  ('recipe:recipe-detail', 'PATCH'): lambda ctx: {
+    'path': recipe_url('recipe-detail', ctx['recipe']),
+    'data': {'title': 'Renamed'},
+    'format': 'json',
+  },
+  ('recipe:recipe-detail', 'DELETE'): lambda ctx: {
+    'path': recipe_url('recipe-detail', ctx['recipe']),
+  },
+  ('recipe:recipe-upload-image', 'POST'): lambda ctx: {
+    'path': recipe_url('recipe-upload-image', ctx['recipe']),
+    'data': {'images': SimpleUploadedFile('bench.png', ctx['image'])},
+    'format': 'multipart',
+  },
+  ('recipe:recipe-start-upload', 'POST'): lambda ctx: {
+    'path': recipe_url('recipe-start-upload', ctx['recipe']),
+    'data': {'filename': 'bench.png', 'size': len(ctx['image'])},
+    'format': 'json',
+  },
+  ('recipe:recipe-upload-chunk', 'GET'): lambda ctx: {
+    'path': recipe_url('recipe-upload-chunk', ctx['recipe'], new_upload(ctx)),
+  },
+  ('recipe:recipe-upload-chunk', 'PUT'): lambda ctx: {
+    'path': recipe_url('recipe-upload-chunk', ctx['recipe'], new_upload(ctx)),
+    'data': ctx['image'], 'content_type': 'application/offset+octet-stream',
+    'HTTP_UPLOAD_OFFSET': '0',
+  },
+  ('recipe:recipe-finish-upload', 'POST'): lambda ctx: {
+    'path': recipe_url(
+      'recipe-finish-upload', ctx['recipe'], new_upload(ctx, complete=True)
+    ),
+  },
+  ('user:create', 'POST'): lambda ctx: {
+    'path': reverse('user:create'),
+    'data': {
+      'email': 'new@example.com',
+      'name': 'New',
+      'password': PASSWORD,
+      'password2': PASSWORD,
+    },
+    'authenticated': False,
+  },
+  ('user:token_obtain_pair', 'POST'): lambda ctx: {
+    'path': reverse('user:token_obtain_pair'),
+    'data': {'email': ctx['user'].email, 'password': PASSWORD},
+    'authenticated': False,
+  },
+  ('user:token_refresh', 'POST'): lambda ctx: {
+    'path': reverse('user:token_refresh'), 'data': {'refresh': ctx['refresh']},
+    'authenticated': False,
+  },
+  ('user:me', 'GET'): lambda ctx: {'path': reverse('user:me')},
+  ('user:me', 'PUT'): lambda ctx: {
+    'path': reverse('user:me'),
+    'data': {
+      'email': ctx['user'].email,
+      'name': 'Renamed',
+      'password': PASSWORD,
+      'password2': PASSWORD,
+    },
+  },
+  ('user:me', 'PATCH'): lambda ctx: {
+    'path': reverse('user:me'), 'data': {'name': 'Renamed'},
+  },
+}
+
+for _name, _key in (('tag', 'tag'), ('ingredient', 'ingredient')):
+  REQUESTS[(f'recipe:{_name}-list', 'GET')] = (
+    lambda ctx, name=_name: {'path': recipe_url(f'{name}-list')}
+  )
+  for _method, _data in (
+    ('PUT', {'name': 'Renamed'}),
+    ('PATCH', {'name': 'Renamed'}),
+    ('DELETE', None),
+  ):
+    REQUESTS[(f'recipe:{_name}-detail', _method)] = (
+      lambda ctx, name=_name, key=_key, data=_data: {
+        'path': recipe_url(f'{name}-detail', ctx[key]),
+        'data': data,
+        'format': 'json',
+      }
+    )
+
+
+class Sample:
+  def __init__(self):
+    self.queries = None
+    self.seconds = float('inf')
+    self.peak_kb = 0.0
+
+  def as_dict(self):
+    return {
+      'queries': self.queries,
+      'seconds': round(self.seconds, 6),
+      'peak_kb': round(self.peak_kb, 1),
+    }
+
+
+def regressions(current, baseline, time_tolerance):
+  '''Describe how current is worse than baseline, if it is'''
+  problems = []
+  if current['queries'] > baseline['queries']:
+    problems.append(f'queries {baseline["queries"]} -> {current["queries"]}')
+  if current['peak_kb'] > baseline['peak_kb'] * 1.5 + 64:
+    problems.append(
+      f'peak memory {baseline["peak_kb"]:.0f}KB -> '
+      f'{current["peak_kb"]:.0f}KB'
+    )
+  if (
+    current['seconds'] > baseline['seconds'] * time_tolerance
+    and current['seconds'] - baseline['seconds'] > 0.005
+  ):
+    problems.append(
+      f'time {baseline["seconds"] * 1000:.1f}ms -> '
+      f'{current["seconds"] * 1000:.1f}ms'
+    )
+  return problems
+
+
+@override_settings(
+  RECIPE_CACHE_ENABLED=False,
+  RECIPE_IMAGE_PROCESSING='sync',
+  # Hashing cost is measured by bench_login; keep it out of query timings
+  PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class EndpointBenchmark(TestCase):
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+    paths = override_settings(
+      MEDIA_ROOT=self.media_root,
+      RECIPE_UPLOAD_DIR=os.path.join(self.media_root, 'uploads'),
+    )
+    paths.enable()
+    self.addCleanup(paths.disable)
+    self.datasets = parse_datasets(os.environ.get('BENCH_DATASETS', '1,100'))
+    self.repeat = int(os.environ.get('BENCH_REPEAT', 3))
+    self.time_tolerance = float(os.environ.get('BENCH_TIME_TOLERANCE', 3))
+    self.update_baseline = os.environ.get('BENCH_UPDATE_BASELINE') == '1'
+
+  def test_every_route_has_a_benchmark(self):
+    missing = api_routes() - set(REQUESTS)
+    self.assertFalse(
+      missing, f'add these routes to REQUESTS: {sorted(missing)}'
+    )
+
+  def test_endpoints_against_baseline(self):
+    results = {}
+    for index, counts in enumerate(self.datasets):
+      with transaction.atomic():
+        results[dataset_label(*counts)] = self.run_dataset(index, *counts)
+        transaction.set_rollback(True)
+
+    baseline = {}
+    if BASELINE_PATH.exists():
+      baseline = json.loads(BASELINE_PATH.read_text())
+    if self.update_baseline:
+      baseline.setdefault(connection.vendor, {}).update(results)
+      BASELINE_PATH.write_text(
+        json.dumps(baseline, indent=2, sort_keys=True) + '\n'
+      )
+      print(f'\n[bench] wrote {connection.vendor} baseline to {BASELINE_PATH}')
+      return
+
+    expected = baseline.get(connection.vendor, {})
+    failures = []
+    for label, routes in results.items():
+      if label not in expected:
+        print(
+          f'\n[bench] no {connection.vendor} baseline for {label}; '
+          'set BENCH_UPDATE_BASELINE=1 to record one'
+        )
+        continue
+      for route, current in routes.items():
+        if route in expected[label]:
+          problems = regressions(
+            current, expected[label][route], self.time_tolerance
+          )
+          failures.extend(
+            f'{label} {route}: {problem}' for problem in problems
+          )
+    self.assertFalse(failures, 'regressions:\n' + '\n'.join(failures))
+
+  def run_dataset(self, index, recipes, tags, ingredients):
+    start = time.perf_counter()
+    user = get_user_model().objects.create_user(
+      f'bench{index}@example.com', PASSWORD
+    )
+    seed(user, recipes, tags, ingredients)
+    ctx = {
+      'user': user,
+      'refresh': str(RefreshToken.for_user(user)),
+      'access': str(RefreshToken.for_user(user).access_token),
+      'recipe': Recipe.objects.filter(user=user).latest('id').id,
+      'tag': Tag.objects.filter(user=user).latest('id').id,
+      'ingredient': Ingredient.objects.filter(user=user).latest('id').id,
+      'image': image_bytes(),
+    }
+    print(
+      f'\n[bench] {dataset_label(recipes, tags, ingredients)} seeded in '
+      f'{time.perf_counter() - start:.1f}s'
+    )
+
+    samples = {}
+    for (route, method), prepare in sorted(REQUESTS.items()):
+      samples[f'{route} {method}'] = self.measure(ctx, method, prepare)
+
+    print(f'[bench] {"route":<40}{"queries":>8}{"ms":>10}{"peak KB":>10}')
+    for name, sample in samples.items():
+      print(
+        f'[bench] {name:<40}{sample.queries:>8}'
+        f'{sample.seconds * 1000:>10.2f}{sample.peak_kb:>10.1f}'
+      )
+    return {name: sample.as_dict() for name, sample in samples.items()}
+
+  def measure(self, ctx, method, prepare):
+    sample = Sample()
+    for run in range(self.repeat + 1):
+      with transaction.atomic():
+        request = dict(prepare(ctx))
+        client = APIClient()
+        if request.pop('authenticated', True):
+          client.credentials(HTTP_AUTHORIZATION=f'Bearer {ctx["access"]}')
+        call = getattr(client, method.lower())
+        if run == 0:
+          active_users.clear()
+          validated_tokens.clear()
+          # Untimed: count queries and trace allocations
+          tracemalloc.start()
+          try:
+            with CaptureQueriesContext(connection) as queries:
+              self.consume(call(**request))
+            sample.peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+          finally:
+            tracemalloc.stop()
+          sample.queries = len(queries)
+        else:
+          start = time.perf_counter()
+          self.consume(call(**request))
+          sample.seconds = min(sample.seconds, time.perf_counter() - start)
+        transaction.set_rollback(True)
+    return sample
+
+  def consume(self, response):
+    self.assertLess(
+      response.status_code, 400, getattr(response, 'data', response)
+    )
+    if response.streaming:
+      b''.join(response.streaming_content)
@@ -0,0 +1,106 @@
+import json
+import os
+from io import BytesIO
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks import measure
+from core import fastjson
+from core.fastjson import FastJSONParser, FastJSONRenderer
+
+
+def recipe(i):
+  '''One recipe as RecipeDetailSerializer renders it'''
+  return {
+    'id': i,
+    'title': f'Recipe {i} with crème fraîche',
+    'time_minutes': 5 + i % 90,
+    'price': f'{4 + i % 20}.25',
+    'link': f'https://example.com/recipes/{i}',
+    'tags': [{'id': i % 7 + n, 'name': f'Tag {i % 7 + n}'} for n in range(3)],
+    'ingredients': [
+      {'id': i % 11 + n, 'name': f'Ingredient {i % 11 + n}'} for n in range(5)
+    ],
+    'renditions': [
+      {'name': 'thumb', 'format': 'webp', 'width': 320, 'height': 240,
+       'url': f'http://testserver/media/renditions/{i}/thumb.webp'},
+    ],
+    'description': 'Whisk, fold and bake until golden. ' * 4,
+    'images': f'http://testserver/media/uploads/recipe/{i}.png',
+  }
+
+
+def import_row(i):
+  '''One row of a bulk import body'''
+  return {
+    'title': f'Imported {i}',
+    'time_minutes': 10 + i % 50,
+    'price': 7.5 + i % 10,
+    'tags': [{'name': 'Vegan'}, {'name': f'Batch {i % 20}'}],
+    'ingredients': [
+      {'name': 'Rice'}, {'name': 'Salt'}, {'name': f'Spice {i % 9}'}
+    ],
+  }
+
+
+@skipIf(fastjson.orjson is None, 'orjson is not installed')
+class JSONBenchmark(SimpleTestCase):
+  '''DRF's stdlib JSON classes against core.fastjson
+
+  BENCH_OBJECTS sets the number of recipes and import rows (1000).
+  '''
+
+  def setUp(self):
+    self.count = int(os.environ.get('BENCH_OBJECTS', 1000))
+
+  def report(self, name, unit, stdlib, fast):
+    print(
+      f'\n[bench] {name} x{self.count}: '
+      f'stdlib {self.count / stdlib:,.0f} {unit}/s, '
+      f'orjson {self.count / fast:,.0f} {unit}/s ({stdlib / fast:.1f}x)'
+    )
+
+  def test_render_recipe_list(self):
+    data = {
+      'next': None,
+      'previous': None,
+      'results': [recipe(i) for i in range(self.count)],
+    }
+    stdlib, fast = JSONRenderer(), FastJSONRenderer()
+    self.assertEqual(fast.render(data), stdlib.render(data))
+
+    stdlib_time = measure(lambda: stdlib.render(data), number=3, repeat=3)
+    fast_time = measure(lambda: fast.render(data), number=3, repeat=3)
+    self.report('render recipe list', 'recipes', stdlib_time, fast_time)
+    self.assertLess(fast_time, stdlib_time)
+
+  def test_parse_bulk_import_array(self):
+    body = json.dumps([import_row(i) for i in range(self.count)]).encode()
+    stdlib, fast = JSONParser(), FastJSONParser()
+    self.assertEqual(fast.parse(BytesIO(body)), stdlib.parse(BytesIO(body)))
+
+    stdlib_time = measure(
+      lambda: stdlib.parse(BytesIO(body)), number=3, repeat=3
+    )
+    fast_time = measure(lambda: fast.parse(BytesIO(body)), number=3, repeat=3)
+    self.report('parse JSON array body', 'rows', stdlib_time, fast_time)
+    self.assertLess(fast_time, stdlib_time)
+
+  def test_decode_bulk_import_ndjson(self):
+    lines = [json.dumps(import_row(i)) for i in range(self.count)]
+    self.assertEqual(
+      [fastjson.loads(line) for line in lines],
+      [json.loads(line) for line in lines],
+    )
+
+    stdlib_time = measure(
+      lambda: [json.loads(line) for line in lines], number=3, repeat=3
+    )
+    fast_time = measure(
+      lambda: [fastjson.loads(line) for line in lines], number=3, repeat=3
+    )
+    self.report('decode NDJSON rows', 'rows', stdlib_time, fast_time)
+    self.assertLess(fast_time, stdlib_time)
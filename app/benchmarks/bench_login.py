@@ -0,0 +1,57 @@
+import importlib.util
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks import measure
+
+TOKEN_URL = reverse('user:token_obtain_pair')
+
+# (label, hasher, required module)
+HASHERS = [
+  ('pbkdf2', 'pbkdf2', None),
+  ('argon2', 'argon2', 'argon2'),
+  ('bcrypt', 'bcrypt', 'bcrypt'),
+]
+
+
+class TokenObtainBenchmark(TestCase):
+  '''Token-obtain requests per second on one core for each hasher
+
+  The test client runs requests serially in this process, so the rate is
+  what one worker process (one core) can sustain for logins.
+  '''
+
+  def login_rate(self, hasher):
+    classes = settings.PASSWORD_HASHER_CLASSES
+    hashers = [classes[hasher]] + [
+      path for name, path in classes.items() if name != hasher
+    ]
+    with override_settings(PASSWORD_HASHERS=hashers):
+      email = f'{hasher}@example.com'
+      get_user_model().objects.create_user(email, 'bench-password')
+      client = APIClient()
+      payload = {'email': email, 'password': 'bench-password'}
+
+      def login():
+        res = client.post(TOKEN_URL, payload)
+        assert res.status_code == 200, res.data
+
+      return 1 / measure(login, number=10, repeat=3)
+
+  def test_token_obtain_throughput(self):
+    rates = {}
+    for label, hasher, module in HASHERS:
+      if module and importlib.util.find_spec(module) is None:
+        print(
+          f'\n[bench] token obtain: {label} skipped, {module} not installed'
+        )
+        continue
+      rates[label] = self.login_rate(hasher)
+    print('\n[bench] token obtain per core: ' + ', '.join(
+      f'{label} {rate:.1f}/s' for label, rate in rates.items()
+    ))
+    self.assertTrue(rates)
@@ -0,0 +1,68 @@
+import os
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from benchmarks import measure
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+
+
+class ListSerializationBenchmark(TestCase):
+  '''Recipes serialized per second by DRF and by FastListSerializer
+
+  The rows are loaded and prefetched before timing, so only building the
+  response data is measured. BENCH_OBJECTS sets the list size (500).
+  '''
+
+  def setUp(self):
+    user = get_user_model().objects.create_user(
+      'bench@example.com', 'test1234'
+    )
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(5)]
+    ingredients = [
+      Ingredient.objects.create(user=user, name=f'Ingredient {i}')
+      for i in range(8)
+    ]
+    count = int(os.environ.get('BENCH_OBJECTS', 500))
+    Recipe.objects.bulk_create(
+      Recipe(
+        user=user,
+        title=f'Recipe {i}',
+        time_minutes=i % 90,
+        price=Decimal('4.25') + i % 20,
+      )
+      for i in range(count)
+    )
+    for i, recipe in enumerate(Recipe.objects.all()):
+      recipe.tags.set(tags[i % 3:i % 3 + 3])
+      recipe.ingredients.set(ingredients[i % 4:i % 4 + 4])
+    self.recipes = list(
+      Recipe.objects.prefetch_related('tags', 'ingredients', 'renditions')
+    )
+    self.context = {'request': APIRequestFactory().get('/api/recipe/recipes/')}
+
+  def rate(self, serializer_class, fast):
+    def serialize():
+      return serializer_class(
+        self.recipes, many=True, context=self.context
+      ).data
+
+    with override_settings(RECIPE_FAST_SERIALIZATION=fast):
+      body = JSONRenderer().render(serialize())
+      return len(self.recipes) / measure(serialize, number=3, repeat=3), body
+
+  def test_fast_list_serializer_throughput(self):
+    for serializer_class in (RecipeSerializer, RecipeDetailSerializer):
+      drf, drf_body = self.rate(serializer_class, False)
+      fast, fast_body = self.rate(serializer_class, True)
+      print(
+        f'\n[bench] {serializer_class.__name__} x{len(self.recipes)}: '
+        f'drf {drf:,.0f} objects/s, fast {fast:,.0f} objects/s '
+        f'({fast / drf:.1f}x)'
+      )
+      self.assertEqual(fast_body, drf_body)
+      self.assertGreater(fast, drf)
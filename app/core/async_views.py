@@ -0,0 +1,129 @@
+'''
+Async views bridged to thread pools for ASGI mode.
+
+Under ASGI Django runs every sync view on one shared thread, so requests
+queue behind each other no matter how many arrive at once. With
+SERVER_MODE='asgi', offload() turns a view into an async view that runs
+the original in a named thread pool instead:
+
+  * 'api-read' (API_READ_WORKERS threads) for the read-heavy recipe,
+    tag and ingredient endpoints, which mostly wait on the database;
+  * 'password-hashing' (PASSWORD_HASHING_WORKERS threads) for views
+    that hash passwords, where hashlib, argon2-cffi and bcrypt release
+    the GIL and can use every core.
+
+Django 3.2 has no async ORM, so a thread pool is the bridge. Requests
+with methods a pool isn't meant for go to Django's usual sync thread.
+Under WSGI (SERVER_MODE='wsgi') views are returned unchanged.
+
+Django 3.2's ASGI handler iterates streaming responses on the event
+loop, where the ORM refuses to run. Streaming responses from offloaded
+views are therefore collected in the worker thread first; use WSGI for
+very large exports.
+'''
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import URLPattern, URLResolver
+
+from core.metrics import render_response
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_executors = {}
+_executors_lock = Lock()
+
+
+def pool_workers(pool):
+  return {
+    'api-read': settings.API_READ_WORKERS,
+    'password-hashing': settings.PASSWORD_HASHING_WORKERS,
+  }.get(pool, 1)
+
+
+def get_executor(name, max_workers):
+  with _executors_lock:
+    if name not in _executors:
+      _executors[name] = ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix=name,
+      )
+  return _executors[name]
+
+
+def _buffer(response):
+  buffered = HttpResponse(
+    b''.join(response.streaming_content),
+    status=response.status_code,
+  )
+  for header, value in response.items():
+    buffered[header] = value
+  return buffered
+
+
+def _call(view, request, *args, **kwargs):
+  try:
+    response = render_response(view(request, *args, **kwargs))
+    if response.streaming:
+      response = _buffer(response)
+    return response
+  finally:
+    # Pool threads outlive the request, so release their connections
+    close_old_connections()
+
+
+def offload(view, pool='password-hashing', workers=None, methods=None):
+  '''Return view as an async view running in pool under ASGI
+
+  Only requests whose method is in methods (all when None) use the
+  pool; the rest run on Django's shared sync thread as before.
+  '''
+  if settings.SERVER_MODE != 'asgi':
+    return view
+
+  @functools.wraps(view)
+  async def async_view(request, *args, **kwargs):
+    if methods is not None and request.method not in methods:
+      return await sync_to_async(_call)(view, request, *args, **kwargs)
+    executor = get_executor(pool, workers or pool_workers(pool))
+    loop = asyncio.get_running_loop()
+    # Unlike sync_to_async, run_in_executor doesn't carry contextvars over
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+      executor,
+      functools.partial(context.run, _call, view, request, *args, **kwargs),
+    )
+
+  # functools.wraps copies csrf_exempt and friends from the DRF view
+  return async_view
+
+
+def offload_patterns(patterns, **kwargs):
+  '''Apply offload() to every view in a list of URL patterns'''
+  if settings.SERVER_MODE != 'asgi':
+    return patterns
+  offloaded = []
+  for pattern in patterns:
+    if isinstance(pattern, URLResolver):
+      offloaded.append(URLResolver(
+        pattern.pattern,
+        offload_patterns(pattern.url_patterns, **kwargs),
+        pattern.default_kwargs,
+        pattern.app_name,
+        pattern.namespace,
+      ))
+    else:
+      offloaded.append(URLPattern(
+        pattern.pattern,
+        offload(pattern.callback, **kwargs),
+        pattern.default_args,
+        pattern.name,
+      ))
+  return offloaded
@@ -0,0 +1,24 @@
+'''
+Database connection management; the backend itself is core.db.base.
+'''
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def server_side_cursors(using=DEFAULT_DB_ALIAS):
+  '''Let QuerySet.iterator() stream through a server-side cursor
+
+  Needed with TRANSACTION_POOLING, where iterator() otherwise fetches
+  the whole result. The block runs in a transaction so the cursor
+  lives and dies with it, which also works through pgbouncer.
+  '''
+  connection = connections[using]
+  with transaction.atomic(using=using):
+    previous = getattr(connection, 'server_side_cursors_requested', False)
+    connection.server_side_cursors_requested = True
+    try:
+      yield
+    finally:
+      connection.server_side_cursors_requested = previous
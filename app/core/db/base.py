@@ -0,0 +1,142 @@
+'''
+PostgreSQL backend with connection health checks, metrics and pooling.
+
+Settings read from DATABASES[alias], next to Django's own:
+
+  CONN_HEALTH_CHECKS   Check a connection kept from an earlier request
+                       (SELECT 1) the first time the next request uses
+                       it, and reconnect if the server went away. Same
+                       as Django 4.1's setting of that name. Pooled
+                       connections are checked when they're handed out.
+  TRANSACTION_POOLING  Set when connecting through pgbouncer in
+                       transaction mode. QuerySet.iterator() then reads
+                       through a client-side cursor, because a
+                       server-side cursor outlives the transaction that
+                       pgbouncer pins it to. core.db.server_side_cursors()
+                       opts back in for a block.
+  POOL                 {'max_size', 'timeout', 'max_age'} to share a
+                       bounded pool of connections between the threads
+                       of one process, or None. Use with CONN_MAX_AGE = 0
+                       so connections go back to the pool after each
+                       request.
+'''
+import os
+import time
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool, pools
+from core.db.stats import connection_stats
+
+
+class ConnectionManagementMixin:
+  '''Health checks and counters for persistent connections'''
+  reuse_pending = False
+
+  @property
+  def health_checks_enabled(self):
+    return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+  def check_health(self):
+    connection_stats.incr(self.alias, 'health_checks')
+    if self.is_usable():
+      return True
+    connection_stats.incr(self.alias, 'health_check_failures')
+    return False
+
+  def connect(self):
+    start = time.perf_counter()
+    super().connect()
+    connection_stats.connected(self.alias, time.perf_counter() - start)
+    self.reuse_pending = False
+
+  def _close(self):
+    if self.connection is not None:
+      connection_stats.incr(self.alias, 'closed')
+    super()._close()
+
+  def close_if_unusable_or_obsolete(self):
+    # Runs when a request starts and finishes
+    super().close_if_unusable_or_obsolete()
+    self.reuse_pending = self.connection is not None
+
+  def ensure_connection(self):
+    if self.reuse_pending:
+      self.reuse_pending = False
+      connection_stats.incr(self.alias, 'reused')
+      if (
+        self.health_checks_enabled
+        and not self.in_atomic_block
+        and not self.check_health()
+      ):
+        self.close()
+    super().ensure_connection()
+
+
+class DatabaseWrapper(ConnectionManagementMixin, base.DatabaseWrapper):
+  server_side_cursors_requested = False
+
+  def get_pool(self):
+    options = self.settings_dict.get('POOL')
+    if not options:
+      return None
+    pool = pools.get(self.alias)
+    # A forked worker must not share its parent's sockets
+    if pool is None or pool.pid != os.getpid():
+      settings_dict = self.settings_dict
+      pool = pools[self.alias] = ConnectionPool(
+        connect=lambda: base.DatabaseWrapper(settings_dict).get_new_connection(
+          self.get_connection_params()
+        ),
+        **options,
+      )
+    return pool
+
+  def get_new_connection(self, conn_params):
+    pool = self.get_pool()
+    if pool is None:
+      return super().get_new_connection(conn_params)
+    check = self._check_pooled if self.health_checks_enabled else None
+    connection = pool.get(check=check)
+    self.isolation_level = self.settings_dict['OPTIONS'].get(
+      'isolation_level', connection.isolation_level
+    )
+    return connection
+
+  def _check_pooled(self, connection):
+    connection_stats.incr(self.alias, 'health_checks')
+    try:
+      with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    except base.Database.Error:
+      connection_stats.incr(self.alias, 'health_check_failures')
+      return False
+    return True
+
+  def _close(self):
+    pool = self.get_pool()
+    if pool is None or self.connection is None:
+      return super()._close()
+    connection = self.connection
+    connection_stats.incr(self.alias, 'closed')
+    if self.in_atomic_block:
+      # Django keeps using this connection until the block exits
+      pool.discard(connection)
+      return
+    try:
+      status = connection.get_transaction_status()
+      if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    except base.Database.Error:
+      pool.discard(connection)
+    else:
+      pool.put(connection)
+
+  def chunked_cursor(self):
+    if (
+      self.settings_dict.get('TRANSACTION_POOLING')
+      and not self.server_side_cursors_requested
+    ):
+      return self.cursor()
+    return super().chunked_cursor()
@@ -0,0 +1,137 @@
+'''
+A small thread-safe pool of DB-API connections.
+
+Connections are handed out most recently used first, so a quiet process
+keeps reusing a few warm connections and the rest age out. When every
+connection is in use, get() waits up to `timeout` seconds for one to be
+returned.
+'''
+import os
+import time
+from collections import deque
+from threading import Condition
+
+# One pool per database alias in this process
+pools = {}
+
+
+class PoolTimeout(Exception):
+  pass
+
+
+class ConnectionPool:
+  def __init__(self, connect, max_size, timeout=10.0, max_age=None):
+    self.connect = connect
+    self.max_size = max_size
+    self.timeout = timeout
+    self.max_age = max_age
+    self.pid = os.getpid()
+    self._idle = deque()
+    self._created = {}
+    self._connecting = 0
+    self._cond = Condition()
+    self.checkouts = self.waits = self.timeouts = 0
+    self.wait_seconds = 0.0
+
+  def get(self, check=None):
+    '''Return an idle connection, a new one, or wait for one to be put back
+
+    check(connection), when given, vets idle connections outside the
+    pool's lock; those it rejects are closed and another is tried.
+    '''
+    while True:
+      connection, new = self._checkout()
+      if new or check is None or check(connection):
+        return connection
+      self.discard(connection)
+
+  def put(self, connection):
+    '''Return a connection that is ready for its next user'''
+    with self._cond:
+      if connection in self._created:
+        self._idle.append(connection)
+        self._cond.notify()
+      else:
+        self._forget(connection)
+
+  def discard(self, connection):
+    '''Close a connection that must not be reused and free its slot'''
+    with self._cond:
+      self._forget(connection)
+
+  def close(self):
+    with self._cond:
+      while self._idle:
+        self._forget(self._idle.pop())
+
+  def stats(self):
+    with self._cond:
+      return {
+        'max_size': self.max_size,
+        'size': len(self._created),
+        'idle': len(self._idle),
+        'in_use': len(self._created) - len(self._idle),
+        'checkouts': self.checkouts,
+        'waits': self.waits,
+        'timeouts': self.timeouts,
+        'wait_seconds': self.wait_seconds,
+      }
+
+  def _checkout(self):
+    start = time.monotonic()
+    waited = False
+    with self._cond:
+      while True:
+        while self._idle:
+          connection = self._idle.pop()
+          if self._is_stale(connection):
+            self._forget(connection)
+            continue
+          self._checked_out(start, waited)
+          return connection, False
+        if len(self._created) + self._connecting < self.max_size:
+          # Reserve the slot, then connect without holding the lock
+          self._connecting += 1
+          break
+        remaining = start + self.timeout - time.monotonic()
+        if remaining <= 0:
+          self.timeouts += 1
+          raise PoolTimeout(
+            f'No connection available within {self.timeout} seconds'
+          )
+        waited = True
+        self._cond.wait(remaining)
+
+    try:
+      connection = self.connect()
+    except BaseException:
+      with self._cond:
+        self._connecting -= 1
+        self._cond.notify()
+      raise
+    with self._cond:
+      self._connecting -= 1
+      self._created[connection] = time.monotonic()
+      self._checked_out(start, waited)
+    return connection, True
+
+  def _checked_out(self, start, waited):
+    self.checkouts += 1
+    if waited:
+      self.waits += 1
+      self.wait_seconds += time.monotonic() - start
+
+  def _is_stale(self, connection):
+    if getattr(connection, 'closed', False):
+      return True
+    if self.max_age is None:
+      return False
+    return time.monotonic() - self._created[connection] >= self.max_age
+
+  def _forget(self, connection):
+    self._created.pop(connection, None)
+    try:
+      connection.close()
+    except Exception:
+      pass
+    self._cond.notify()
@@ -0,0 +1,116 @@
+'''
+Send safe reads from selected API views to read replicas.
+
+Replicas are the aliases in settings.DATABASE_REPLICAS (built from
+DB_REPLICA_HOSTS). Views opt in with ReplicaReadMixin. For the rest of a
+GET/HEAD/OPTIONS request on such a view, reads go to one replica picked
+at random, so a paginated or conditional response sees one consistent
+copy. Everything else, and every write, uses 'default'.
+
+Replication lags, so after a user writes through one of these views
+their reads stay on the primary for DATABASE_REPLICA_STICKY_SECONDS.
+That flag lives in the cache rather than a cookie because API clients
+authenticate with bearer tokens and often drop cookies. The cache must
+be shared by every worker, or a write answered by one worker won't keep
+the next read, answered by another, off a lagging replica; startup
+fails when replicas are configured with a per-process cache.
+'''
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+STICKY_KEY = 'db:primary:{user_id}'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_sticky_cache():
+  return caches[settings.DATABASE_REPLICA_CACHE_ALIAS]
+
+
+def check_sticky_cache():
+  '''Raise ImproperlyConfigured if replicas can't share the sticky flag'''
+  if not settings.DATABASE_REPLICAS:
+    return
+  cache = get_sticky_cache()
+  if isinstance(cache, (LocMemCache, DummyCache)):
+    raise ImproperlyConfigured(
+      f'DB_REPLICA_HOSTS needs a cache shared between workers, but the '
+      f'{settings.DATABASE_REPLICA_CACHE_ALIAS!r} cache is '
+      f'{type(cache).__name__}. '
+      f'Set REDIS_URL.'
+    )
+
+
+def stick_to_primary(user_id):
+  '''Keep user_id's reads on the primary while replicas catch up'''
+  get_sticky_cache().set(
+    STICKY_KEY.format(user_id=user_id),
+    True,
+    settings.DATABASE_REPLICA_STICKY_SECONDS,
+  )
+
+
+def is_sticky(user_id):
+  return bool(get_sticky_cache().get(STICKY_KEY.format(user_id=user_id)))
+
+
+def choose_replica(user_id):
+  '''Return a replica alias for user_id's reads, or None for the primary'''
+  if not settings.DATABASE_REPLICAS or is_sticky(user_id):
+    return None
+  return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+  def db_for_read(self, model, **hints):
+    return _read_alias.get()
+
+  def db_for_write(self, model, **hints):
+    # Django would otherwise write an instance back where it was read from
+    return DEFAULT_DB_ALIAS
+
+  def allow_relation(self, obj1, obj2, **hints):
+    aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+    if obj1._state.db in aliases and obj2._state.db in aliases:
+      return True
+    return None
+
+  def allow_migrate(self, db, app_label, **hints):
+    if db in settings.DATABASE_REPLICAS:
+      return False
+    return None
+
+
+class ReplicaReadMixin:
+  '''Route a view's safe requests to a replica unless the user just wrote'''
+
+  def dispatch(self, request, *args, **kwargs):
+    token = _read_alias.set(None)
+    try:
+      return super().dispatch(request, *args, **kwargs)
+    finally:
+      _read_alias.reset(token)
+
+  def initial(self, request, *args, **kwargs):
+    # Authentication and throttling read from the primary
+    super().initial(request, *args, **kwargs)
+    if request.method in SAFE_METHODS and request.user.is_authenticated:
+      _read_alias.set(choose_replica(request.user.id))
+
+  def finalize_response(self, request, response, *args, **kwargs):
+    if (
+      settings.DATABASE_REPLICAS
+      and request.method not in SAFE_METHODS
+      and response.status_code < 400
+      and request.user.is_authenticated
+    ):
+      stick_to_primary(request.user.id)
+    return super().finalize_response(request, response, *args, **kwargs)
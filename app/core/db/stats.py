@@ -0,0 +1,68 @@
+'''
+Per-process counters for database connections, by alias.
+'''
+from collections import Counter, defaultdict
+from threading import Lock
+
+from django.db import connections
+
+from core.db.pool import pools
+
+COUNTERS = (
+  'opened',
+  'closed',
+  'reused',
+  'health_checks',
+  'health_check_failures',
+)
+
+
+class ConnectionStats:
+  def __init__(self):
+    self._lock = Lock()
+    self._counters = defaultdict(Counter)
+    self._connect_seconds = defaultdict(float)
+
+  def incr(self, alias, name, count=1):
+    with self._lock:
+      self._counters[alias][name] += count
+
+  def connected(self, alias, seconds):
+    with self._lock:
+      self._counters[alias]['opened'] += 1
+      self._connect_seconds[alias] += seconds
+
+  def get(self, alias):
+    with self._lock:
+      counters = {name: self._counters[alias][name] for name in COUNTERS}
+      opened = counters['opened']
+      counters['connect_seconds'] = self._connect_seconds[alias]
+      counters['avg_connect_ms'] = (
+        self._connect_seconds[alias] / opened * 1000 if opened else 0.0
+      )
+      return counters
+
+  def reset(self):
+    with self._lock:
+      self._counters.clear()
+      self._connect_seconds.clear()
+
+
+connection_stats = ConnectionStats()
+
+
+def database_metrics():
+  '''Settings, counters and pool state for every configured database'''
+  metrics = {}
+  for alias in connections:
+    settings_dict = connections.settings[alias]
+    pool = pools.get(alias)
+    metrics[alias] = {
+      'vendor': connections[alias].vendor,
+      'conn_max_age': settings_dict.get('CONN_MAX_AGE'),
+      'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+      'transaction_pooling': settings_dict.get('TRANSACTION_POOLING', False),
+      'connections': connection_stats.get(alias),
+      'pool': pool.stats() if pool is not None else None,
+    }
+  return metrics
@@ -0,0 +1,110 @@
+'''
+orjson-backed JSON renderer and parser for the API.
+
+FastJSONRenderer and FastJSONParser are drop-in replacements for DRF's
+JSONRenderer and JSONParser. Rendered output decodes to the same data
+as DRF's, though not always to the same bytes (float exponents are
+written 1e20 rather than 1e+20), and parsing yields the same data:
+
+  * output is compact and UTF-8, with U+2028/U+2029 escaped like DRF;
+  * types orjson doesn't know, or renders differently, go through DRF's
+    JSONEncoder: Decimal becomes a number as before, datetimes keep
+    DRF's 'Z' suffix, lazy strings and querysets work. Prices and image
+    URLs are already strings by then, so they pass through unchanged;
+  * indented output (the browsable API, ?indent=), non-default
+    UNICODE_JSON/COMPACT_JSON settings, and anything orjson can't
+    encode use DRF's renderer;
+  * bodies orjson rejects, that aren't UTF-8, or that hold numbers too
+    long for orjson to keep exact, are parsed by DRF's parser, so
+    error messages and the NaN rules don't change.
+
+One difference in data remains: orjson renders float NaN and Infinity as null
+where DRF raises. The API's serializers never produce them.
+
+orjson is optional. Without it both classes behave exactly like DRF's.
+Choose the classes with the API_JSON setting.
+'''
+import codecs
+import json
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+if orjson is not None:
+  DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = JSONEncoder()
+
+# orjson reads integers past 64 bits as floats; json keeps them exact, so
+# bodies with runs of 19 digits or more are left to json. Translating to
+# a digit mask and searching it is several times faster than a regex.
+DIGIT_MASK = bytes(
+  b'0'[0] if byte in b'0123456789' else b' '[0] for byte in range(256)
+)
+LONG_NUMBER = b'0' * 19
+
+
+def _has_long_number(data):
+  if isinstance(data, str):
+    data = data.encode('utf-8', 'surrogatepass')
+  return LONG_NUMBER in data.translate(DIGIT_MASK)
+
+
+def loads(data):
+  '''json.loads, through orjson when API_JSON selects it'''
+  if (
+    orjson is not None and settings.API_JSON == 'orjson'
+    and not _has_long_number(data)
+  ):
+    try:
+      return orjson.loads(data)
+    except orjson.JSONDecodeError:
+      # Let json decide, and word the error, as it always has
+      pass
+  return json.loads(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+  def render(self, data, accepted_media_type=None, renderer_context=None):
+    if (
+      orjson is None or data is None or self.ensure_ascii or not self.compact
+      or self.encoder_class is not JSONEncoder
+      or self.get_indent(
+        accepted_media_type, renderer_context or {}
+      ) is not None
+    ):
+      return super().render(data, accepted_media_type, renderer_context)
+    try:
+      ret = orjson.dumps(data, default=_encoder.default, option=DUMPS_OPTIONS)
+    except orjson.JSONEncodeError:
+      return super().render(data, accepted_media_type, renderer_context)
+    # Escaped like DRF does, so the output is a strict JavaScript subset
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+      ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+      ret = ret.replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+class FastJSONParser(JSONParser):
+  renderer_class = FastJSONRenderer
+
+  def parse(self, stream, media_type=None, parser_context=None):
+    parser_context = parser_context or {}
+    encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+    if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+      return super().parse(stream, media_type, parser_context)
+    body = stream.read()
+    if _has_long_number(body):
+      return super().parse(BytesIO(body), media_type, parser_context)
+    try:
+      return orjson.loads(body)
+    except orjson.JSONDecodeError:
+      return super().parse(BytesIO(body), media_type, parser_context)
@@ -0,0 +1,197 @@
+'''
+Recipe image renditions.
+
+Uploads are stored as-is and answered straight away; resized WebP/JPEG
+renditions are produced afterwards by a small in-process worker pool.
+Renditions are re-encoded from pixels only, which drops EXIF/XMP/ICC
+metadata, after applying the EXIF orientation so they still display the
+right way up.
+
+Images are content-addressed (core.storage), so recipes sharing a photo
+share its renditions too; they are copied rather than rendered again.
+Files are never deleted here, only released for gc_images to collect.
+'''
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {
+  'webp': 'WEBP',
+  'jpeg': 'JPEG',
+}
+
+_executor = None
+_executor_lock = Lock()
+
+# Sent after a recipe's renditions have been replaced and committed
+renditions_generated = Signal()
+
+
+def rendition_formats():
+  '''Configured formats this Pillow build can actually encode'''
+  formats = settings.RECIPE_IMAGE_RENDITION_FORMATS
+  if not features.check('webp'):
+    formats = [fmt for fmt in formats if fmt != 'webp']
+  return formats
+
+
+def _encode(image, fmt):
+  if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+    image = image.convert('RGB')
+  buffer = BytesIO()
+  image.save(
+    buffer,
+    format=PIL_FORMATS[fmt],
+    quality=settings.RECIPE_IMAGE_QUALITY,
+    optimize=True,
+  )
+  return buffer.getvalue()
+
+
+def render(source):
+  '''Yield (name, format, width, height, data) for every rendition of source'''
+  with Image.open(source) as original:
+    image = ImageOps.exif_transpose(original)
+    image.load()
+  for name, size in settings.RECIPE_IMAGE_RENDITIONS.items():
+    resized = image.copy()
+    resized.thumbnail(size, Image.LANCZOS)
+    for fmt in rendition_formats():
+      yield name, fmt, resized.width, resized.height, _encode(resized, fmt)
+
+
+def _shared_renditions(recipe_id, source_name):
+  '''Copy the renditions another recipe already has for source_name'''
+  from core.models import RecipeImageRendition
+
+  wanted = {
+    (name, fmt)
+    for name in settings.RECIPE_IMAGE_RENDITIONS
+    for fmt in rendition_formats()
+  }
+  found = {}
+  existing = (
+    RecipeImageRendition.objects
+    .filter(source=source_name)
+    .exclude(recipe_id=recipe_id)
+    .order_by('-id')
+  )
+  for rendition in existing:
+    found.setdefault((rendition.name, rendition.format), rendition)
+  if not wanted.issubset(found):
+    return None
+  return [
+    RecipeImageRendition(
+      recipe_id=recipe_id,
+      name=rendition.name,
+      format=rendition.format,
+      file=rendition.file.name,
+      width=rendition.width,
+      height=rendition.height,
+      source=source_name,
+    )
+    for key, rendition in found.items() if key in wanted
+  ]
+
+
+def _render_renditions(recipe):
+  from core.models import RecipeImageRendition
+
+  renditions = []
+  with recipe.images.open('rb') as source:
+    for name, fmt, width, height, data in render(source):
+      rendition = RecipeImageRendition(
+        recipe_id=recipe.id,
+        name=name,
+        format=fmt,
+        width=width,
+        height=height,
+        source=recipe.images.name,
+      )
+      rendition.file.save(f'{name}.{fmt}', ContentFile(data), save=False)
+      renditions.append(rendition)
+  return renditions
+
+
+def generate_renditions(recipe_id, reuse=True):
+  '''Build and store the renditions of a recipe's current image
+
+  With reuse, renditions another recipe already has for the same stored
+  image are shared instead of rendered again.
+  '''
+  from core.models import ImageBlob, Recipe, RecipeImageRendition
+
+  recipe = (
+    Recipe.objects.filter(pk=recipe_id)
+    .only('id', 'user_id', 'images')
+    .first()
+  )
+  if recipe is None or not recipe.images:
+    return []
+  source_name = recipe.images.name
+
+  renditions = reuse and _shared_renditions(recipe_id, source_name)
+  if not renditions:
+    renditions = _render_renditions(recipe)
+
+  with transaction.atomic():
+    current = Recipe.objects.select_for_update().filter(
+      pk=recipe_id, images=source_name
+    )
+    if not current.values_list('pk', flat=True):
+      # The image was replaced or the recipe deleted while we worked;
+      # the unreferenced files are left for gc_images.
+      return []
+    # Deleting releases the old files through the post_delete signal
+    RecipeImageRendition.objects.filter(recipe_id=recipe_id).delete()
+    RecipeImageRendition.objects.bulk_create(renditions)
+    ImageBlob.objects.acquire(
+      [rendition.file.name for rendition in renditions]
+    )
+    Recipe.objects.filter(pk=recipe_id).update(updated_at=timezone.now())
+    transaction.on_commit(lambda: renditions_generated.send(
+      sender=Recipe, recipe=recipe, renditions=renditions
+    ))
+  return renditions
+
+
+def _run(recipe_id):
+  try:
+    generate_renditions(recipe_id)
+  except Exception:
+    logger.exception('Rendition generation failed for recipe %s', recipe_id)
+  finally:
+    close_old_connections()
+
+
+def get_executor():
+  global _executor
+  with _executor_lock:
+    if _executor is None:
+      _executor = ThreadPoolExecutor(
+        max_workers=settings.RECIPE_IMAGE_WORKERS,
+        thread_name_prefix='recipe-images',
+      )
+  return _executor
+
+
+def schedule_renditions(recipe_id):
+  '''Generate renditions once the current transaction commits
+
+  RECIPE_IMAGE_PROCESSING selects 'thread' (the worker pool) or 'sync'
+  (inline, for tests and one-off scripts).
+  '''
+  if settings.RECIPE_IMAGE_PROCESSING == 'sync':
+    transaction.on_commit(lambda: generate_renditions(recipe_id))
+  else:
+    transaction.on_commit(lambda: get_executor().submit(_run, recipe_id))
@@ -0,0 +1,18 @@
+'''
+Indexes that degrade gracefully off PostgreSQL.
+'''
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models import Index
+
+
+class SearchVectorIndex(GinIndex):
+  '''A GIN index on PostgreSQL and a plain index elsewhere
+
+  Lets the schema migrate on SQLite for local tests and benchmarks,
+  where full-text search falls back to substring matching anyway.
+  '''
+
+  def create_sql(self, model, schema_editor, using='', **kwargs):
+    if schema_editor.connection.vendor != 'postgresql':
+      return Index.create_sql(self, model, schema_editor, **kwargs)
+    return super().create_sql(model, schema_editor, using=using, **kwargs)
@@ -0,0 +1,324 @@
+'''
+A small asyncio HTTP load generator (standard library only).
+
+Each virtual user keeps one HTTP/1.1 keep-alive connection and sends
+requests back to back for the run's duration. Latency is measured per
+request and reported as throughput plus percentiles per label.
+
+    async def scenario(client):
+      await client.request('GET', '/api/recipe/tags/', label='tags')
+
+    result = asyncio.run(run_load('http://127.0.0.1:8000', scenario,
+                                  concurrency=50, duration=10))
+
+GunicornServer starts the app under gunicorn to load test; it is the
+only part that needs Django.
+'''
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+
+class HTTPError(Exception):
+  pass
+
+
+class Response:
+  def __init__(self, status, headers, body):
+    self.status = status
+    self.headers = headers
+    self.body = body
+
+  def json(self):
+    return json.loads(self.body)
+
+
+class HTTPConnection:
+  '''A minimal keep-alive HTTP/1.1 client connection'''
+
+  def __init__(self, host, port):
+    self.host = host
+    self.port = port
+    self.reader = self.writer = None
+
+  async def connect(self):
+    self.reader, self.writer = await asyncio.open_connection(
+      self.host, self.port
+    )
+
+  async def close(self):
+    if self.writer is not None:
+      self.writer.close()
+      try:
+        await self.writer.wait_closed()
+      except (ConnectionError, OSError):
+        pass
+      self.reader = self.writer = None
+
+  async def request(self, method, path, headers=None, body=b''):
+    if self.writer is None:
+      await self.connect()
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+    for name, value in (headers or {}).items():
+      lines.append(f'{name}: {value}')
+    lines.append(f'Content-Length: {len(body)}')
+    try:
+      head = '\r\n'.join(lines) + '\r\n\r\n'
+      self.writer.write(head.encode('latin-1') + body)
+      await self.writer.drain()
+      return await self._read_response(method)
+    except (asyncio.IncompleteReadError, OSError):
+      await self.close()
+      raise HTTPError('connection closed by server')
+
+  async def _read_response(self, method):
+    status_line = await self.reader.readline()
+    if not status_line:
+      raise ConnectionError('empty response')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+      line = await self.reader.readline()
+      if line in (b'\r\n', b'\n', b''):
+        break
+      name, _, value = line.decode('latin-1').partition(':')
+      headers[name.strip().lower()] = value.strip()
+
+    if method == 'HEAD' or status in (204, 304):
+      body = b''
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+      body = await self._read_chunked()
+    elif 'content-length' in headers:
+      body = await self.reader.readexactly(int(headers['content-length']))
+    else:
+      body = await self.reader.read()
+      await self.close()
+    if headers.get('connection', '').lower() == 'close':
+      await self.close()
+    return Response(status, headers, body)
+
+  async def _read_chunked(self):
+    parts = []
+    while True:
+      size = int((await self.reader.readline()).split(b';')[0], 16)
+      if size == 0:
+        await self.reader.readline()
+        return b''.join(parts)
+      parts.append(await self.reader.readexactly(size))
+      await self.reader.readline()
+
+
+class Client:
+  '''One virtual user: a connection plus the recorder it reports to'''
+
+  def __init__(self, connection, recorder, headers=None):
+    self.connection = connection
+    self.recorder = recorder
+    self.headers = dict(headers or {})
+    self.state = {}
+
+  async def request(
+    self, method, path, label=None, json_body=None, body=b'', headers=None
+  ):
+    all_headers = dict(self.headers)
+    if json_body is not None:
+      body = json.dumps(json_body).encode()
+      all_headers['Content-Type'] = 'application/json'
+    all_headers.update(headers or {})
+    label = label or f'{method} {path}'
+    start = time.perf_counter()
+    try:
+      response = await self.connection.request(method, path, all_headers, body)
+    except (HTTPError, OSError) as exc:
+      self.recorder.error(label, time.perf_counter() - start, exc)
+      return None
+    self.recorder.record(label, time.perf_counter() - start, response.status)
+    return response
+
+
+def multipart(fields=None, files=None):
+  '''Encode a multipart/form-data body, returning (body, content type)
+
+  files maps field names to (filename, content type, bytes).
+  '''
+  boundary = uuid.uuid4().hex
+  parts = []
+  for name, value in (fields or {}).items():
+    parts.append(
+      f'--{boundary}\r\n'
+      f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+      + str(value).encode() + b'\r\n'
+    )
+  for name, (filename, content_type, data) in (files or {}).items():
+    parts.append(
+      f'--{boundary}\r\n'
+      f'Content-Disposition: form-data; name="{name}"; '
+      f'filename="{filename}"\r\n'
+      f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n'
+    )
+  parts.append(f'--{boundary}--\r\n'.encode())
+  return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def percentile(values, pct):
+  '''Nearest-rank percentile of a sorted list'''
+  if not values:
+    return 0.0
+  rank = max(1, math.ceil(pct / 100 * len(values)))
+  return values[rank - 1]
+
+
+class Recorder:
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    self.latencies = defaultdict(list)
+    self.statuses = defaultdict(Counter)
+    self.errors = Counter()
+
+  def record(self, label, seconds, status):
+    self.latencies[label].append(seconds)
+    self.statuses[label][status] += 1
+
+  def error(self, label, seconds, exc):
+    self.errors[label] += 1
+
+  def summary(self, elapsed):
+    rows = {}
+    everything = []
+    for label, values in sorted(self.latencies.items()):
+      everything.extend(values)
+      rows[label] = self._row(
+        sorted(values), elapsed, self.statuses[label], self.errors[label]
+      )
+    total_statuses = sum(self.statuses.values(), Counter())
+    rows['total'] = self._row(
+      sorted(everything), elapsed, total_statuses, sum(self.errors.values())
+    )
+    return rows
+
+  @staticmethod
+  def _row(values, elapsed, statuses, errors):
+    return {
+      'requests': len(values),
+      'errors': errors,
+      'non_2xx': sum(
+        n for status, n in statuses.items() if not 200 <= status < 300
+      ),
+      'rps': len(values) / elapsed if elapsed else 0.0,
+      'p50_ms': percentile(values, 50) * 1000,
+      'p95_ms': percentile(values, 95) * 1000,
+      'p99_ms': percentile(values, 99) * 1000,
+      'max_ms': (values[-1] * 1000) if values else 0.0,
+    }
+
+
+async def run_load(
+  base_url, scenario, concurrency=10, duration=10.0, headers=None, setup=None
+):
+  '''Run scenario(client) in a loop on concurrency clients for duration seconds
+
+  setup(client), when given, runs once per client before timing starts.
+  Returns {label: stats} with a 'total' row.
+  '''
+  url = urlsplit(base_url)
+  recorder = Recorder()
+  clients = [
+    Client(HTTPConnection(url.hostname, url.port or 80), recorder, headers)
+    for _ in range(concurrency)
+  ]
+  if setup is not None:
+    await asyncio.gather(*(setup(client) for client in clients))
+    recorder.reset()
+
+  start = time.perf_counter()
+  deadline = start + duration
+
+  async def user(client):
+    try:
+      while time.perf_counter() < deadline:
+        await scenario(client)
+    finally:
+      await client.connection.close()
+
+  await asyncio.gather(*(user(client) for client in clients))
+  return recorder.summary(time.perf_counter() - start)
+
+
+def format_summary(summary):
+  header = (
+    f'{"endpoint":<28}{"reqs":>8}{"err":>6}{"non2xx":>8}'
+    f'{"rps":>10}{"p50":>9}{"p95":>9}{"p99":>9}'
+  )
+  lines = [header, '-' * len(header)]
+  for label, row in summary.items():
+    lines.append(
+      f'{label:<28}{row["requests"]:>8}{row["errors"]:>6}{row["non_2xx"]:>8}'
+      f'{row["rps"]:>10.1f}{row["p50_ms"]:>9.1f}'
+      f'{row["p95_ms"]:>9.1f}{row["p99_ms"]:>9.1f}'
+    )
+  return '\n'.join(lines)
+
+
+class GunicornServer:
+  '''Run gunicorn with gunicorn.conf.py for the duration of a with block'''
+
+  def __init__(self, mode, host, port, timeout=30, env=None):
+    self.mode = mode
+    self.host = host
+    self.port = port
+    self.timeout = timeout
+    self.env = env or {}
+
+  @property
+  def url(self):
+    return f'http://{self.host}:{self.port}'
+
+  def __enter__(self):
+    env = dict(
+      os.environ, SERVER_MODE=self.mode, THROTTLE_ENABLED='0', **self.env
+    )
+    self.process = subprocess.Popen(
+      [
+        sys.executable, '-m', 'gunicorn',
+        '-c', 'gunicorn.conf.py',
+        '--bind', f'{self.host}:{self.port}',
+      ],
+      cwd=Path(settings.BASE_DIR),
+      env=env,
+      stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + self.timeout
+    while time.monotonic() < deadline:
+      if self.process.poll() is not None:
+        raise CommandError(
+          f'gunicorn exited with status {self.process.returncode}'
+        )
+      try:
+        socket.create_connection((self.host, self.port), timeout=1).close()
+        return self
+      except OSError:
+        time.sleep(0.2)
+    self.__exit__()
+    raise CommandError(f'gunicorn did not start within {self.timeout} seconds')
+
+  def __exit__(self, *exc_info):
+    self.process.terminate()
+    try:
+      self.process.wait(timeout=self.timeout)
+    except subprocess.TimeoutExpired:
+      self.process.kill()
+      self.process.wait()
@@ -0,0 +1,42 @@
+"""
+Django command to (re)compute recipe search vectors in batches
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.search import search_enabled, update_search_vectors
+
+
+class Command(BaseCommand):
+  help = 'Backfill Recipe.search_vector in primary key order'
+  
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument(
+      '--missing-only',
+      action='store_true',
+      help='Only recipes whose search vector has never been computed',
+    )
+    
+  def handle(self, *args, **options):
+    if not search_enabled():
+      self.stdout.write('Full-text search requires PostgreSQL, nothing to do')
+      return
+    
+    queryset = Recipe.objects.order_by('pk')
+    if options['missing_only']:
+      queryset = queryset.filter(search_vector__isnull=True)
+      
+    last_pk, total = 0, 0
+    while True:
+      ids = list(
+        queryset.filter(pk__gt=last_pk)
+        .values_list('pk', flat=True)[:options['batch_size']]
+      )
+      if not ids:
+        break
+      total += update_search_vectors(ids)
+      last_pk = ids[-1]
+      self.stdout.write(f'Updated {total} recipes (last id {last_pk})')
+      
+    self.stdout.write(self.style.SUCCESS(f'Backfilled {total} recipes'))
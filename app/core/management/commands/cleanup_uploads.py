@@ -0,0 +1,53 @@
+"""
+Django command to delete expired resumable image uploads
+"""
+import os
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RecipeImageUpload
+
+
+class Command(BaseCommand):
+  help = 'Delete expired partial uploads and their files in batches'
+  
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=500)
+    
+  def handle(self, *args, **options):
+    expired = RecipeImageUpload.objects.filter(expires_at__lte=timezone.now())
+    total = 0
+    while True:
+      ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+      if not ids:
+        break
+      # post_delete removes each upload's file
+      RecipeImageUpload.objects.filter(pk__in=ids).delete()
+      total += len(ids)
+      self.stdout.write(f'Deleted {total} expired uploads')
+      
+    stray = self.delete_stray_files()
+    self.stdout.write(self.style.SUCCESS(
+      f'Deleted {total} expired uploads and {stray} stray files'
+    ))
+    
+  def delete_stray_files(self):
+    '''Remove part files whose upload row no longer exists'''
+    directory = settings.RECIPE_UPLOAD_DIR
+    if not os.path.isdir(directory):
+      return 0
+    names = {}
+    for name in os.listdir(directory):
+      stem, ext = os.path.splitext(name)
+      try:
+        names[str(uuid.UUID(stem))] = name
+      except ValueError:
+        continue
+    uploads = RecipeImageUpload.objects.filter(pk__in=list(names))
+    known = {str(pk) for pk in uploads.values_list('pk', flat=True)}
+    for upload_id in names.keys() - known:
+      os.remove(os.path.join(directory, names[upload_id]))
+    return len(names.keys() - known)
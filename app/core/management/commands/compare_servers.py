@@ -0,0 +1,105 @@
+"""
+Django command to compare WSGI and ASGI throughput on the read endpoints
+"""
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.loadgen import GunicornServer, format_summary, run_load
+from core.models import Recipe, Tag, Ingredient
+
+LOADTEST_EMAIL = 'loadtest@example.com'
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+  help = (
+    'Serve the app with gunicorn in WSGI and ASGI mode and load test the '
+    'read endpoints'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--recipes', type=int, default=50)
+    parser.add_argument(
+      '--modes', nargs='+', choices=MODES, default=list(MODES)
+    )
+    parser.add_argument(
+      '--cache', action='store_true',
+      help=(
+        'Leave the response cache on; by default every request reaches '
+        'the view'
+      ),
+    )
+
+  def handle(self, *args, **options):
+    token, recipe_id = self.seed(options['recipes'])
+    base_url = f'http://{options["host"]}:{options["port"]}'
+    headers = {'Authorization': f'Bearer {token}'}
+
+    async def scenario(client):
+      await client.request('GET', '/api/recipe/recipes/', label='recipe list')
+      await client.request(
+        'GET', f'/api/recipe/recipes/{recipe_id}/', label='recipe detail'
+      )
+      await client.request('GET', '/api/recipe/tags/', label='tags')
+      await client.request(
+        'GET', '/api/recipe/ingredients/', label='ingredients'
+      )
+      await client.request('GET', '/api/user/me/', label='user/me')
+
+    # Cached responses would measure the cache, not the server
+    env = {'RECIPE_CACHE_ENABLED': '1' if options['cache'] else '0'}
+    results = {}
+    for mode in options['modes']:
+      self.stdout.write(f'Starting gunicorn in {mode} mode...')
+      with GunicornServer(mode, options['host'], options['port'], env=env):
+        results[mode] = asyncio.run(run_load(
+          base_url, scenario,
+          concurrency=options['concurrency'],
+          duration=options['duration'],
+          headers=headers,
+        ))
+      self.stdout.write(format_summary(results[mode]))
+      self.stdout.write('')
+
+    if len(results) == 2:
+      wsgi, asgi = results['wsgi']['total'], results['asgi']['total']
+      self.stdout.write(self.style.SUCCESS(
+        f'rps: wsgi {wsgi["rps"]:.1f}, asgi {asgi["rps"]:.1f} '
+        f'({asgi["rps"] / wsgi["rps"] if wsgi["rps"] else 0:.2f}x); '
+        f'p99: wsgi {wsgi["p99_ms"]:.1f}ms, asgi {asgi["p99_ms"]:.1f}ms'
+      ))
+
+  def seed(self, count):
+    '''Create the load test user and recipes; return a token and a recipe id'''
+    user, _ = get_user_model().objects.get_or_create(email=LOADTEST_EMAIL)
+    tags = [
+      Tag.objects.get_or_create(user=user, name=f'Tag {i}')[0]
+      for i in range(5)
+    ]
+    ingredients = [
+      Ingredient.objects.get_or_create(user=user, name=f'Ingredient {i}')[0]
+      for i in range(10)
+    ]
+    existing = Recipe.objects.filter(user=user).count()
+    for i in range(existing, count):
+      recipe = Recipe.objects.create(
+        user=user,
+        title=f'Recipe {i}',
+        time_minutes=10 + i % 50,
+        price=f'{5 + i % 20}.00',
+      )
+      recipe.tags.set(tags[i % 5:i % 5 + 2])
+      recipe.ingredients.set(ingredients[i % 10:i % 10 + 3])
+    recipe_id = (
+      Recipe.objects.filter(user=user).values_list('id', flat=True).first()
+    )
+    if recipe_id is None:
+      raise CommandError('--recipes must be at least 1')
+    return str(RefreshToken.for_user(user).access_token), recipe_id
@@ -0,0 +1,117 @@
+"""
+Django command to delete stored image files that are no longer referenced
+"""
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ImageBlob
+from core.storage import image_storage
+
+IMAGE_ROOT = 'uploads/recipe'
+
+
+class Command(BaseCommand):
+  help = 'Delete unreferenced recipe images and renditions in batches'
+  
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument(
+      '--grace-seconds',
+      type=int,
+      default=3600,
+      help='Only collect files released or written longer ago than this',
+    )
+    parser.add_argument(
+      '--dry-run',
+      action='store_true',
+      help='Report what would be deleted without deleting anything',
+    )
+    
+  def handle(self, *args, **options):
+    self.storage = image_storage()
+    self.batch_size = options['batch_size']
+    self.dry_run = options['dry_run']
+    self.cutoff = timezone.now() - timedelta(seconds=options['grace_seconds'])
+    
+    released = self.collect_released()
+    orphaned = self.collect_orphans()
+    verb = 'Would delete' if self.dry_run else 'Deleted'
+    self.stdout.write(self.style.SUCCESS(
+      f'{verb} {released} released and {orphaned} orphaned files'
+    ))
+    
+  def is_recent(self, name):
+    try:
+      return self.storage.get_modified_time(name) > self.cutoff
+    except FileNotFoundError:
+      return False
+    
+  def delete_file(self, name):
+    if not self.dry_run:
+      self.storage.delete(name)
+      
+  def collect_released(self):
+    '''Delete blobs whose reference count dropped to zero before the cutoff'''
+    unused = ImageBlob.objects.filter(
+      ref_count=0, released_at__lt=self.cutoff
+    ).order_by('pk')
+    last_pk, total = 0, 0
+    while True:
+      with transaction.atomic():
+        batch = list(
+          unused.filter(pk__gt=last_pk)
+          .select_for_update(skip_locked=True)[:self.batch_size]
+        )
+        if not batch:
+          break
+        last_pk = batch[-1].pk
+        # A file re-uploaded during the grace period is in use again
+        names = [blob.name for blob in batch if not self.is_recent(blob.name)]
+        if not self.dry_run:
+          ImageBlob.objects.filter(name__in=names, ref_count=0).delete()
+          transaction.on_commit(lambda names=names: [
+            self.delete_file(name) for name in names
+          ])
+      total += len(names)
+      self.stdout.write(f'Released files: {total} (last id {last_pk})')
+    return total
+  
+  def iter_files(self, directory):
+    directories, files = self.storage.listdir(directory)
+    for name in files:
+      yield os.path.join(directory, name).replace('\\', '/')
+    for name in directories:
+      yield from self.iter_files(os.path.join(directory, name))
+      
+  def collect_orphans(self):
+    '''Delete files on disk that no blob refers to, e.g. abandoned uploads'''
+    if not self.storage.exists(IMAGE_ROOT):
+      return 0
+    total = 0
+    batch = []
+    for name in self.iter_files(IMAGE_ROOT):
+      batch.append(name)
+      if len(batch) >= self.batch_size:
+        total += self.delete_orphans(batch)
+        batch = []
+    if batch:
+      total += self.delete_orphans(batch)
+    return total
+  
+  def delete_orphans(self, names):
+    known = set(
+      ImageBlob.objects.filter(name__in=names).values_list('name', flat=True)
+    )
+    orphans = [
+      name for name in names
+      if name not in known and not self.is_recent(name)
+    ]
+    for name in orphans:
+      self.delete_file(name)
+    if orphans:
+      self.stdout.write(f'Orphaned files: {len(orphans)} in this batch')
+    return len(orphans)
@@ -0,0 +1,342 @@
+"""
+Django command to load test the API with a mix of synthetic traffic
+"""
+import asyncio
+import itertools
+import json
+import random
+import threading
+import uuid
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+  ThreadedWSGIServer, get_internal_wsgi_application
+)
+from django.test.testcases import QuietWSGIRequestHandler
+from django.test.utils import override_settings
+from PIL import Image
+
+from core.loadgen import GunicornServer, format_summary, multipart, run_load
+
+PASSWORD = 'loadtest-password'
+DEFAULT_MIX = 'register=1,token=1,recipes=6,attributes=3,upload=1'
+SERVERS = ('inprocess', 'wsgi', 'asgi')
+RECIPE_STEPS = ('create', 'list', 'retrieve', 'update', 'delete')
+MAX_RECIPES_PER_USER = 20
+TAG_NAMES = ('Vegan', 'Quick', 'Dessert', 'Spicy', 'Breakfast')
+INGREDIENT_NAMES = ('Rice', 'Salt', 'Garlic', 'Lemon', 'Butter', 'Flour')
+
+
+def parse_mix(value):
+  '''Parse "name=weight,..." into {operation: weight}'''
+  mix = {}
+  for part in filter(None, (part.strip() for part in value.split(','))):
+    name, _, weight = part.partition('=')
+    if name not in OPERATIONS:
+      raise CommandError(
+        f'Unknown operation {name!r}; '
+        f'choose from {", ".join(OPERATIONS)}'
+      )
+    try:
+      mix[name] = int(weight or 1)
+    except ValueError:
+      raise CommandError(f'Weight for {name} must be a whole number')
+    if mix[name] < 0:
+      raise CommandError(f'Weight for {name} must not be negative')
+  if not any(mix.values()):
+    raise CommandError(
+      '--mix needs at least one operation with a positive weight'
+    )
+  return mix
+
+
+def png_bytes():
+  buffer = BytesIO()
+  Image.new('RGB', (320, 240), color=(180, 90, 40)).save(buffer, format='PNG')
+  return buffer.getvalue()
+
+
+def recipe_payload(rng):
+  return {
+    'title': f'Load test recipe {rng.randrange(10 ** 6)}',
+    'time_minutes': rng.randint(5, 120),
+    'price': f'{rng.randint(1, 50)}.{rng.randrange(100):02d}',
+    'tags': [{'name': name} for name in rng.sample(TAG_NAMES, 2)],
+    'ingredients': [
+      {'name': name} for name in rng.sample(INGREDIENT_NAMES, 3)
+    ],
+  }
+
+
+async def register(client):
+  '''Register a new user; the first becomes the user this client acts as'''
+  state = client.state
+  email = f'{state["prefix"]}{next(state["emails"])}@example.com'
+  response = await client.request(
+    'POST', '/api/user/create/', label='register', json_body={
+      'name': 'Load Test',
+      'email': email,
+      'password': PASSWORD,
+      'password2': PASSWORD,
+    },
+  )
+  if response is not None and response.status == 201:
+    state.setdefault('email', email)
+  return response
+
+
+async def obtain_token(client):
+  response = await client.request(
+    'POST', '/api/user/token/obtain/', label='token', json_body={
+      'email': client.state['email'], 'password': PASSWORD,
+    },
+  )
+  if response is not None and response.status == 200:
+    client.headers['Authorization'] = f'Bearer {response.json()["access"]}'
+  return response
+
+
+async def create_recipe(client):
+  response = await client.request(
+    'POST', '/api/recipe/recipes/', label='recipe create',
+    json_body=recipe_payload(client.state['rng']),
+  )
+  if response is not None and response.status == 201:
+    client.state['recipes'].append(response.json()['id'])
+  return response
+
+
+async def recipes(client):
+  '''One step of recipe CRUD on the client's own recipes'''
+  rng, owned = client.state['rng'], client.state['recipes']
+  step = rng.choice(RECIPE_STEPS)
+  if not owned or (step == 'create' and len(owned) < MAX_RECIPES_PER_USER):
+    return await create_recipe(client)
+  if step == 'list':
+    return await client.request(
+      'GET', '/api/recipe/recipes/', label='recipe list'
+    )
+  recipe_id = rng.choice(owned)
+  path = f'/api/recipe/recipes/{recipe_id}/'
+  if step == 'update':
+    return await client.request(
+      'PATCH', path, label='recipe update',
+      json_body={'title': f'Renamed {rng.randrange(10 ** 6)}'},
+    )
+  if step == 'delete' and len(owned) > 1:
+    owned.remove(recipe_id)
+    return await client.request('DELETE', path, label='recipe delete')
+  return await client.request('GET', path, label='recipe detail')
+
+
+async def attributes(client):
+  kind = client.state['rng'].choice(('tags', 'ingredients'))
+  return await client.request('GET', f'/api/recipe/{kind}/', label=kind)
+
+
+async def upload(client):
+  state = client.state
+  if not state['recipes']:
+    await create_recipe(client)
+    if not state['recipes']:
+      return None
+  body, content_type = multipart(
+    files={'images': ('loadtest.png', 'image/png', state['image'])}
+  )
+  recipe_id = state['rng'].choice(state['recipes'])
+  return await client.request(
+    'POST', f'/api/recipe/recipes/{recipe_id}/upload-image/',
+    label='upload image', body=body, headers={'Content-Type': content_type},
+  )
+
+
+OPERATIONS = {
+  'register': register,
+  'token': obtain_token,
+  'recipes': recipes,
+  'attributes': attributes,
+  'upload': upload,
+}
+
+
+class Command(BaseCommand):
+  help = (
+    'Drive a weighted mix of API traffic at a server and report '
+    'throughput and latency'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--url',
+      help='Load test an already running server instead of starting one',
+    )
+    parser.add_argument(
+      '--server', choices=SERVERS, default='inprocess',
+      help=(
+        'Server to start: a threaded server in this process, or gunicorn '
+        'in WSGI or ASGI mode'
+      ),
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument(
+      '--port', type=int, default=8765, help='Port for gunicorn'
+    )
+    parser.add_argument(
+      '--concurrency', type=int, nargs='+', default=[10],
+      help='Virtual users; give several to run one round per level',
+    )
+    parser.add_argument(
+      '--duration', type=float, default=20.0, help='Seconds per round'
+    )
+    parser.add_argument(
+      '--mix', default=DEFAULT_MIX,
+      help=(
+        f'Operation weights, from {", ".join(OPERATIONS)} '
+        f'(default {DEFAULT_MIX})'
+      ),
+    )
+    parser.add_argument(
+      '--seed', type=int, default=0,
+      help='Seed for the choice of operations',
+    )
+    parser.add_argument(
+      '--throttle', action='store_true',
+      help='Leave request throttling on for servers this command starts',
+    )
+    parser.add_argument(
+      '--json', dest='json_path',
+      help='Also write the results to this file',
+    )
+    parser.add_argument(
+      '--keep-users', action='store_true',
+      help='Keep the users the run registered (never deleted with --url)',
+    )
+
+  def handle(self, *args, **options):
+    mix = parse_mix(options['mix'])
+    if any(level < 1 for level in options['concurrency']):
+      raise CommandError('--concurrency must be at least 1')
+    prefix = f'loadtest-{uuid.uuid4().hex[:8]}-'
+    image = png_bytes()
+    operations = [OPERATIONS[name] for name in mix]
+    weights = list(mix.values())
+    emails, clients = itertools.count(), itertools.count()
+
+    async def setup(client):
+      client.state.update(
+        prefix=prefix, emails=emails, image=image, recipes=[],
+        rng=random.Random(f'{options["seed"]}-{next(clients)}'),
+      )
+      for step in (register, obtain_token, create_recipe):
+        response = await step(client)
+        if response is None or response.status >= 400:
+          status = response.status if response else 'no response'
+          body = response.body[:200] if response else ''
+          raise CommandError(
+            f'Setting up a virtual user failed at {step.__name__}: '
+            f'{status} {body}'
+          )
+
+    async def scenario(client):
+      operation = client.state['rng'].choices(operations, weights)[0]
+      await operation(client)
+
+    results = {}
+    try:
+      with self.server(options) as base_url:
+        self.stdout.write(f'Load testing {base_url} with {options["mix"]}')
+        for level in options['concurrency']:
+          results[level] = asyncio.run(run_load(
+            base_url, scenario,
+            concurrency=level,
+            duration=options['duration'],
+            setup=setup,
+          ))
+          self.stdout.write(f'\nConcurrency {level}:')
+          self.stdout.write(format_summary(results[level]))
+    finally:
+      if not options['url'] and not options['keep_users']:
+        get_user_model().objects.filter(email__startswith=prefix).delete()
+
+    if len(results) > 1:
+      self.stdout.write('')
+      self.stdout.write(
+        f'{"concurrency":>12}{"rps":>10}{"p50":>9}{"p95":>9}{"p99":>9}'
+        f'{"errors":>8}{"non2xx":>8}'
+      )
+      for level, summary in results.items():
+        total = summary['total']
+        self.stdout.write(
+          f'{level:>12}{total["rps"]:>10.1f}'
+          f'{total["p50_ms"]:>9.1f}{total["p95_ms"]:>9.1f}'
+          f'{total["p99_ms"]:>9.1f}{total["errors"]:>8}{total["non_2xx"]:>8}'
+        )
+
+    if options['json_path']:
+      with open(options['json_path'], 'w') as output:
+        json.dump(
+          {str(level): summary for level, summary in results.items()},
+          output,
+          indent=2,
+        )
+
+    best = max(results.items(), key=lambda item: item[1]['total']['rps'])
+    self.stdout.write(self.style.SUCCESS(
+      f'Peak throughput {best[1]["total"]["rps"]:.1f} rps '
+      f'at concurrency {best[0]}'
+    ))
+
+  @contextmanager
+  def server(self, options):
+    '''Yield the base URL of the server to load test'''
+    if options['url']:
+      yield options['url'].rstrip('/')
+    elif options['server'] == 'inprocess':
+      server = InProcessServer(options['host'], throttle=options['throttle'])
+      with server:
+        yield server.url
+    else:
+      env = {'THROTTLE_ENABLED': '1'} if options['throttle'] else None
+      server = GunicornServer(
+        options['server'], options['host'], options['port'], env=env
+      )
+      with server:
+        yield server.url
+
+
+class RequestHandler(QuietWSGIRequestHandler):
+  # wsgiref writes headers and body separately; with Nagle on, every
+  # response would wait out the client's delayed ACK
+  disable_nagle_algorithm = True
+
+
+class InProcessServer:
+  '''Serve the WSGI app from a thread in this process on a free port'''
+
+  def __init__(self, host, throttle=False):
+    self.host = host
+    overrides = {} if throttle else {'THROTTLE_ENABLED': False}
+    self.settings = override_settings(**overrides)
+
+  @property
+  def url(self):
+    return f'http://{self.host}:{self.httpd.server_address[1]}'
+
+  def __enter__(self):
+    self.settings.enable()
+    self.httpd = ThreadedWSGIServer((self.host, 0), RequestHandler)
+    self.httpd.set_app(get_internal_wsgi_application())
+    self.thread = threading.Thread(
+      target=self.httpd.serve_forever, daemon=True
+    )
+    self.thread.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.httpd.shutdown()
+    self.httpd.server_close()
+    self.thread.join()
+    self.settings.disable()
@@ -0,0 +1,49 @@
+"""
+Django command to generate missing recipe image renditions in batches
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from core.images import generate_renditions
+from core.models import Recipe, RecipeImageRendition
+
+
+class Command(BaseCommand):
+  help = 'Generate renditions for recipe images that have none'
+  
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument(
+      '--all',
+      action='store_true',
+      help='Regenerate renditions for every recipe with an image',
+    )
+    
+  def handle(self, *args, **options):
+    queryset = (
+      Recipe.objects.exclude(images='')
+      .exclude(images__isnull=True)
+      .order_by('pk')
+    )
+    if not options['all']:
+      queryset = queryset.filter(
+        ~Exists(RecipeImageRendition.objects.filter(recipe_id=OuterRef('pk')))
+      )
+      
+    last_pk, total = 0, 0
+    while True:
+      ids = list(
+        queryset.filter(pk__gt=last_pk)
+        .values_list('pk', flat=True)[:options['batch_size']]
+      )
+      if not ids:
+        break
+      for recipe_id in ids:
+        if generate_renditions(recipe_id, reuse=not options['all']):
+          total += 1
+      last_pk = ids[-1]
+      self.stdout.write(f'Processed {total} images (last id {last_pk})')
+      
+    self.stdout.write(
+      self.style.SUCCESS(f'Generated renditions for {total} recipes')
+    )
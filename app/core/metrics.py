@@ -0,0 +1,353 @@
+'''
+Per-route request metrics, exposed in the Prometheus text format.
+
+MetricsMiddleware times every request and labels it with its URL name,
+such as recipe:recipe-list. An execute wrapper installed on every
+database connection adds the number and duration of the SQL queries the
+request ran, including those run in the ASGI thread pools. Time spent
+rendering the response body is recorded as serialization time, along
+with the size of the body.
+
+Aggregation is per process and takes no locks: each thread adds into its
+own shard, and a scrape of /api/metrics/ sums the shards. A scrape may
+see a request half recorded, and that's all it costs. With several
+gunicorn workers each scrape reports the worker that answered it.
+
+The JWT authentication caches (user.authentication) are exported too,
+as lookup and eviction counters per cache.
+
+When METRICS_SLOW_REQUEST_SECONDS is set, requests slower than that are
+logged to core.metrics with the SQL they ran (without parameters).
+'''
+import asyncio
+import logging
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import local
+from time import perf_counter
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core.db.pool import pools
+from core.db.stats import COUNTERS, connection_stats
+from user.authentication import active_users, validated_tokens
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+  0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SLOW_LOG_MAX_QUERIES = 100
+
+# Offsets into a row of the aggregate for one (route, method, status)
+COUNT, LATENCY, BUCKETS = 0, 1, 2
+QUERIES = BUCKETS + len(LATENCY_BUCKETS) + 1
+SQL_SECONDS, SERIALIZATION, BYTES = QUERIES + 1, QUERIES + 2, QUERIES + 3
+ROW_SIZE = BYTES + 1
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+  '''What one request did, filled in as it runs'''
+  __slots__ = ('queries', 'sql_seconds', 'serialization_seconds', 'sql')
+
+  def __init__(self, capture_sql=False):
+    self.queries = 0
+    self.sql_seconds = 0.0
+    self.serialization_seconds = 0.0
+    self.sql = [] if capture_sql else None
+
+
+class Registry:
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    self._local = local()
+    self._shards = []
+
+  def _shard(self):
+    shard = getattr(self._local, 'shard', None)
+    if shard is None:
+      shard = self._local.shard = {}
+      # list.append is atomic, so registering needs no lock either
+      self._shards.append(shard)
+    return shard
+
+  def _row(self, key):
+    shard = self._shard()
+    row = shard.get(key)
+    if row is None:
+      row = shard[key] = [0] * ROW_SIZE
+    return row
+
+  def observe(self, key, seconds, stats, size):
+    row = self._row(key)
+    row[COUNT] += 1
+    row[LATENCY] += seconds
+    row[BUCKETS + bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    row[QUERIES] += stats.queries
+    row[SQL_SECONDS] += stats.sql_seconds
+    row[SERIALIZATION] += stats.serialization_seconds
+    row[BYTES] += size
+
+  def add_bytes(self, key, size):
+    self._row(key)[BYTES] += size
+
+  def collect(self):
+    '''Return {(route, method, status): row} summed over every thread'''
+    totals = {}
+    for shard in list(self._shards):
+      for key, row in shard.copy().items():
+        total = totals.setdefault(key, [0] * ROW_SIZE)
+        for index, value in enumerate(row):
+          total[index] += value
+    return totals
+
+
+registry = Registry()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+  stats = _current.get()
+  if stats is None:
+    return execute(sql, params, many, context)
+  start = perf_counter()
+  try:
+    return execute(sql, params, many, context)
+  finally:
+    elapsed = perf_counter() - start
+    stats.queries += 1
+    stats.sql_seconds += elapsed
+    if stats.sql is not None and len(stats.sql) < SLOW_LOG_MAX_QUERIES:
+      stats.sql.append((elapsed, sql))
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+  # The wrapper outlives reconnects, so add it once per connection object
+  if execute_wrapper not in connection.execute_wrappers:
+    connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+def render_response(response):
+  '''Render a DRF or template response, timing it for the current request'''
+  if getattr(response, 'is_rendered', True):
+    return response
+  start = perf_counter()
+  response = response.render()
+  stats = _current.get()
+  if stats is not None:
+    stats.serialization_seconds += perf_counter() - start
+  return response
+
+
+def route_name(request):
+  match = getattr(request, 'resolver_match', None)
+  return match.view_name if match is not None else 'unmatched'
+
+
+def _count_streamed(content, key):
+  size = 0
+  try:
+    for chunk in content:
+      size += len(chunk)
+      yield chunk
+  finally:
+    registry.add_bytes(key, size)
+
+
+class MetricsMiddleware:
+  # Async-capable so that under ASGI the chain isn't pinned to one thread
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.async_mode = asyncio.iscoroutinefunction(get_response)
+    if self.async_mode:
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if self.async_mode:
+      return self.__acall__(request)
+    if not settings.METRICS_ENABLED:
+      return self.get_response(request)
+
+    stats = RequestStats(
+      capture_sql=settings.METRICS_SLOW_REQUEST_SECONDS is not None
+    )
+    token = _current.set(stats)
+    start = perf_counter()
+    try:
+      response = self.get_response(request)
+    finally:
+      _current.reset(token)
+    return self.record(request, response, perf_counter() - start, stats)
+
+  async def __acall__(self, request):
+    if not settings.METRICS_ENABLED:
+      return await self.get_response(request)
+
+    stats = RequestStats(
+      capture_sql=settings.METRICS_SLOW_REQUEST_SECONDS is not None
+    )
+    token = _current.set(stats)
+    start = perf_counter()
+    try:
+      response = await self.get_response(request)
+    finally:
+      _current.reset(token)
+    return self.record(request, response, perf_counter() - start, stats)
+
+  def record(self, request, response, elapsed, stats):
+    key = (route_name(request), request.method, str(response.status_code))
+    if response.streaming:
+      response.streaming_content = _count_streamed(
+        response.streaming_content, key
+      )
+      size = 0
+    else:
+      size = len(response.content)
+    registry.observe(key, elapsed, stats, size)
+
+    threshold = settings.METRICS_SLOW_REQUEST_SECONDS
+    if threshold is not None and elapsed >= threshold:
+      log_slow_request(request, key[0], response.status_code, elapsed, stats)
+    return response
+
+  def process_template_response(self, request, response):
+    return render_response(response)
+
+
+def log_slow_request(request, route, status, elapsed, stats):
+  queries = '\n'.join(
+    f'  {seconds * 1000:8.1f}ms  {sql}' for seconds, sql in stats.sql
+  )
+  logger.warning(
+    'Slow request: %s %s (%s) %s in %.0fms, %d queries in %.0fms, '
+    'serialization %.0fms\n%s',
+    request.method, request.path, route, status, elapsed * 1000,
+    stats.queries, stats.sql_seconds * 1000,
+    stats.serialization_seconds * 1000, queries,
+  )
+
+
+AUTH_CACHES = (
+  ('active_users', active_users),
+  ('validated_tokens', validated_tokens),
+)
+
+
+def _labels(**labels):
+  escaped = (
+    '{}="{}"'.format(
+      name,
+      str(value)
+      .replace('\\', '\\\\')
+      .replace('"', '\\"')
+      .replace('\n', '\\n'),
+    )
+    for name, value in labels.items()
+  )
+  return '{' + ','.join(escaped) + '}'
+
+
+def _family(lines, name, kind, help_text):
+  lines.append(f'# HELP {name} {help_text}')
+  lines.append(f'# TYPE {name} {kind}')
+
+
+def export_text():
+  '''Every metric in the Prometheus text exposition format'''
+  rows = sorted(registry.collect().items())
+  lines = []
+
+  histogram = 'http_request_duration_seconds'
+  _family(lines, histogram, 'histogram', 'Request latency by route.')
+  for (route, method, status), row in rows:
+    labels = dict(route=route, method=method, status=status)
+    cumulative = 0
+    for bound, index in zip(LATENCY_BUCKETS, range(BUCKETS, QUERIES)):
+      cumulative += row[index]
+      bucket = _labels(**labels, le=bound)
+      lines.append(f'{histogram}_bucket{bucket} {cumulative}')
+    bucket = _labels(**labels, le='+Inf')
+    lines.append(f'{histogram}_bucket{bucket} {row[COUNT]}')
+    lines.append(f'{histogram}_sum{_labels(**labels)} {row[LATENCY]}')
+    lines.append(f'{histogram}_count{_labels(**labels)} {row[COUNT]}')
+
+  for name, index, help_text in (
+    (
+      'http_request_db_queries_total', QUERIES,
+      'SQL queries run by requests.',
+    ),
+    (
+      'http_request_db_seconds_total', SQL_SECONDS,
+      'Time spent in SQL queries.',
+    ),
+    (
+      'http_request_serialization_seconds_total', SERIALIZATION,
+      'Time spent rendering response bodies.',
+    ),
+    ('http_response_bytes_total', BYTES, 'Response body bytes sent.'),
+  ):
+    _family(lines, name, 'counter', help_text)
+    for (route, method, status), row in rows:
+      labels = _labels(route=route, method=method, status=status)
+      lines.append(f'{name}{labels} {row[index]}')
+
+  aliases = list(settings.DATABASES)
+  _family(
+    lines, 'db_connection_events_total', 'counter',
+    'Database connection events.',
+  )
+  for alias in aliases:
+    counters = connection_stats.get(alias)
+    for event in COUNTERS:
+      labels = _labels(alias=alias, event=event)
+      lines.append(f'db_connection_events_total{labels} {counters[event]}')
+  _family(
+    lines, 'db_connect_seconds_total', 'counter',
+    'Time spent opening database connections.',
+  )
+  for alias in aliases:
+    seconds = connection_stats.get(alias)['connect_seconds']
+    lines.append(f'db_connect_seconds_total{_labels(alias=alias)} {seconds}')
+  _family(
+    lines, 'db_pool_connections', 'gauge',
+    'Pooled database connections by state.',
+  )
+  for alias in aliases:
+    pool = pools.get(alias)
+    if pool is not None:
+      stats = pool.stats()
+      for state in ('idle', 'in_use'):
+        labels = _labels(alias=alias, state=state)
+        lines.append(f'db_pool_connections{labels} {stats[state]}')
+
+  caches = [(name, cache.stats()) for name, cache in AUTH_CACHES]
+  _family(
+    lines, 'auth_cache_lookups_total', 'counter',
+    'Authentication cache lookups by result.',
+  )
+  for name, stats in caches:
+    for result, key in (('hit', 'hits'), ('miss', 'misses')):
+      lines.append(
+        f'auth_cache_lookups_total{_labels(cache=name, result=result)} '
+        f'{stats[key]}'
+      )
+  _family(
+    lines, 'auth_cache_evictions_total', 'counter',
+    'Entries evicted from authentication caches when full.',
+  )
+  for name, stats in caches:
+    lines.append(
+      f'auth_cache_evictions_total{_labels(cache=name)} {stats["evictions"]}'
+    )
+
+  return '\n'.join(lines) + '\n'
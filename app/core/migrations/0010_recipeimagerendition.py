@@ -0,0 +1,32 @@
+# Generated by Django 3.2.16 on 2026-10-18 12:31
+
+import core.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+                ('format', models.CharField(max_length=8)),
+                ('file', models.ImageField(upload_to=core.models.rendition_file_path)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('source', models.CharField(max_length=255)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='core.recipe')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recipeimagerendition',
+            constraint=models.UniqueConstraint(fields=('recipe', 'name', 'format'), name='unique_recipe_rendition'),
+        ),
+    ]
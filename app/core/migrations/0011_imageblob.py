@@ -0,0 +1,57 @@
+# Generated by Django 3.2.16 on 2026-10-18 14:05
+
+from collections import Counter
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+def count_references(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeImageRendition = apps.get_model('core', 'RecipeImageRendition')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+
+    counts = Counter(
+        Recipe.objects.exclude(images='').exclude(images__isnull=True)
+        .values_list('images', flat=True)
+    )
+    counts.update(RecipeImageRendition.objects.values_list('file', flat=True))
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name, ref_count=count) for name, count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipeimagerendition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(fields=['ref_count', 'released_at'], name='imageblob_unused_idx'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='images',
+            field=models.ImageField(null=True, storage=core.storage.image_storage, upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AlterField(
+            model_name='recipeimagerendition',
+            name='file',
+            field=models.ImageField(storage=core.storage.image_storage, upload_to=core.models.rendition_file_path),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,10 @@
+from collections import defaultdict
+
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
   AbstractBaseUser,
   PermissionsMixin,
@@ -6,6 +12,9 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 
+from core.indexes import SearchVectorIndex
+from core.storage import image_storage
+
 import uuid
 import os
 
@@ -15,6 +24,10 @@ def recipe_image_file_path(instance, filename):
   filename = f'{uuid.uuid4()}{ext}'
   return os.path.join('uploads', 'recipe', filename)
 
+
+def rendition_file_path(instance, filename):
+  return os.path.join('uploads', 'recipe', 'renditions', filename)
+
 # Create your models here.
 class UserManager(BaseUserManager):
   def create_user(self, email, password, **extra_fields):
@@ -35,6 +48,30 @@ class UserManager(BaseUserManager):
     return user
   
 
+class RecipeAttrManager(models.Manager):
+  def get_or_create_many(self, user, names):
+    '''Resolve names to objects for user, bulk creating the missing ones'''
+    names = list(dict.fromkeys(names))
+    if not names:
+      return {}
+    # Only the id is used, so token users work as well as User instances
+    existing = self.filter(user_id=user.pk, name__in=names)
+    found = {obj.name: obj for obj in existing}
+    missing = [
+      self.model(user_id=user.pk, name=name)
+      for name in names if name not in found
+    ]
+    if missing:
+      created = self.bulk_create(missing)
+      if any(obj.pk is None for obj in created):
+        # Backends that cannot return ids from a bulk insert
+        created = self.filter(
+          user_id=user.pk, name__in=[obj.name for obj in missing]
+        )
+      found.update((obj.name, obj) for obj in created)
+    return found
+  
+
 class User(AbstractBaseUser, PermissionsMixin):
   email = models.EmailField(max_length=255, unique=True)
   password = models.CharField(max_length=255)
@@ -48,6 +85,65 @@ class User(AbstractBaseUser, PermissionsMixin):
   REQUIRED_FIELDS = []
   
   
+def _group_by_count(names):
+  counts = defaultdict(int)
+  for name in names:
+    if name:
+      counts[name] += 1
+  groups = defaultdict(list)
+  for name, count in counts.items():
+    groups[count].append(name)
+  return groups.items()
+
+
+class ImageBlobManager(models.Manager):
+  def acquire(self, names):
+    '''Add a reference to each stored file in names'''
+    groups = list(_group_by_count(names))
+    if not groups:
+      return
+    self.bulk_create(
+      [self.model(name=name) for _, group in groups for name in group],
+      ignore_conflicts=True,
+    )
+    for count, group in groups:
+      self.filter(name__in=group).update(
+        ref_count=F('ref_count') + count,
+        released_at=None,
+      )
+      
+  def release(self, names):
+    '''Drop a reference to each stored file in names'''
+    now = timezone.now()
+    for count, group in _group_by_count(names):
+      self.filter(name__in=group).update(
+        ref_count=Greatest(F('ref_count') - count, Value(0)),
+        released_at=Case(
+          When(ref_count__lte=count, then=Value(now)),
+          default=F('released_at'),
+        ),
+      )
+      
+
+class ImageBlob(models.Model):
+  '''Reference count of a content-addressed image file'''
+  name = models.CharField(max_length=255, unique=True)
+  ref_count = models.PositiveIntegerField(default=0)
+  released_at = models.DateTimeField(null=True, blank=True)
+  
+  objects = ImageBlobManager()
+  
+  class Meta:
+    indexes = [
+      models.Index(
+        fields=['ref_count', 'released_at'], name='imageblob_unused_idx'
+      ),
+    ]
+  
+  def __str__(self):
+    return f'{self.name} ({self.ref_count})'
+  
+  
 class Recipe(models.Model):
   user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
   title = models.CharField(max_length=255)
@@ -57,15 +153,87 @@ class Recipe(models.Model):
   link = models.CharField(max_length=255, blank=True)
   tags = models.ManyToManyField('Tag')
   ingredients = models.ManyToManyField('Ingredient')
-  images = models.ImageField(null=True, upload_to=recipe_image_file_path)
+  images = models.ImageField(
+    null=True, upload_to=recipe_image_file_path, storage=image_storage
+  )
+  search_vector = SearchVectorField(null=True, editable=False)
+  updated_at = models.DateTimeField(auto_now=True)
+  
+  class Meta:
+    indexes = [
+      SearchVectorIndex(
+        fields=['search_vector'], name='recipe_search_vector_idx'
+      ),
+      models.Index(
+        fields=['user', 'updated_at'], name='recipe_user_updated_idx'
+      ),
+      models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+      models.Index(fields=['user', 'price'], name='recipe_user_price_idx'),
+      models.Index(
+        fields=['user', 'time_minutes'], name='recipe_user_time_idx'
+      ),
+    ]
   
   def __str__(self):
     return self.title
   
 
+class RecipeImageRendition(models.Model):
+  recipe = models.ForeignKey(
+    Recipe, related_name='renditions', on_delete=models.CASCADE
+  )
+  name = models.CharField(max_length=32)
+  format = models.CharField(max_length=8)
+  file = models.ImageField(
+    upload_to=rendition_file_path, storage=image_storage
+  )
+  width = models.PositiveIntegerField()
+  height = models.PositiveIntegerField()
+  source = models.CharField(max_length=255)
+  
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(
+        fields=['recipe', 'name', 'format'],
+        name='unique_recipe_rendition',
+      ),
+    ]
+    
+  def __str__(self):
+    return f'{self.recipe_id} {self.name} ({self.format})'
+  
+
+class RecipeImageUpload(models.Model):
+  '''A resumable image upload, assembled on disk until finalized'''
+  id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+  recipe = models.ForeignKey(
+    Recipe, related_name='image_uploads', on_delete=models.CASCADE
+  )
+  filename = models.CharField(max_length=255)
+  size = models.PositiveBigIntegerField()
+  offset = models.PositiveBigIntegerField(default=0)
+  created_at = models.DateTimeField(auto_now_add=True)
+  expires_at = models.DateTimeField(db_index=True)
+  
+  @property
+  def path(self):
+    return os.path.join(settings.RECIPE_UPLOAD_DIR, f'{self.id}.part')
+  
+  def __str__(self):
+    return f'{self.filename} ({self.offset}/{self.size})'
+  
+  
 class Tag(models.Model):
   name = models.CharField(max_length=255)
   user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+  updated_at = models.DateTimeField(auto_now=True)
+  
+  objects = RecipeAttrManager()
+  
+  class Meta:
+    indexes = [
+      models.Index(fields=['user', 'name'], name='tag_user_name_idx'),
+    ]
   
   def __str__(self):
     return self.name
@@ -74,6 +242,14 @@ class Tag(models.Model):
 class Ingredient(models.Model):
   name = models.CharField(max_length=255)
   user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+  updated_at = models.DateTimeField(auto_now=True)
+  
+  objects = RecipeAttrManager()
+  
+  class Meta:
+    indexes = [
+      models.Index(fields=['user', 'name'], name='ingredient_user_name_idx'),
+    ]
   
   def __str__(self):
     return self.name
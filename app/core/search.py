@@ -0,0 +1,91 @@
+'''
+Full-text search support for recipes.
+
+Recipe.search_vector holds a weighted tsvector of the title (A),
+description (B) and tag/ingredient names (C). It is recomputed in SQL
+for just the recipes touched by a write, once per transaction.
+'''
+import threading
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+  SearchQuery, SearchRank, SearchVector
+)
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value, FloatField
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = 'english'
+
+_pending = threading.local()
+
+
+def search_enabled():
+  return connection.vendor == 'postgresql'
+
+
+def _names(model):
+  return Subquery(
+    model.objects
+    .filter(recipe=OuterRef('pk'))
+    .values('recipe')
+    .annotate(names=StringAgg('name', delimiter=' '))
+    .values('names')
+  )
+
+
+def build_search_vector():
+  from core.models import Tag, Ingredient
+  return (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    + SearchVector(_names(Tag), weight='C', config=SEARCH_CONFIG)
+    + SearchVector(_names(Ingredient), weight='C', config=SEARCH_CONFIG)
+  )
+
+
+def update_search_vectors(recipe_ids):
+  '''Recompute search_vector for the given recipes in one UPDATE'''
+  from core.models import Recipe
+  if not search_enabled():
+    return 0
+  return Recipe.objects.filter(pk__in=recipe_ids).update(
+    search_vector=build_search_vector()
+  )
+
+
+def schedule_search_update(recipe_ids):
+  '''Queue recipes for a search_vector refresh when the transaction commits
+
+  Several writes to one recipe in a transaction (the row, then its tags,
+  then its ingredients) collapse into a single UPDATE.
+  '''
+  if not search_enabled():
+    return
+  pending = getattr(_pending, 'ids', None)
+  if pending is None:
+    pending = _pending.ids = set()
+  pending.update(recipe_ids)
+  transaction.on_commit(_flush)
+
+
+def _flush():
+  ids = getattr(_pending, 'ids', None)
+  if ids:
+    _pending.ids = set()
+    update_search_vectors(ids)
+
+
+def search_recipes(queryset, text):
+  '''Filter queryset to recipes matching text, annotated with a rank'''
+  if not search_enabled():
+    return queryset.filter(
+      Q(title__icontains=text) | Q(description__icontains=text)
+    ).annotate(rank=Value(1.0, output_field=FloatField()))
+
+  query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+  # ts_rank is a real; as a double precision the cursor's str(rank)
+  # compares exactly equal to the row it came from on the next page
+  return queryset.filter(search_vector=query).annotate(
+    rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+  )
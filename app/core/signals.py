@@ -0,0 +1,131 @@
+'''
+Signal handlers that keep denormalised recipe data in step with writes.
+
+A recipe's search_vector and updated_at both depend on its tags and
+ingredients, so link changes and tag/ingredient renames or deletes are
+propagated to every affected recipe here. Image references are counted
+here too, so gc_images knows which stored files are still in use.
+'''
+import os
+
+from django.db.models.signals import (
+  post_init, post_save, pre_delete, post_delete, m2m_changed
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (
+  Recipe, RecipeImageRendition, RecipeImageUpload, Tag, Ingredient, ImageBlob
+)
+from core.search import schedule_search_update
+
+SEARCH_FIELDS = {'title', 'description'}
+
+
+def recipes_changed(recipe_ids):
+  '''Touch updated_at and queue a search refresh for related-data changes'''
+  recipe_ids = list(recipe_ids)
+  if not recipe_ids:
+    return
+  Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+  schedule_search_update(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields=None, **kwargs):
+  if (
+    update_fields is not None
+    and not SEARCH_FIELDS.intersection(update_fields)
+  ):
+    return
+  schedule_search_update([instance.pk])
+
+
+def _recipe_ids_for(instance):
+  field = 'tags' if isinstance(instance, Tag) else 'ingredients'
+  return list(
+    Recipe.objects.filter(**{field: instance}).values_list('pk', flat=True)
+  )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+  if not reverse:
+    if (
+      action in ('post_add', 'post_remove') and pk_set
+      or action == 'post_clear'
+    ):
+      recipes_changed([instance.pk])
+    return
+  # tag.recipe_set.add(...) and friends: pk_set holds recipe ids
+  if action == 'pre_clear':
+    instance._cleared_recipe_ids = _recipe_ids_for(instance)
+  elif action == 'post_clear':
+    recipes_changed(getattr(instance, '_cleared_recipe_ids', []))
+  elif action in ('post_add', 'post_remove') and pk_set:
+    recipes_changed(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_attr_saved(sender, instance, created, **kwargs):
+  if not created:
+    recipes_changed(_recipe_ids_for(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def recipe_attr_deleting(sender, instance, **kwargs):
+  instance._linked_recipe_ids = _recipe_ids_for(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def recipe_attr_deleted(sender, instance, **kwargs):
+  recipes_changed(getattr(instance, '_linked_recipe_ids', []))
+
+
+def _loaded_image(instance):
+  # Read the raw attribute so a deferred images field is not fetched
+  value = instance.__dict__.get('images')
+  return getattr(value, 'name', value) or None
+
+
+@receiver(post_init, sender=Recipe)
+def recipe_loaded(sender, instance, **kwargs):
+  instance._stored_image = _loaded_image(instance)
+  
+  
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(
+  sender, instance, created, update_fields=None, **kwargs
+):
+  if update_fields is not None and 'images' not in update_fields:
+    return
+  # post_init also runs for unsaved instances, so nothing was stored yet
+  stored = None if created else instance._stored_image
+  current = _loaded_image(instance)
+  if current == stored:
+    return
+  ImageBlob.objects.acquire([current])
+  ImageBlob.objects.release([stored])
+  instance._stored_image = current
+  
+  
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+  ImageBlob.objects.release([instance._stored_image])
+  
+  
+@receiver(post_delete, sender=RecipeImageRendition)
+def rendition_deleted(sender, instance, **kwargs):
+  ImageBlob.objects.release([instance.file.name])
+
+
+@receiver(post_delete, sender=RecipeImageUpload)
+def upload_deleted(sender, instance, **kwargs):
+  try:
+    os.remove(instance.path)
+  except FileNotFoundError:
+    pass
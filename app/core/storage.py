@@ -0,0 +1,67 @@
+'''
+Content-addressed storage for recipe images.
+
+Files are named after the SHA-256 of their bytes, so the same photo
+uploaded to any number of recipes is stored once. The upload is hashed
+while it is streamed to a temporary file next to its final location and
+then renamed into place, so it is never held in memory in full.
+
+Deleting is left to reference counting (core.models.ImageBlob) and the
+gc_images management command; save() never removes an existing file.
+'''
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+TEMP_PREFIX = '.tmp-'
+
+
+def content_name(name, digest):
+  '''Return the content-addressed name for a file uploaded as name'''
+  directory, basename = os.path.split(name)
+  ext = os.path.splitext(basename)[1].lower()
+  return os.path.join(directory, digest[:2], f'{digest}{ext}')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+  hash_name = 'sha256'
+
+  def get_available_name(self, name, max_length=None):
+    # Names are derived from content in _save(); an existing file with
+    # the same name is the same file.
+    return name
+
+  def _save(self, name, content):
+    directory = os.path.dirname(self.path(name))
+    os.makedirs(directory, exist_ok=True)
+
+    digest = hashlib.new(self.hash_name)
+    fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=directory)
+    try:
+      with os.fdopen(fd, 'wb') as temp:
+        if hasattr(content, 'seek'):
+          content.seek(0)
+        for chunk in content.chunks():
+          digest.update(chunk)
+          temp.write(chunk)
+
+      name = content_name(name, digest.hexdigest())
+      full_path = self.path(name)
+      os.makedirs(os.path.dirname(full_path), exist_ok=True)
+      if os.path.exists(full_path):
+        # Deduplicated; refresh the mtime so gc_images sees it as in use
+        os.utime(full_path)
+      else:
+        if self.file_permissions_mode is not None:
+          os.chmod(temp_path, self.file_permissions_mode)
+        os.replace(temp_path, full_path)
+    finally:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+    return name.replace('\\', '/')
+
+
+def image_storage():
+  return ContentAddressedStorage()
@@ -0,0 +1,20 @@
+"""
+Test runner for the project
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+  '''DiscoverRunner with request throttling and replica reads switched off
+
+  Every test client shares one IP, so throttle state would leak between
+  tests; throttle tests turn it back on with override_settings. Replicas
+  mirror the test database, but over their own connections, which can't
+  see the transaction each TestCase runs in.
+  '''
+
+  def setup_test_environment(self, **kwargs):
+    super().setup_test_environment(**kwargs)
+    settings.THROTTLE_ENABLED = False
+    settings.DATABASE_REPLICAS = []
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import include, path
+
+from core.async_views import READ_METHODS, offload, offload_patterns
+
+
+def thread_name_view(request):
+  return HttpResponse(threading.current_thread().name)
+
+
+class OffloadTests(SimpleTestCase):
+  def test_wsgi_mode_returns_view_unchanged(self):
+    self.assertIs(offload(thread_name_view), thread_name_view)
+
+  @override_settings(SERVER_MODE='asgi', PASSWORD_HASHING_WORKERS=2)
+  def test_asgi_mode_runs_view_in_pool(self):
+    view = offload(thread_name_view, pool='test-pool')
+
+    self.assertTrue(asyncio.iscoroutinefunction(view))
+    response = asyncio.run(view(RequestFactory().get('/')))
+    self.assertTrue(response.content.decode().startswith('test-pool'))
+
+  @override_settings(SERVER_MODE='asgi')
+  def test_other_methods_use_sync_thread(self):
+    view = offload(thread_name_view, pool='read-pool', methods=READ_METHODS)
+
+    response = asyncio.run(view(RequestFactory().post('/')))
+    self.assertFalse(response.content.decode().startswith('read-pool'))
+    response = asyncio.run(view(RequestFactory().get('/')))
+    self.assertTrue(response.content.decode().startswith('read-pool'))
+
+  @override_settings(SERVER_MODE='asgi')
+  def test_streaming_response_is_buffered(self):
+    def streaming_view(request):
+      response = StreamingHttpResponse(
+        iter([b'a', b'b']), content_type='text/plain'
+      )
+      response['X-Test'] = '1'
+      return response
+
+    response = asyncio.run(offload(streaming_view)(RequestFactory().get('/')))
+
+    self.assertFalse(response.streaming)
+    self.assertEqual(response.content, b'ab')
+    self.assertEqual(response['X-Test'], '1')
+
+
+class OffloadPatternsTests(SimpleTestCase):
+  patterns = [
+    path('a/', thread_name_view, name='a'),
+    path('b/', include([path('c/', thread_name_view, name='c')])),
+  ]
+
+  def test_wsgi_mode_returns_patterns_unchanged(self):
+    self.assertIs(offload_patterns(self.patterns), self.patterns)
+
+  @override_settings(SERVER_MODE='asgi')
+  def test_asgi_mode_wraps_nested_views(self):
+    offloaded = offload_patterns(self.patterns, pool='api-read')
+
+    self.assertEqual(offloaded[0].name, 'a')
+    self.assertTrue(asyncio.iscoroutinefunction(offloaded[0].callback))
+    nested = offloaded[1].url_patterns[0]
+    self.assertEqual(nested.name, 'c')
+    self.assertTrue(asyncio.iscoroutinefunction(nested.callback))
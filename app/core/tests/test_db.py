@@ -0,0 +1,207 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.backends.sqlite3 import base as sqlite3
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import base
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.db.stats import connection_stats
+from user.serializers import TokenObtainPairSerializer
+
+METRICS_URL = reverse('db-metrics')
+
+
+class FakeConnection:
+  def __init__(self):
+    self.closed = False
+
+  def close(self):
+    self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+  def make_pool(self, **kwargs):
+    self.created = []
+
+    def connect():
+      self.created.append(FakeConnection())
+      return self.created[-1]
+
+    return ConnectionPool(connect, **kwargs)
+
+  def test_reuses_returned_connections(self):
+    pool = self.make_pool(max_size=2)
+
+    first = pool.get()
+    pool.put(first)
+
+    self.assertIs(pool.get(), first)
+    self.assertEqual(len(self.created), 1)
+    self.assertEqual(pool.stats()['in_use'], 1)
+
+  def test_waits_for_a_connection_when_full(self):
+    pool = self.make_pool(max_size=1, timeout=5)
+    first = pool.get()
+    timer = threading.Timer(0.05, pool.put, [first])
+    timer.start()
+
+    self.assertIs(pool.get(), first)
+    timer.join()
+    self.assertEqual(pool.stats()['waits'], 1)
+
+  def test_times_out_when_full(self):
+    pool = self.make_pool(max_size=1, timeout=0.01)
+    pool.get()
+
+    with self.assertRaises(PoolTimeout):
+      pool.get()
+    self.assertEqual(pool.stats()['timeouts'], 1)
+
+  def test_discard_frees_the_slot(self):
+    pool = self.make_pool(max_size=1, timeout=0.01)
+    first = pool.get()
+    pool.discard(first)
+
+    self.assertTrue(first.closed)
+    self.assertIsNot(pool.get(), first)
+
+  def test_replaces_stale_and_unhealthy_connections(self):
+    pool = self.make_pool(max_size=2, max_age=0)
+    first = pool.get()
+    pool.put(first)
+    self.assertIsNot(pool.get(), first)
+    self.assertTrue(first.closed)
+
+    pool = self.make_pool(max_size=2)
+    first = pool.get()
+    pool.put(first)
+    self.assertIsNot(pool.get(check=lambda c: False), first)
+    self.assertTrue(first.closed)
+
+
+class CheckedWrapper(base.ConnectionManagementMixin, sqlite3.DatabaseWrapper):
+  pass
+
+
+class HealthCheckTests(SimpleTestCase):
+  def setUp(self):
+    connection_stats.reset()
+    # sqlite3 never closes in-memory databases, so use a file
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    settings_dict = dict(
+      connection.settings_dict,
+      NAME=os.path.join(directory.name, 'db.sqlite3'),
+      CONN_MAX_AGE=None,
+    )
+    settings_dict['CONN_HEALTH_CHECKS'] = True
+    self.wrapper = CheckedWrapper(settings_dict, alias='checked')
+    self.addCleanup(self.wrapper.close)
+
+  def test_reused_connection_checked_once_per_request(self):
+    self.wrapper.ensure_connection()
+    first = self.wrapper.connection
+    self.wrapper.close_if_unusable_or_obsolete()
+
+    with mock.patch.object(
+      self.wrapper, 'is_usable', return_value=True
+    ) as is_usable:
+      self.wrapper.ensure_connection()
+      self.wrapper.ensure_connection()
+
+    self.assertIs(self.wrapper.connection, first)
+    is_usable.assert_called_once()
+    stats = connection_stats.get('checked')
+    self.assertEqual(stats['opened'], 1)
+    self.assertEqual(stats['reused'], 1)
+
+  def test_reconnects_when_check_fails(self):
+    self.wrapper.ensure_connection()
+    first = self.wrapper.connection
+    self.wrapper.close_if_unusable_or_obsolete()
+
+    with mock.patch.object(self.wrapper, 'is_usable', return_value=False):
+      self.wrapper.ensure_connection()
+
+    self.assertIsNot(self.wrapper.connection, first)
+    stats = connection_stats.get('checked')
+    self.assertEqual(stats['health_check_failures'], 1)
+    self.assertEqual(stats['opened'], 2)
+
+
+class TransactionPoolingTests(SimpleTestCase):
+  def make_wrapper(self, **settings):
+    settings_dict = dict(connection.settings_dict, **settings)
+    return base.DatabaseWrapper(settings_dict, alias='pooled')
+
+  def test_iterator_uses_client_cursor_unless_requested(self):
+    wrapper = self.make_wrapper(TRANSACTION_POOLING=True)
+    parent = base.base.DatabaseWrapper
+    with mock.patch.object(wrapper, 'cursor') as cursor, \
+        mock.patch.object(parent, 'chunked_cursor') as named:
+      wrapper.chunked_cursor()
+      cursor.assert_called_once()
+      named.assert_not_called()
+
+      wrapper.server_side_cursors_requested = True
+      wrapper.chunked_cursor()
+      named.assert_called_once()
+
+  def test_server_side_cursors_without_transaction_pooling(self):
+    wrapper = self.make_wrapper()
+    parent = base.base.DatabaseWrapper
+    with mock.patch.object(parent, 'chunked_cursor') as named:
+      wrapper.chunked_cursor()
+    named.assert_called_once()
+
+
+class DatabaseMetricsApiTests(TestCase):
+  def setUp(self):
+    self.client = APIClient()
+
+  def test_requires_staff(self):
+    user = get_user_model().objects.create_user(
+      'user@example.com', 'testpass123'
+    )
+    self.client.force_authenticate(user=user)
+
+    res = self.client.get(METRICS_URL)
+
+    self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+  def test_reports_each_database(self):
+    admin = get_user_model().objects.create_superuser(
+      'admin@example.com', 'testpass123'
+    )
+    self.client.force_authenticate(user=admin)
+
+    res = self.client.get(METRICS_URL)
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    default = res.data['databases']['default']
+    self.assertIn('conn_max_age', default)
+    self.assertIn('opened', default['connections'])
+    self.assertIsNone(default['pool'])
+
+  def test_demoted_admin_refused_despite_token_claim(self):
+    admin = get_user_model().objects.create_superuser(
+      'admin@example.com', 'testpass123'
+    )
+    token = TokenObtainPairSerializer.get_token(admin).access_token
+    self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    res = self.client.get(METRICS_URL)
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    admin.is_staff = False
+    admin.save()
+    res = self.client.get(METRICS_URL)
+
+    self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,163 @@
+import datetime
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import fastjson
+from core.fastjson import FastJSONParser, FastJSONRenderer
+
+SAMPLE = OrderedDict([
+  ('id', 1),
+  ('title', 'Crème brûlée \u2028 line \u2029 "quoted" </script>'),
+  ('price', '12.50'),
+  ('raw_price', Decimal('12.50')),
+  ('images', 'http://testserver/media/uploads/recipe/caf%C3%A9.png?v=1&w=320'),
+  ('link', ''),
+  ('renditions', [{'name': 'thumb', 'width': 320, 'url': None}]),
+  (
+    'created',
+    datetime.datetime(2024, 5, 1, 12, 30, 15, 250, tzinfo=timezone.utc),
+  ),
+  ('naive', datetime.datetime(2024, 5, 1, 12, 30)),
+  ('day', datetime.date(2024, 5, 1)),
+  ('at', datetime.time(7, 45, 1)),
+  ('uid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+  ('lazy', gettext_lazy('This field is required.')),
+  ('error', ErrorDetail('Invalid', code='invalid')),
+  ('counts', {1: 'one', 2: 'two'}),
+  ('ratio', 0.1),
+  ('flags', (True, False, None)),
+])
+
+
+@skipIf(fastjson.orjson is None, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+  def test_renders_the_same_bytes_as_drf(self):
+    self.assertEqual(
+      FastJSONRenderer().render(SAMPLE), JSONRenderer().render(SAMPLE)
+    )
+
+  def test_integers_past_64_bits_render_like_drf(self):
+    data = {'big': 2 ** 70, 'small': -2 ** 63}
+    self.assertEqual(
+      FastJSONRenderer().render(data), JSONRenderer().render(data)
+    )
+
+  def test_float_exponents_differ_only_in_bytes(self):
+    data = {'big': 1e20, 'small': 1.5e-7}
+    rendered = FastJSONRenderer().render(data)
+
+    self.assertEqual(rendered, b'{"big":1e20,"small":1.5e-7}')
+    drf = JSONRenderer().render(data)
+    self.assertEqual(json.loads(rendered), json.loads(drf))
+
+  def test_escapes_line_separators(self):
+    self.assertIn(b'\\u2028', FastJSONRenderer().render({'text': '\u2028'}))
+
+  def test_indented_output_matches_drf(self):
+    media_type = 'application/json; indent=4'
+    self.assertEqual(
+      FastJSONRenderer().render(SAMPLE, media_type),
+      JSONRenderer().render(SAMPLE, media_type),
+    )
+
+  def test_none_renders_empty(self):
+    self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONFallbackTests(SimpleTestCase):
+  @patch('core.fastjson.orjson', None)
+  def test_matches_drf_without_orjson(self):
+    self.assertEqual(
+      FastJSONRenderer().render(SAMPLE), JSONRenderer().render(SAMPLE)
+    )
+    body = b'{"price": 7.5, "tags": [{"name": "Vegan"}]}'
+    self.assertEqual(
+      FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body))
+    )
+
+  @override_settings(API_JSON='stdlib')
+  def test_loads_uses_json_when_selected(self):
+    with patch('core.fastjson.orjson') as orjson:
+      self.assertEqual(fastjson.loads('{"a": [1, 2.5]}'), {'a': [1, 2.5]})
+    orjson.loads.assert_not_called()
+
+
+@skipIf(fastjson.orjson is None, 'orjson is not installed')
+class FastJSONParserTests(SimpleTestCase):
+  def parse(self, parser, body, encoding='utf-8'):
+    return parser.parse(
+      BytesIO(body), 'application/json', {'encoding': encoding}
+    )
+
+  def test_parses_the_same_data_as_drf(self):
+    body = (
+      '{"title": "Pâté", "price": 7.5, "time_minutes": 30, '
+      '"tags": [{"name": "Vegan"}], "big": 123456789012345678901234567890}'
+    ).encode()
+    self.assertEqual(
+      self.parse(FastJSONParser(), body), self.parse(JSONParser(), body)
+    )
+
+  def test_errors_match_drf(self):
+    for body in (b'{"title": ', b'{"price": NaN}', b'\xff'):
+      with self.subTest(body=body):
+        with self.assertRaises(ParseError) as expected:
+          self.parse(JSONParser(), body)
+        with self.assertRaises(ParseError) as raised:
+          self.parse(FastJSONParser(), body)
+        self.assertEqual(
+          str(raised.exception.detail), str(expected.exception.detail)
+        )
+
+  def test_other_encodings(self):
+    body = '{"title": "Pâté"}'.encode('utf-16')
+    self.assertEqual(
+      self.parse(FastJSONParser(), body, 'utf-16'), {'title': 'Pâté'}
+    )
+
+  def test_loads_keeps_long_integers_exact(self):
+    self.assertEqual(
+      fastjson.loads('[123456789012345678901234567890, 1.5]'),
+      [123456789012345678901234567890, 1.5],
+    )
+
+  def test_loads_reports_errors_like_json(self):
+    with self.assertRaisesMessage(
+      ValueError, 'Expecting value: line 1 column 1 (char 0)'
+    ):
+      fastjson.loads('nope')
+
+
+class FastJSONAPITests(TestCase):
+  def setUp(self):
+    self.client = APIClient()
+    self.user = get_user_model().objects.create_user(
+      'json@example.com', 'test1234'
+    )
+    self.client.force_authenticate(self.user)
+
+  def test_numeric_price_is_stored_exactly(self):
+    res = self.client.post(
+      reverse('recipe:recipe-list'),
+      '{"title": "Toast", "time_minutes": 5, "price": 7.1}',
+      content_type='application/json',
+    )
+
+    self.assertEqual(res.status_code, 201)
+    self.assertIn(b'"price":"7.10"', res.content)
+    self.assertEqual(res.data['price'], '7.10')
@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import images
+from core.models import Recipe, RecipeImageRendition
+
+MEDIA_ROOT = tempfile.mkdtemp()
+ORIENTATION = 0x0112
+
+
+def make_image(size=(1200, 800), fmt='JPEG', orientation=None):
+  image = Image.new('RGB', size, color=(200, 80, 40))
+  buffer = BytesIO()
+  kwargs = {}
+  if orientation is not None:
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    kwargs['exif'] = exif
+  image.save(buffer, format=fmt, **kwargs)
+  return buffer.getvalue()
+
+
+@override_settings(
+  MEDIA_ROOT=MEDIA_ROOT,
+  RECIPE_IMAGE_RENDITIONS={'thumbnail': (100, 100), 'medium': (400, 400)},
+  RECIPE_IMAGE_RENDITION_FORMATS=['jpeg'],
+)
+class RenditionTests(TestCase):
+  @classmethod
+  def tearDownClass(cls):
+    super().tearDownClass()
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'img@example.com', 'test1234'
+    )
+
+  def create_recipe(self, data):
+    recipe = Recipe.objects.create(
+      user=self.user, title='Toast', time_minutes=5, price='1.00'
+    )
+    recipe.images = SimpleUploadedFile(
+      'toast.jpg', data, content_type='image/jpeg'
+    )
+    recipe.save()
+    return recipe
+
+  def test_renditions_record_dimensions(self):
+    recipe = self.create_recipe(make_image((1200, 800)))
+    images.generate_renditions(recipe.id)
+
+    sizes = {
+      r.name: (r.width, r.height)
+      for r in RecipeImageRendition.objects.filter(recipe=recipe)
+    }
+    self.assertEqual(sizes, {'thumbnail': (100, 67), 'medium': (400, 267)})
+    for rendition in recipe.renditions.all():
+      with Image.open(rendition.file) as image:
+        self.assertEqual(image.size, (rendition.width, rendition.height))
+
+  def test_renditions_strip_metadata_and_apply_orientation(self):
+    # Orientation 6 means the stored pixels are rotated 90 degrees
+    recipe = self.create_recipe(make_image((800, 400), orientation=6))
+    images.generate_renditions(recipe.id)
+
+    rendition = recipe.renditions.get(name='medium')
+    self.assertEqual((rendition.width, rendition.height), (200, 400))
+    with Image.open(rendition.file) as image:
+      self.assertNotIn(ORIENTATION, image.getexif())
+
+  def test_regenerating_replaces_renditions(self):
+    recipe = self.create_recipe(make_image())
+    images.generate_renditions(recipe.id)
+    first = set(recipe.renditions.values_list('pk', 'file'))
+    images.generate_renditions(recipe.id, reuse=False)
+
+    current = set(recipe.renditions.values_list('pk', 'file'))
+    self.assertEqual(len(current), 2)
+    self.assertTrue(
+      {pk for pk, _ in first}.isdisjoint(pk for pk, _ in current)
+    )
+    # Identical output is stored under the same content-addressed name
+    self.assertEqual({f for _, f in first}, {f for _, f in current})
+
+  def test_shared_image_reuses_renditions(self):
+    data = make_image()
+    first = self.create_recipe(data)
+    images.generate_renditions(first.id)
+    second = self.create_recipe(data)
+
+    with patch('core.images.render') as render:
+      images.generate_renditions(second.id)
+
+    render.assert_not_called()
+    self.assertEqual(
+      set(first.renditions.values_list('name', 'file', 'width', 'height')),
+      set(second.renditions.values_list('name', 'file', 'width', 'height')),
+    )
+
+  def test_recipe_without_image_is_skipped(self):
+    recipe = Recipe.objects.create(
+      user=self.user, title='Plain', time_minutes=5, price='1.00'
+    )
+    self.assertEqual(images.generate_renditions(recipe.id), [])
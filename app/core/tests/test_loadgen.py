@@ -0,0 +1,62 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from core.loadgen import percentile, run_load
+
+
+async def serve(reader, writer):
+  '''Answer every request on the connection with a small JSON body'''
+  while True:
+    try:
+      request = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+      break
+    status = b'404 Not Found' if b' /missing ' in request else b'200 OK'
+    writer.write(
+      b'HTTP/1.1 ' + status + b'\r\nContent-Type: application/json\r\n'
+      b'Transfer-Encoding: chunked\r\n\r\n2\r\n{}\r\n0\r\n\r\n'
+    )
+    await writer.drain()
+  writer.close()
+
+
+class LoadgenTests(SimpleTestCase):
+  def test_percentile(self):
+    values = list(range(1, 101))
+
+    self.assertEqual(percentile(values, 50), 50)
+    self.assertEqual(percentile(values, 99), 99)
+    self.assertEqual(percentile(values, 100), 100)
+    self.assertEqual(percentile([], 99), 0.0)
+
+  def test_run_load_records_each_label(self):
+    async def main():
+      server = await asyncio.start_server(serve, '127.0.0.1', 0)
+      port = server.sockets[0].getsockname()[1]
+
+      async def scenario(client):
+        response = await client.request('GET', '/tags/', label='tags')
+        assert response.json() == {}
+        await client.request('GET', '/missing', label='missing')
+
+      try:
+        return await run_load(
+          f'http://127.0.0.1:{port}', scenario, concurrency=3, duration=0.2
+        )
+      finally:
+        server.close()
+        await server.wait_closed()
+
+    summary = asyncio.run(main())
+
+    self.assertGreater(summary['tags']['requests'], 0)
+    self.assertEqual(summary['tags']['non_2xx'], 0)
+    self.assertEqual(
+      summary['missing']['non_2xx'], summary['missing']['requests']
+    )
+    self.assertEqual(
+      summary['total']['requests'],
+      summary['tags']['requests'] + summary['missing']['requests'],
+    )
+    self.assertEqual(summary['total']['errors'], 0)
@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+
+from core.management.commands.loadtest import parse_mix
+
+
+class ParseMixTests(SimpleTestCase):
+  def test_weights(self):
+    self.assertEqual(
+      parse_mix('recipes=5, upload , token=0'),
+      {'recipes': 5, 'upload': 1, 'token': 0},
+    )
+
+  def test_rejects_unknown_operations_and_bad_weights(self):
+    for mix in ('recipes=2,sleep=1', 'recipes=many', 'recipes=-1', 'token=0'):
+      with self.subTest(mix=mix), self.assertRaises(CommandError):
+        parse_mix(mix)
+
+
+@override_settings(
+  RECIPE_IMAGE_PROCESSING='sync',
+  PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LoadTestCommandTests(LiveServerTestCase):
+  def setUp(self):
+    self.media_root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+    paths = override_settings(
+      MEDIA_ROOT=self.media_root,
+      RECIPE_UPLOAD_DIR=os.path.join(self.media_root, 'uploads'),
+    )
+    paths.enable()
+    self.addCleanup(paths.disable)
+
+  def test_every_operation_succeeds(self):
+    output = os.path.join(self.media_root, 'results.json')
+
+    call_command(
+      'loadtest', url=self.live_server_url, concurrency=[1], duration=0.5,
+      mix='register=1,token=1,recipes=1,attributes=1,upload=1',
+      json_path=output,
+      stdout=StringIO(),
+    )
+
+    with open(output) as results:
+      summary = json.load(results)['1']
+    self.assertGreater(summary['total']['requests'], 0)
+    self.assertEqual(summary['total']['errors'], 0)
+    self.assertEqual(summary['total']['non_2xx'], 0)
+    # Each virtual user registers one account to act as during setup
+    self.assertTrue(
+      get_user_model().objects.filter(email__startswith='loadtest-').exists()
+    )
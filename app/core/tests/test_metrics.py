@@ -0,0 +1,204 @@
+import asyncio
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import metrics
+from core.async_views import offload
+from core.models import Tag
+from user.authentication import active_users
+
+TAGS_URL = reverse('recipe:tag-list')
+METRICS_URL = reverse('metrics')
+
+
+class RegistryTests(SimpleTestCase):
+  def test_collect_sums_every_thread(self):
+    registry = metrics.Registry()
+    key = ('recipe:tag-list', 'GET', '200')
+
+    def observe():
+      registry.observe(key, 0.02, metrics.RequestStats(), 100)
+
+    threads = [threading.Thread(target=observe) for _ in range(3)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    observe()
+
+    row = registry.collect()[key]
+    self.assertEqual(row[metrics.COUNT], 4)
+    self.assertEqual(row[metrics.BYTES], 400)
+    # 0.02s falls in the 0.025 bucket
+    bucket = metrics.BUCKETS + metrics.LATENCY_BUCKETS.index(0.025)
+    self.assertEqual(row[bucket], 4)
+
+  @override_settings(SERVER_MODE='asgi')
+  def test_queries_in_thread_pools_count_for_the_request(self):
+    def view(request):
+      metrics.execute_wrapper(lambda *args: None, 'SELECT 1', None, False, {})
+      return HttpResponse()
+
+    stats = metrics.RequestStats()
+    token = metrics._current.set(stats)
+    try:
+      request = RequestFactory().get('/')
+      asyncio.run(offload(view, pool='metrics-test')(request))
+    finally:
+      metrics._current.reset(token)
+
+    self.assertEqual(stats.queries, 1)
+
+  def test_async_requests_are_recorded_without_a_sync_hop(self):
+    async def view(request):
+      return HttpResponse(b'hello')
+
+    registry = metrics.registry
+    metrics.registry = metrics.Registry()
+    try:
+      middleware = metrics.MetricsMiddleware(view)
+      self.assertTrue(asyncio.iscoroutinefunction(middleware))
+      response = asyncio.run(middleware(RequestFactory().get('/')))
+      row = metrics.registry.collect()[('unmatched', 'GET', '200')]
+    finally:
+      metrics.registry = registry
+
+    self.assertEqual(response.content, b'hello')
+    self.assertEqual(row[metrics.COUNT], 1)
+    self.assertEqual(row[metrics.BYTES], 5)
+
+  def test_asgi_middleware_chain_stays_async(self):
+    handler = ASGIHandler()
+
+    # Were any middleware sync-only, the chain would start with SyncToAsync
+    self.assertIsInstance(
+      handler._middleware_chain.__wrapped__, metrics.MetricsMiddleware
+    )
+
+
+class MetricsMiddlewareTests(TestCase):
+  def setUp(self):
+    metrics.registry.reset()
+    self.user = get_user_model().objects.create_user(
+      'user@example.com', 'testpass123'
+    )
+    Tag.objects.create(user=self.user, name='Vegan')
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+
+  def test_records_route_queries_and_bytes(self):
+    res = self.client.get(TAGS_URL)
+
+    row = metrics.registry.collect()[('recipe:tag-list', 'GET', '200')]
+    self.assertEqual(row[metrics.COUNT], 1)
+    self.assertGreater(row[metrics.QUERIES], 0)
+    self.assertGreater(row[metrics.SERIALIZATION], 0)
+    self.assertEqual(row[metrics.BYTES], len(res.content))
+
+  @override_settings(METRICS_TOKEN='secret')
+  def scrape(self, **extra):
+    return self.client.get(
+      METRICS_URL, HTTP_AUTHORIZATION='Bearer secret', **extra
+    )
+
+  def test_exports_prometheus_text(self):
+    self.client.get(TAGS_URL)
+
+    res = self.scrape()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertTrue(res['Content-Type'].startswith('text/plain'))
+    body = res.content.decode()
+    self.assertIn(
+      'http_request_duration_seconds_count'
+      '{route="recipe:tag-list",method="GET",status="200"} 1',
+      body,
+    )
+    self.assertIn('# TYPE http_request_db_queries_total counter', body)
+    self.assertIn(
+      'db_connection_events_total{alias="default",event="opened"}', body
+    )
+
+  def test_exports_auth_cache_counters(self):
+    active_users.clear()
+    self.addCleanup(active_users.clear)
+    active_users.get(self.user.id)
+    active_users.set(self.user.id, True)
+    active_users.get(self.user.id)
+    active_users.get(self.user.id)
+
+    body = self.scrape().content.decode()
+
+    self.assertIn('# TYPE auth_cache_lookups_total counter', body)
+    self.assertIn(
+      'auth_cache_lookups_total{cache="active_users",result="hit"} 2', body
+    )
+    self.assertIn(
+      'auth_cache_lookups_total{cache="active_users",result="miss"} 1', body
+    )
+    self.assertIn(
+      'auth_cache_lookups_total{cache="validated_tokens",result="miss"}', body
+    )
+    self.assertIn('auth_cache_evictions_total{cache="active_users"} 0', body)
+
+  @override_settings(METRICS_TOKEN='secret')
+  def test_token_required_when_configured(self):
+    self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+    res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+    self.assertEqual(res.status_code, 200)
+
+  def test_denied_by_default(self):
+    self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+    res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+    self.assertEqual(res.status_code, 403)
+
+  @override_settings(METRICS_PUBLIC=True)
+  def test_public_when_opted_in(self):
+    self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+  def test_staff_access_token_allowed(self):
+    staff = get_user_model().objects.create_superuser(
+      'admin@example.com', 'testpass123'
+    )
+    token = RefreshToken.for_user(staff).access_token
+
+    res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION=f'Bearer {token}')
+    self.assertEqual(res.status_code, 200)
+
+    # Checked against the database, not the token's is_staff claim
+    staff.is_staff = False
+    staff.save()
+    res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION=f'Bearer {token}')
+    self.assertEqual(res.status_code, 403)
+
+  def test_non_staff_access_token_denied(self):
+    token = RefreshToken.for_user(self.user).access_token
+
+    res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    self.assertEqual(res.status_code, 403)
+
+  def test_staff_session_allowed(self):
+    staff = get_user_model().objects.create_superuser(
+      'admin@example.com', 'testpass123'
+    )
+    self.client.force_login(staff)
+
+    self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+  @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+  def test_slow_requests_logged_with_sql(self):
+    with self.assertLogs('core.metrics', 'WARNING') as logs:
+      self.client.get(TAGS_URL)
+
+    self.assertIn('recipe:tag-list', logs.output[0])
+    self.assertIn('SELECT', logs.output[0])
@@ -62,4 +62,17 @@ class ModelTest(TestCase):
     mock_uuid.return_value = uuid
     file_path = models.recipe_image_file_path(None, 'example.jpg')
     
-    self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
\ No newline at end of file
+    self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+    
+  def test_get_or_create_many(self):
+    user = create_user()
+    existing = models.Tag.objects.create(user=user, name='Vegan')
+    
+    tags = models.Tag.objects.get_or_create_many(
+      user, ['Vegan', 'Lunch', 'Lunch']
+    )
+    
+    self.assertEqual(list(tags), ['Vegan', 'Lunch'])
+    self.assertEqual(tags['Vegan'], existing)
+    self.assertIsNotNone(tags['Lunch'].pk)
+    self.assertEqual(models.Tag.objects.filter(user=user).count(), 2)
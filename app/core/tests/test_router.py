@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import router
+from core.models import Recipe, Tag
+
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+  def setUp(self):
+    caches['default'].clear()
+    self.router = router.ReplicaRouter()
+
+  def test_reads_use_primary_outside_replica_views(self):
+    self.assertIsNone(self.router.db_for_read(Recipe))
+
+  def test_writes_always_use_primary(self):
+    recipe = Recipe()
+    recipe._state.db = 'replica_0'
+
+    self.assertEqual(
+      self.router.db_for_write(Recipe, instance=recipe), 'default'
+    )
+
+  def test_replicas_are_never_migrated(self):
+    self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+    self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+  def test_sticky_user_reads_from_primary(self):
+    self.assertIn(router.choose_replica(1), ['replica_0', 'replica_1'])
+
+    router.stick_to_primary(1)
+
+    self.assertIsNone(router.choose_replica(1))
+    self.assertIsNotNone(router.choose_replica(2))
+
+  def test_per_process_cache_is_rejected(self):
+    with self.assertRaisesMessage(ImproperlyConfigured, 'LocMemCache'):
+      router.check_sticky_cache()
+
+  @override_settings(
+    CACHES={
+      'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+      'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'sticky',
+      },
+    },
+    DATABASE_REPLICA_CACHE_ALIAS='shared',
+  )
+  def test_shared_cache_is_accepted(self):
+    router.check_sticky_cache()
+
+  @override_settings(DATABASE_REPLICAS=[])
+  def test_cache_not_checked_without_replicas(self):
+    router.check_sticky_cache()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaReadApiTests(TestCase):
+  def setUp(self):
+    caches['default'].clear()
+    self.user = get_user_model().objects.create_user(
+      'user@example.com', 'testpass123'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+    self.read_aliases = []
+
+    # Record where reads would go; the test database is the only real one
+    def db_for_read(router_self, model, **hints):
+      self.read_aliases.append(router._read_alias.get())
+      return None
+
+    patcher = mock.patch.object(
+      router.ReplicaRouter, 'db_for_read', db_for_read
+    )
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_safe_requests_read_from_replica(self):
+    Tag.objects.create(user=self.user, name='Vegan')
+    self.read_aliases.clear()
+
+    res = self.client.get(TAGS_URL)
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertIn('replica_0', self.read_aliases)
+    self.assertIsNone(router._read_alias.get())
+
+  def test_reads_after_write_stay_on_primary(self):
+    tag = Tag.objects.create(user=self.user, name='Vegan')
+    res = self.client.patch(
+      reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Vegetarian'}
+    )
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.read_aliases.clear()
+
+    res = self.client.get(TAGS_URL)
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertTrue(self.read_aliases)
+    self.assertNotIn('replica_0', self.read_aliases)
+
+  def test_failed_write_does_not_stick(self):
+    self.client.patch(ME_URL, {'email': 'not-an-email'})
+
+    self.assertFalse(router.is_sticky(self.user.id))
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+  @classmethod
+  def tearDownClass(cls):
+    super().tearDownClass()
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+  def setUp(self):
+    self.storage = image_storage()
+    self.user = get_user_model().objects.create_user(
+      'blob@example.com', 'test1234'
+    )
+
+  def create_recipe(self, data, name='photo.jpg'):
+    return Recipe.objects.create(
+      user=self.user,
+      title='Soup',
+      time_minutes=5,
+      price='1.00',
+      images=SimpleUploadedFile(name, data),
+    )
+
+  def blob(self, name):
+    return ImageBlob.objects.get(name=name)
+
+  def test_same_content_stored_once(self):
+    first = self.storage.save(
+      'uploads/recipe/a.JPG', ContentFile(b'same bytes')
+    )
+    second = self.storage.save(
+      'uploads/recipe/b.jpg', ContentFile(b'same bytes')
+    )
+    other = self.storage.save(
+      'uploads/recipe/c.jpg', ContentFile(b'other bytes')
+    )
+
+    self.assertEqual(first, second)
+    self.assertNotEqual(first, other)
+    self.assertTrue(first.endswith('.jpg'))
+    directory = os.path.dirname(self.storage.path(first))
+    self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+  def test_references_counted_across_recipes(self):
+    first = self.create_recipe(b'shared image')
+    second = self.create_recipe(b'shared image')
+
+    self.assertEqual(first.images.name, second.images.name)
+    self.assertEqual(self.blob(first.images.name).ref_count, 2)
+
+  def test_replacing_and_deleting_release_references(self):
+    recipe = self.create_recipe(b'old image')
+    old_name = recipe.images.name
+    recipe = Recipe.objects.get(pk=recipe.pk)
+    recipe.images = SimpleUploadedFile('new.jpg', b'new image')
+    recipe.save()
+
+    old = self.blob(old_name)
+    self.assertEqual(old.ref_count, 0)
+    self.assertIsNotNone(old.released_at)
+    self.assertEqual(self.blob(recipe.images.name).ref_count, 1)
+
+    Recipe.objects.filter(pk=recipe.pk).delete()
+    self.assertEqual(self.blob(recipe.images.name).ref_count, 0)
+
+  def test_gc_deletes_released_and_orphaned_files(self):
+    kept = self.create_recipe(b'kept image')
+    dropped = self.create_recipe(b'dropped image')
+    dropped_name = dropped.images.name
+    dropped.delete()
+    orphan = self.storage.save(
+      'uploads/recipe/orphan.jpg', ContentFile(b'orphan')
+    )
+
+    with self.captureOnCommitCallbacks(execute=True):
+      call_command('gc_images', '--grace-seconds=-60', stdout=StringIO())
+
+    self.assertTrue(self.storage.exists(kept.images.name))
+    self.assertFalse(self.storage.exists(dropped_name))
+    self.assertFalse(self.storage.exists(orphan))
+    self.assertFalse(ImageBlob.objects.filter(name=dropped_name).exists())
+
+  def test_gc_respects_grace_period(self):
+    recipe = self.create_recipe(b'recent image')
+    name = recipe.images.name
+    recipe.delete()
+
+    with self.captureOnCommitCallbacks(execute=True):
+      call_command('gc_images', stdout=StringIO())
+
+    self.assertTrue(self.storage.exists(name))
+    self.assertTrue(ImageBlob.objects.filter(name=name).exists())
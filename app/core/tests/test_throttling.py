@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.throttling import take_token
+
+TOKEN_URL = reverse('user:token_obtain_pair')
+TAGS_URL = reverse('recipe:tag-list')
+
+RATES = {
+  'REST_FRAMEWORK': {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+      'user.authentication.TokenUserAuthentication',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+      'core.throttling.AnonBucketThrottle',
+      'core.throttling.UserBucketThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+      'anon': '5/min', 'user': '3/min', 'auth': '2/min'
+    },
+  },
+}
+
+
+class TakeTokenTests(TestCase):
+  def setUp(self):
+    self.cache = caches['default']
+    self.cache.clear()
+
+  def test_burst_then_refill(self):
+    for _ in range(3):
+      self.assertEqual(take_token('bucket', 3, 60, self.cache, now=1000), 0)
+
+    wait = take_token('bucket', 3, 60, self.cache, now=1000)
+    self.assertAlmostEqual(wait, 20)
+    # One token refills every duration / num_requests seconds
+    self.assertEqual(take_token('bucket', 3, 60, self.cache, now=1020), 0)
+    self.assertGreater(take_token('bucket', 3, 60, self.cache, now=1020), 0)
+
+  def test_denied_requests_do_not_consume(self):
+    take_token('bucket', 1, 10, self.cache, now=0)
+    take_token('bucket', 1, 10, self.cache, now=1)
+    take_token('bucket', 1, 10, self.cache, now=2)
+
+    self.assertEqual(take_token('bucket', 1, 10, self.cache, now=10), 0)
+
+
+@override_settings(THROTTLE_ENABLED=True, **RATES)
+class ThrottleAPITests(TestCase):
+  def setUp(self):
+    caches['default'].clear()
+    self.user = get_user_model().objects.create_user(
+      'throttle@example.com', 'test1234'
+    )
+
+  def test_auth_endpoint_limited_with_retry_after(self):
+    client = APIClient()
+    payload = {'email': 'throttle@example.com', 'password': 'wrong'}
+    for _ in range(2):
+      res = client.post(TOKEN_URL, payload)
+      self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    res = client.post(TOKEN_URL, payload)
+
+    self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    self.assertEqual(res['Retry-After'], '30')
+
+  def test_users_have_separate_buckets(self):
+    other = get_user_model().objects.create_user(
+      'other@example.com', 'test1234'
+    )
+    client = APIClient()
+    client.force_authenticate(self.user)
+    for _ in range(3):
+      self.assertEqual(client.get(TAGS_URL).status_code, status.HTTP_200_OK)
+    self.assertEqual(
+      client.get(TAGS_URL).status_code, status.HTTP_429_TOO_MANY_REQUESTS
+    )
+
+    client.force_authenticate(other)
+    self.assertEqual(client.get(TAGS_URL).status_code, status.HTTP_200_OK)
+
+  @override_settings(THROTTLE_ENABLED=False)
+  def test_disabled(self):
+    client = APIClient()
+    for _ in range(4):
+      res = client.post(TOKEN_URL, {'email': 'x@example.com', 'password': 'x'})
+    self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,148 @@
+'''
+Token-bucket throttles for the API.
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per client
+and rewrites it on every request. These throttles store a single number
+per client instead, using GCRA (the generic cell rate algorithm). That
+number is the "theoretical arrival time" of the next request, and it
+behaves exactly like a token bucket holding `num_requests` tokens that
+refills over `duration` seconds. Each check is O(1).
+
+With django-redis the check runs as one Lua script, so it is atomic
+across every worker sharing the Redis server. Other cache backends fall
+back to get/set, which at worst lets a racing request or two through
+and never takes a lock of ours.
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] and are read on
+each request. THROTTLE_ENABLED turns every throttle off.
+'''
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# KEYS[1] bucket; ARGV now, emission interval, burst window (all seconds)
+GCRA_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+local new_tat = tat + interval
+local wait = new_tat - now - window
+if wait > 0 then return tostring(wait) end
+local ttl = math.ceil((new_tat - now) * 1000)
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', ttl)
+return '0'
+'''
+
+_scripts = {}
+
+
+def get_throttle_cache():
+  return caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+def _is_redis(cache):
+  return type(cache).__module__.startswith('django_redis')
+
+
+def _take_redis(cache, key, interval, window, now):
+  from django_redis import get_redis_connection
+
+  client = get_redis_connection(settings.THROTTLE_CACHE_ALIAS)
+  script = _scripts.get(id(client))
+  if script is None:
+    script = _scripts[id(client)] = client.register_script(GCRA_SCRIPT)
+  return float(
+    script(keys=[cache.make_key(key)], args=[now, interval, window])
+  )
+
+
+def take_token(key, num_requests, duration, cache=None, now=None):
+  '''Take a token from the bucket at key
+
+  Returns 0 if the request is allowed, otherwise the seconds until a
+  token is available.
+  '''
+  cache = cache or get_throttle_cache()
+  now = time.time() if now is None else now
+  interval = duration / num_requests
+  if _is_redis(cache):
+    return _take_redis(cache, key, interval, duration, now)
+
+  tat = max(cache.get(key, now), now)
+  new_tat = tat + interval
+  wait = new_tat - now - duration
+  if wait > 0:
+    return wait
+  cache.set(key, new_tat, timeout=math.ceil(new_tat - now))
+  return 0
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+  cache_format = 'throttle:%(scope)s:%(ident)s'
+
+  def get_rate(self):
+    if not getattr(self, 'scope', None):
+      raise ImproperlyConfigured(
+        f"You must set either `.scope` or `.rate` for "
+        f"'{self.__class__.__name__}' throttle"
+      )
+    try:
+      return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+    except KeyError:
+      raise ImproperlyConfigured(
+        f"No default throttle rate set for '{self.scope}' scope"
+      )
+
+  def allow_request(self, request, view):
+    self.retry_after = None
+    if not settings.THROTTLE_ENABLED or self.rate is None:
+      return True
+    self.key = self.get_cache_key(request, view)
+    if self.key is None:
+      return True
+    wait = take_token(self.key, self.num_requests, self.duration)
+    if wait > 0:
+      self.retry_after = wait
+      return False
+    return True
+
+  def wait(self):
+    # DRF turns this into the Retry-After header
+    return math.ceil(self.retry_after) if self.retry_after else None
+
+
+class AnonBucketThrottle(TokenBucketThrottle):
+  '''Per-IP limit for unauthenticated requests'''
+  scope = 'anon'
+
+  def get_cache_key(self, request, view):
+    if request.user and request.user.is_authenticated:
+      return None
+    ident = self.get_ident(request)
+    return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+  '''Per-user limit for authenticated requests'''
+  scope = 'user'
+
+  def get_cache_key(self, request, view):
+    if not (request.user and request.user.is_authenticated):
+      return None
+    return self.cache_format % {'scope': self.scope, 'ident': request.user.id}
+
+
+class AuthBucketThrottle(TokenBucketThrottle):
+  '''Stricter per-IP limit for registration and token endpoints'''
+  scope = 'auth'
+
+  def get_cache_key(self, request, view):
+    ident = self.get_ident(request)
+    return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -0,0 +1,63 @@
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.db.stats import database_metrics
+from core.metrics import export_text
+from user.authentication import CachedJWTAuthentication
+
+
+class DatabaseMetricsView(APIView):
+  '''Connection counters and pool state for this worker process'''
+  # Load the User row: a token's is_staff claim outlives a demotion
+  authentication_classes = [CachedJWTAuthentication]
+  permission_classes = [IsAdminUser]
+
+  @extend_schema(responses=OpenApiTypes.OBJECT)
+  def get(self, request):
+    return Response({'pid': os.getpid(), 'databases': database_metrics()})
+
+
+def _is_staff(request):
+  '''Whether request comes from a staff user, signed in or with an access token
+
+  The token's user is loaded from the database, so a revoked is_staff
+  or is_active takes effect at once.
+  '''
+  if request.user.is_staff:
+    return True
+  try:
+    authenticated = CachedJWTAuthentication().authenticate(request)
+  except AuthenticationFailed:
+    return False
+  return authenticated is not None and authenticated[0].is_staff
+
+
+def can_read_metrics(request):
+  if settings.METRICS_PUBLIC:
+    return True
+  token = settings.METRICS_TOKEN
+  if token and constant_time_compare(
+    request.headers.get('Authorization', ''), f'Bearer {token}'
+  ):
+    return True
+  return _is_staff(request)
+
+
+@require_GET
+def metrics_view(request):
+  '''Request and connection metrics for Prometheus to scrape'''
+  if not can_read_metrics(request):
+    return HttpResponseForbidden()
+  return HttpResponse(
+    export_text(), content_type='text/plain; version=0.0.4; charset=utf-8'
+  )
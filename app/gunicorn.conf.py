@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration for production.
+
+SERVER_MODE selects the stack:
+  wsgi  app.wsgi via gthread workers (processes x threads)
+  asgi  app.asgi via uvicorn workers, one event loop per process; sync
+        work runs in the pools from core/async_views.py
+
+Worker counts default to what each mode needs to keep every core busy
+and can be overridden with WEB_CONCURRENCY / WEB_THREADS.
+"""
+import multiprocessing
+import os
+
+mode = os.environ.get('SERVER_MODE', 'wsgi')
+cores = multiprocessing.cpu_count()
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+if mode == 'asgi':
+  wsgi_app = 'app.asgi:application'
+  worker_class = 'uvicorn.workers.UvicornWorker'
+  # Concurrency comes from the event loop and thread pools, not processes
+  workers = int(os.environ.get('WEB_CONCURRENCY', cores))
+else:
+  wsgi_app = 'app.wsgi:application'
+  worker_class = 'gthread'
+  workers = int(os.environ.get('WEB_CONCURRENCY', cores * 2 + 1))
+  threads = int(os.environ.get('WEB_THREADS', 4))
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.environ.get('MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get('ACCESS_LOG', None)
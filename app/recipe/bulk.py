@@ -0,0 +1,232 @@
+'''
+Streaming bulk import of recipes.
+
+Rows are read incrementally from the request body (NDJSON or a JSON
+array), validated with RecipeSerializer and written chunk by chunk with
+bulk inserts, so memory use depends on the chunk size and not on the
+size of the upload.
+'''
+import codecs
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core import fastjson
+from core.db.router import stick_to_primary
+from core.models import Recipe, Tag, Ingredient
+from core.search import schedule_search_update
+from recipe.cache import invalidate_user
+from recipe.serializers import RecipeSerializer
+
+READ_SIZE = 64 * 1024
+MAX_ROW_SIZE = 1024 * 1024
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl')
+JSON_CONTENT_TYPES = ('application/json',)
+
+
+class ImportStreamError(ValueError):
+  '''The request body could not be parsed as a stream of rows'''
+
+
+def _read_text(stream):
+  decoder = codecs.getincrementaldecoder('utf-8')()
+  while stream is not None:
+    data = stream.read(READ_SIZE)
+    if not data:
+      break
+    yield decoder.decode(data)
+  yield decoder.decode(b'', final=True)
+
+
+def iter_ndjson(stream):
+  '''Yield one decoded row, or an ImportStreamError, per non-blank line'''
+  pending = ''
+  for text in _read_text(stream):
+    pending += text
+    *lines, pending = pending.split('\n')
+    for line in lines:
+      if line.strip():
+        yield _decode_line(line)
+    if len(pending) > MAX_ROW_SIZE:
+      yield ImportStreamError('Row exceeds the maximum row size')
+      return
+  if pending.strip():
+    yield _decode_line(pending)
+
+
+def _decode_line(line):
+  try:
+    return fastjson.loads(line)
+  except ValueError as exc:
+    return ImportStreamError(f'Invalid JSON: {exc}')
+
+
+def iter_json_array(stream):
+  '''Yield the elements of a top level JSON array without loading it whole
+
+  A malformed body ends the stream with an ImportStreamError item.
+  '''
+  try:
+    yield from _iter_json_array(stream)
+  except ImportStreamError as exc:
+    yield exc
+
+
+def _iter_json_array(stream):
+  decoder = json.JSONDecoder()
+  chunks = _read_text(stream)
+  buffer, pos = '', 0
+
+  def fill():
+    nonlocal buffer, pos
+    buffer, pos = buffer[pos:], 0
+    if len(buffer) > MAX_ROW_SIZE:
+      raise ImportStreamError('Row exceeds the maximum row size')
+    for text in chunks:
+      if text:
+        buffer += text
+        return True
+    return False
+
+  def peek():
+    nonlocal pos
+    while True:
+      while pos < len(buffer) and buffer[pos].isspace():
+        pos += 1
+      if pos < len(buffer):
+        return buffer[pos]
+      if not fill():
+        return ''
+
+  if peek() != '[':
+    raise ImportStreamError('Expected a JSON array')
+  pos += 1
+  if peek() == ']':
+    return
+
+  while True:
+    if not peek():
+      raise ImportStreamError('Unexpected end of JSON array')
+    while True:
+      try:
+        value, end = decoder.raw_decode(buffer, pos)
+      except ValueError as exc:
+        if fill():
+          continue
+        raise ImportStreamError(f'Invalid JSON: {exc}')
+      # A value ending exactly at the buffer edge (a number) may continue
+      if end == len(buffer) and fill():
+        continue
+      break
+    yield value
+    pos = end
+
+    char = peek()
+    if char == ']':
+      return
+    if char != ',':
+      raise ImportStreamError(f'Expected "," or "]" but found {char!r}')
+    pos += 1
+
+
+def iter_rows(stream, content_type):
+  '''Pick the row reader matching the request content type'''
+  if content_type in NDJSON_CONTENT_TYPES:
+    return iter_ndjson(stream)
+  return iter_json_array(stream)
+
+
+def chunked(iterable, size):
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
+
+
+class RecipeImporter:
+  '''Validate and insert recipes for one user, a chunk at a time'''
+
+  def __init__(self, user, context, chunk_size=500):
+    self.user = user
+    self.context = context
+    self.chunk_size = chunk_size
+    self.created = 0
+    self.failed = 0
+
+  def run(self, rows):
+    '''Yield a result dict per row, then a summary'''
+    for chunk in chunked(enumerate(rows), self.chunk_size):
+      yield from self.import_chunk(chunk)
+    yield {'summary': {'created': self.created, 'failed': self.failed}}
+
+  def import_chunk(self, chunk):
+    valid, results = [], {}
+    for index, row in chunk:
+      if isinstance(row, ImportStreamError):
+        results[index] = self._failure(index, {'non_field_errors': [str(row)]})
+        continue
+      serializer = RecipeSerializer(data=row, context=self.context)
+      if serializer.is_valid():
+        valid.append((index, serializer.validated_data))
+      else:
+        results[index] = self._failure(index, serializer.errors)
+
+    if valid:
+      with transaction.atomic():
+        recipes = self._create_recipes(valid)
+        # The streamed response is finalised before any row is written
+        transaction.on_commit(self._written)
+      for (index, _), recipe in zip(valid, recipes):
+        results[index] = {'row': index, 'status': 'created', 'id': recipe.id}
+        self.created += 1
+
+    for index, _ in chunk:
+      yield results[index]
+
+  def _written(self):
+    invalidate_user(self.user.id)
+    # Restart the read-your-writes window; a long import outlasts the
+    # one the response opened
+    if settings.DATABASE_REPLICAS:
+      stick_to_primary(self.user.id)
+
+  def _failure(self, index, errors):
+    self.failed += 1
+    return {'row': index, 'status': 'error', 'errors': errors}
+
+  def _create_recipes(self, valid):
+    recipes = []
+    for _, data in valid:
+      fields = {
+        k: v for k, v in data.items() if k not in ('tags', 'ingredients')
+      }
+      recipes.append(Recipe(user_id=self.user.id, **fields))
+
+    if connection.features.can_return_rows_from_bulk_insert:
+      Recipe.objects.bulk_create(recipes)
+    else:
+      for recipe in recipes:
+        recipe.save()
+
+    self._link(recipes, valid, 'tags', Tag, 'tag_id')
+    self._link(recipes, valid, 'ingredients', Ingredient, 'ingredient_id')
+    # Bulk inserts skip the signals that normally maintain search_vector
+    schedule_search_update([recipe.id for recipe in recipes])
+    return recipes
+
+  def _link(self, recipes, valid, field, model, column):
+    names = [item['name'] for _, data in valid for item in data.get(field, [])]
+    objs = model.objects.get_or_create_many(self.user, names)
+    through = getattr(Recipe, field).through
+    links = []
+    for recipe, (_, data) in zip(recipes, valid):
+      linked = {objs[item['name']].id for item in data.get(field, [])}
+      links.extend(
+        through(recipe_id=recipe.id, **{column: obj_id}) for obj_id in linked
+      )
+    through.objects.bulk_create(links)
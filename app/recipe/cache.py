@@ -0,0 +1,129 @@
+'''
+Per-user response cache for the recipe API.
+
+Cached list/detail payloads are keyed by user, a per-user version number,
+the full request URL and the Accept header. Any successful write by the
+user bumps the version, which orphans every cached response for that user
+at once; the orphaned entries simply age out of the backend (LRU for local
+memory).
+
+The version is bumped after the write has committed, so a concurrent
+read that computed old data can only ever store it under the old version.
+'''
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.permissions import SAFE_METHODS
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from recipe.conditional import not_modified, VALIDATOR_HEADERS
+
+VERSION_KEY = 'recipe-api:version:{user_id}'
+RESPONSE_KEY = 'recipe-api:response:{user_id}:{version}:{digest}'
+
+
+def get_cache():
+  return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def _new_version():
+  # Never restart from a small number after eviction, or responses
+  # cached under an earlier incarnation of the counter could come back.
+  return time.time_ns()
+
+
+def get_user_version(user_id, cache=None):
+  cache = cache or get_cache()
+  key = VERSION_KEY.format(user_id=user_id)
+  version = cache.get(key)
+  if version is None:
+    cache.add(key, _new_version(), timeout=None)
+    version = cache.get(key)
+  return version
+
+
+def invalidate_user(user_id):
+  '''Drop every cached response for user_id'''
+  cache = get_cache()
+  key = VERSION_KEY.format(user_id=user_id)
+  try:
+    cache.incr(key)
+  except ValueError:
+    cache.set(key, _new_version(), timeout=None)
+
+
+def invalidate_user_on_commit(user_id):
+  '''Invalidate for a write that may not have committed yet
+
+  Bumping straight away hides the write's own transaction from cached
+  reads; bumping again after commit drops anything a concurrent reader
+  stored from the old data in between.
+  '''
+  invalidate_user(user_id)
+  if transaction.get_connection().in_atomic_block:
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+def response_cache_key(request, cache=None):
+  user_id = request.user.id
+  url = request.build_absolute_uri()
+  accept = request.META.get('HTTP_ACCEPT', '')
+  digest = hashlib.sha1(f'{url}|{accept}'.encode()).hexdigest()
+  return RESPONSE_KEY.format(
+    user_id=user_id,
+    version=get_user_version(user_id, cache),
+    digest=digest,
+  )
+
+
+class CachedResponseMixin:
+  '''Per-user response caching for viewsets
+
+  Read actions opt in by routing through cached_response(); every
+  successful unsafe request invalidates the user's cached responses.
+  '''
+
+  def cached_response(self, handler, request, *args, **kwargs):
+    if not settings.RECIPE_CACHE_ENABLED:
+      return handler(request, *args, **kwargs)
+
+    cache = get_cache()
+    key = response_cache_key(request, cache)
+    hit = cache.get(key)
+    if hit is not None:
+      data, headers = hit
+      if 'ETag' in headers:
+        # The cached validators are exactly as fresh as the cached payload
+        response = not_modified(
+          request,
+          headers['ETag'],
+          parse_http_date_safe(headers.get('Last-Modified', '')),
+        )
+        if response is not None:
+          return response
+      response = Response(data)
+      for header, value in headers.items():
+        response[header] = value
+      return response
+
+    response = handler(request, *args, **kwargs)
+    if response.status_code == 200:
+      headers = {
+        header: response[header]
+        for header in VALIDATOR_HEADERS if response.has_header(header)
+      }
+      cache.set(key, (response.data, headers), settings.RECIPE_CACHE_TIMEOUT)
+    return response
+
+  def finalize_response(self, request, response, *args, **kwargs):
+    if (
+      request.method not in SAFE_METHODS
+      and response.status_code < 400
+      and request.user.is_authenticated
+    ):
+      invalidate_user(request.user.id)
+    return super().finalize_response(request, response, *args, **kwargs)
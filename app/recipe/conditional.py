@@ -0,0 +1,96 @@
+'''
+Conditional GET support (ETag / Last-Modified) for the recipe API.
+
+The validators for a response come from one cheap aggregate over the
+rows behind it, max(updated_at) and count(*), so a matching
+If-None-Match or If-Modified-Since is answered with 304 before anything
+is loaded or serialized. The count catches deletes, which leave no
+updated_at behind.
+
+Lists send only the ETag. A delete doesn't move max(updated_at), so a
+Last-Modified built from it would let If-Modified-Since answer 304
+with a list that still holds the deleted row.
+'''
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+def make_etag(request, *parts):
+  '''Strong ETag for the representation at request's URL built from parts'''
+  key = '|'.join([
+    request.build_absolute_uri(),
+    request.META.get('HTTP_ACCEPT', ''),
+    str(request.user.id),
+    *(str(part) for part in parts),
+  ])
+  return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def not_modified(request, etag, last_modified):
+  '''Return a 304 (or 412) response if the request validators match'''
+  response = get_conditional_response(
+    request, etag=etag, last_modified=last_modified
+  )
+  if response is not None:
+    set_validators(response, etag, last_modified)
+  return response
+
+
+def set_validators(response, etag, last_modified):
+  response['ETag'] = etag
+  if last_modified is not None:
+    response['Last-Modified'] = http_date(last_modified)
+
+
+def aggregate_state(queryset):
+  '''Return (max(updated_at), count) for queryset'''
+  state = queryset.order_by().aggregate(
+    last_modified=Max('updated_at'),
+    count=Count('pk'),
+  )
+  return state['last_modified'], state['count']
+
+
+class ConditionalGetMixin:
+  '''ETag and Last-Modified handling for read actions
+
+  Like cached_response(), read actions opt in by routing through
+  conditional_response().
+  '''
+
+  def get_conditional_state(self):
+    '''Return a list of (last_modified, count) pairs behind the response'''
+    queryset = self.filter_queryset(self.get_queryset())
+    if self.detail:
+      lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+      lookup = self.kwargs[lookup_url_kwarg]
+      queryset = queryset.filter(**{self.lookup_field: lookup})
+    return [aggregate_state(queryset)]
+
+  def conditional_response(self, handler, request, *args, **kwargs):
+    try:
+      state = self.get_conditional_state()
+    except (TypeError, ValueError):
+      # Malformed lookups are left for the handler to turn into a 404
+      return handler(request, *args, **kwargs)
+
+    timestamps = [last_modified for last_modified, _ in state if last_modified]
+    last_modified = None
+    if self.detail and timestamps:
+      last_modified = int(max(timestamps).timestamp())
+    etag = make_etag(request, *(
+      f'{ts.isoformat() if ts else ""}:{count}' for ts, count in state
+    ))
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+      return response
+
+    response = handler(request, *args, **kwargs)
+    if response.status_code == 200:
+      set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,145 @@
+'''
+Query parameter filters for the recipe list, pushed down to SQL.
+
+    ?tags=1,2&ingredients=3   recipes linked to the given ids
+    ?match=any|all            whether one or every id must be linked
+    ?price_min=&price_max=    inclusive price range
+    ?time_min=&time_max=      inclusive time_minutes range
+    ?q=                       full-text search, ranked by relevance
+
+Tag and ingredient filters are EXISTS subqueries on the M2M through
+tables, so they never duplicate rows and need no distinct().
+'''
+from decimal import Decimal, InvalidOperation
+
+from django.db import models
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+from core.search import search_recipes
+
+RELATED_FILTERS = {
+  'tags': 'tag_id',
+  'ingredients': 'ingredient_id',
+}
+
+RANGE_FILTERS = {
+  'price_min': ('price', 'gte'),
+  'price_max': ('price', 'lte'),
+  'time_min': ('time_minutes', 'gte'),
+  'time_max': ('time_minutes', 'lte'),
+}
+
+MATCH_MODES = ('any', 'all')
+
+
+def _in_column_range(field, number):
+  '''Whether the column behind field can hold number
+
+  Values it can't are a 400 here rather than an overflow in the driver.
+  Integer ranges are the standard SQL ones Postgres enforces; SQLite
+  reports none but still can't bind more than 64 bits.
+  '''
+  if isinstance(field, models.DecimalField):
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places)
+    return number.is_finite() and -limit < number < limit
+  ranges = BaseDatabaseOperations.integer_field_ranges
+  low, high = ranges[field.get_internal_type()]
+  return low <= number <= high
+
+
+def _parse_ids(name, value):
+  pk = getattr(Recipe, name).field.related_model._meta.pk
+  try:
+    ids = sorted({int(item) for item in value.split(',') if item.strip()})
+  except ValueError:
+    raise ValidationError({name: 'Must be a comma separated list of ids'})
+  if not all(_in_column_range(pk, obj_id) for obj_id in ids):
+    raise ValidationError({name: 'Ids are out of range'})
+  return ids
+
+
+def _parse_value(name, value, field):
+  parse = Decimal if isinstance(field, models.DecimalField) else int
+  try:
+    number = parse(value)
+  except (ValueError, InvalidOperation):
+    raise ValidationError({name: 'Must be a number'})
+  if not _in_column_range(field, number):
+    raise ValidationError({name: 'Out of range'})
+  return number
+
+
+def parse_flag(params, name):
+  '''Read a 0/1 query parameter'''
+  value = params.get(name, '0')
+  if value not in ('0', '1'):
+    raise ValidationError({name: 'Must be 0 or 1'})
+  return value == '1'
+
+
+def _linked(field, column, ids):
+  through = getattr(Recipe, field).through
+  return Exists(
+    through.objects.filter(recipe_id=OuterRef('pk'), **{f'{column}__in': ids})
+  )
+
+
+def filter_recipes(queryset, params):
+  '''Apply the recipe filters found in params to queryset'''
+  match = params.get('match', 'any')
+  if match not in MATCH_MODES:
+    raise ValidationError(
+      {'match': f'Must be one of {", ".join(MATCH_MODES)}'}
+    )
+
+  for field, column in RELATED_FILTERS.items():
+    if not params.get(field):
+      continue
+    ids = _parse_ids(field, params[field])
+    if not ids:
+      continue
+    if match == 'all':
+      for obj_id in ids:
+        queryset = queryset.filter(_linked(field, column, [obj_id]))
+    else:
+      queryset = queryset.filter(_linked(field, column, ids))
+
+  for name, (field_name, lookup) in RANGE_FILTERS.items():
+    if params.get(name):
+      field = Recipe._meta.get_field(field_name)
+      value = _parse_value(name, params[name], field)
+      queryset = queryset.filter(**{f'{field_name}__{lookup}': value})
+
+  text = params.get('q', '').strip()
+  if text:
+    queryset = search_recipes(queryset, text)
+
+  return queryset
+
+
+def assigned_only(queryset, field):
+  '''Keep tags/ingredients linked to at least one recipe via field'''
+  column = RELATED_FILTERS[field]
+  through = getattr(Recipe, field).through
+  return queryset.filter(
+    Exists(through.objects.filter(**{column: OuterRef('pk')}))
+  )
+
+
+def with_recipe_counts(queryset, field):
+  '''Annotate tags/ingredients with the number of recipes using them'''
+  column = RELATED_FILTERS[field]
+  through = getattr(Recipe, field).through
+  counts = (
+    through.objects
+    .filter(**{column: OuterRef('pk')})
+    .order_by()
+    .values(column)
+    .annotate(count=Count('*'))
+    .values('count')
+  )
+  return queryset.annotate(recipe_count=Coalesce(Subquery(counts), 0))
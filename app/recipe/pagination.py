@@ -0,0 +1,28 @@
+'''
+Keyset (cursor) pagination for the recipe APIs.
+
+Cursors encode the position of the last row seen, so every page is a
+range scan on the ordering columns no matter how deep the client goes.
+'''
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+  ordering = '-id'
+  page_size = 50
+  page_size_query_param = 'page_size'
+  max_page_size = 200
+  
+  def get_ordering(self, request, queryset, view):
+    # Search results page by relevance, newest first among equal ranks
+    if 'rank' in queryset.query.annotations:
+      return ('-rank', '-id')
+    return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(CursorPagination):
+  '''Tags and ingredients, ordered by name with id as a tie breaker'''
+  ordering = ('-name', 'id')
+  page_size = 100
+  page_size_query_param = 'page_size'
+  max_page_size = 500
@@ -0,0 +1,56 @@
+'''
+Query planning for the recipe API.
+
+Works out which relations a serializer renders so the viewsets can load
+them in bulk with select_related/prefetch_related instead of once per row.
+'''
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+@lru_cache(maxsize=None)
+def get_query_plan(serializer_class):
+  '''Return the (select_related, prefetch_related) lookups for a serializer'''
+  select, prefetch = [], []
+  _collect(serializer_class(), '', False, select, prefetch)
+  return tuple(select), tuple(prefetch)
+
+
+def plan_queryset(queryset, serializer_class):
+  '''Apply the query plan of serializer_class to queryset'''
+  select, prefetch = get_query_plan(serializer_class)
+  if select:
+    queryset = queryset.select_related(*select)
+  if prefetch:
+    queryset = queryset.prefetch_related(*prefetch)
+  return queryset
+
+
+def _is_relation(serializer, source):
+  model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+  if model is None or '.' in source:
+    return False
+  try:
+    return model._meta.get_field(source).is_relation
+  except FieldDoesNotExist:
+    return False
+
+
+def _collect(serializer, prefix, in_prefetch, select, prefetch):
+  for field in serializer.fields.values():
+    if field.write_only or field.source == '*':
+      continue
+    if not _is_relation(serializer, field.source):
+      continue
+    lookup = prefix + field.source
+
+    if isinstance(field, serializers.ListSerializer):
+      prefetch.append(lookup)
+      _collect(field.child, lookup + '__', True, select, prefetch)
+    elif isinstance(field, serializers.ManyRelatedField):
+      prefetch.append(lookup)
+    elif isinstance(field, serializers.BaseSerializer):
+      (prefetch if in_prefetch else select).append(lookup)
+      _collect(field, lookup + '__', in_prefetch, select, prefetch)
@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from core.models import Recipe, Tag, Ingredient
+from PIL import Image
+from core.models import (
+  Recipe, Tag, Ingredient, RecipeImageRendition, RecipeImageUpload
+)
+from recipe.fast_serializers import FastListSerializer
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -7,6 +13,7 @@ class TagSerializer(serializers.ModelSerializer):
     model = Tag
     fields = ['id', 'name']
     read_only_fields = ['id']
+    list_serializer_class = FastListSerializer
     
     
 class IngredientSerializer(serializers.ModelSerializer):
@@ -14,50 +21,113 @@ class IngredientSerializer(serializers.ModelSerializer):
     model = Ingredient
     fields = ['id', 'name']
     read_only_fields = ['id']
+    list_serializer_class = FastListSerializer
+
+class TagCountSerializer(TagSerializer):
+  recipe_count = serializers.IntegerField(read_only=True)
+  
+  class Meta(TagSerializer.Meta):
+    fields = TagSerializer.Meta.fields + ['recipe_count']
+    
+
+class IngredientCountSerializer(IngredientSerializer):
+  recipe_count = serializers.IntegerField(read_only=True)
+  
+  class Meta(IngredientSerializer.Meta):
+    fields = IngredientSerializer.Meta.fields + ['recipe_count']
+    
+
+class RecipeImageRenditionSerializer(serializers.ModelSerializer):
+  url = serializers.ImageField(source='file', read_only=True)
+  
+  class Meta:
+    model = RecipeImageRendition
+    fields = ['name', 'format', 'width', 'height', 'url']
+    read_only_fields = fields
+    list_serializer_class = FastListSerializer
+    
 
 class RecipeSerializer(serializers.ModelSerializer):
   tags = TagSerializer(many=True, required=False)
   ingredients = IngredientSerializer(many=True, required=False)
+  renditions = RecipeImageRenditionSerializer(many=True, read_only=True)
   class Meta:
     model = Recipe
-    fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients']
+    fields = [
+      'id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients',
+      'renditions',
+    ]
     read_only_fields = ['id']
+    list_serializer_class = FastListSerializer
     
-  def _get_or_create_tags(self, tags, recipe):
+  def _get_or_create_tags(self, tags, recipe, created=False):
     auth_user = self.context['request'].user
-    for tag in tags:
-      tag_obj, created = Tag.objects.get_or_create(
-        user=auth_user,
-        **tag
-      )
-      recipe.tags.add(tag_obj)
+    tag_objs = Tag.objects.get_or_create_many(
+      auth_user,
+      [tag['name'] for tag in tags]
+    )
+    self._set_links(recipe, 'tags', 'tag_id', tag_objs.values(), created)
       
-  def _get_or_create_ingredients(self, ingredients, recipe):
+  def _get_or_create_ingredients(self, ingredients, recipe, created=False):
     auth_user = self.context['request'].user
-    for ingredient in ingredients:
-      ingredient_obj, created = Ingredient.objects.get_or_create(
-        user=auth_user,
-        **ingredient
+    ingredient_objs = Ingredient.objects.get_or_create_many(
+      auth_user,
+      [ingredient['name'] for ingredient in ingredients]
+    )
+    self._set_links(
+      recipe, 'ingredients', 'ingredient_id', ingredient_objs.values(), created
+    )
+    
+  def _set_links(self, recipe, field, column, objs, created):
+    '''Link recipe to exactly objs with at most one DELETE and one INSERT
+
+    The current links come from the instance's prefetch (the viewset
+    loads them for the response anyway), so unlike .set() this reads
+    nothing. Writing the join table directly skips m2m_changed, as bulk
+    inserts do; create() and update() save the recipe itself in the
+    same transaction, and receivers should listen for that.
+    '''
+    through = getattr(Recipe, field).through
+    ids = {obj.pk for obj in objs}
+    cache = getattr(recipe, '_prefetched_objects_cache', {})
+    prefetched = cache.pop(field, None)
+    if created:
+      current = set()
+    elif prefetched is not None:
+      current = {obj.pk for obj in prefetched}
+    else:
+      current = set(
+        through.objects.filter(recipe_id=recipe.pk)
+        .values_list(column, flat=True)
+      )
+    stale, missing = current - ids, ids - current
+    if stale:
+      through.objects.filter(
+        recipe_id=recipe.pk, **{f'{column}__in': stale}
+      ).delete()
+    if missing:
+      through.objects.bulk_create(
+        [through(recipe_id=recipe.pk, **{column: pk}) for pk in missing],
+        ignore_conflicts=True,
       )
-      recipe.ingredients.add(ingredient_obj)
       
+  @transaction.atomic
   def create(self, validated_data): 
     tags = validated_data.pop('tags', [])
     ingredients = validated_data.pop('ingredients', [])
     recipe = Recipe.objects.create(**validated_data)
-    self._get_or_create_tags(tags, recipe)
-    self._get_or_create_ingredients(ingredients, recipe)
+    self._get_or_create_tags(tags, recipe, created=True)
+    self._get_or_create_ingredients(ingredients, recipe, created=True)
     return recipe
   
+  @transaction.atomic
   def update(self, instance, validated_data):
     tags = validated_data.pop('tags', None)
     ingredients = validated_data.pop('ingredients', None)
     if tags is not None:
-      instance.tags.clear()
       self._get_or_create_tags(tags, instance)
     if ingredients is not None:
-      instance.ingredients.clear()
-      self._get_or_create_ingredients(tags, ingredients)
+      self._get_or_create_ingredients(ingredients, instance)
     for attr,value in validated_data.items():
       setattr(instance, attr, value)
     instance.save()
@@ -77,4 +147,30 @@ class RecipeImageSerializer(serializers.ModelSerializer):
     extra_kwargs = {
       'images': { 'required': True }
     }
-    
\ No newline at end of file
+    
+  def validate_images(self, value):
+    if value.size > settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+      raise serializers.ValidationError('Image file is too large')
+    value.seek(0)
+    with Image.open(value) as image:
+      image_format = image.format
+    value.seek(0)
+    if image_format not in settings.RECIPE_IMAGE_UPLOAD_FORMATS:
+      raise serializers.ValidationError(
+        f'Unsupported image format {image_format}'
+      )
+    return value
+    
+    
+class RecipeImageUploadSerializer(serializers.ModelSerializer):
+  class Meta:
+    model = RecipeImageUpload
+    fields = ['id', 'filename', 'size', 'offset', 'expires_at']
+    read_only_fields = ['id', 'offset', 'expires_at']
+    
+  def validate_size(self, value):
+    if value < 1:
+      raise serializers.ValidationError('Size must be positive')
+    if value > settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+      raise serializers.ValidationError('Image file is too large')
+    return value
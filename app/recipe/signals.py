@@ -0,0 +1,32 @@
+'''
+Keep the per-user response cache in step with writes made outside the
+API request cycle.
+'''
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.images import renditions_generated
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import invalidate_user, invalidate_user_on_commit
+
+
+@receiver(renditions_generated)
+def renditions_ready(sender, recipe, **kwargs):
+  invalidate_user(recipe.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def user_data_changed(sender, instance, **kwargs):
+  invalidate_user_on_commit(instance.user_id)
+  
+  
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, **kwargs):
+  if action in ('post_add', 'post_remove', 'post_clear'):
+    invalidate_user_on_commit(instance.user_id)
@@ -0,0 +1,136 @@
+import io
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import router
+from core.models import Recipe, Tag, Ingredient
+from recipe import bulk
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def read_report(res):
+  body = b''.join(res.streaming_content).decode()
+  return [json.loads(line) for line in body.splitlines()]
+
+
+class RowStreamTests(SimpleTestCase):
+  @patch('recipe.bulk.READ_SIZE', 3)
+  def test_json_array_across_read_boundaries(self):
+    rows = [{'title': 'a' * 10, 'n': 12345}, [1, 2], 'x', 678]
+    stream = io.BytesIO(json.dumps(rows).encode())
+
+    self.assertEqual(list(bulk.iter_json_array(stream)), rows)
+
+  def test_empty_json_array(self):
+    self.assertEqual(list(bulk.iter_json_array(io.BytesIO(b' [ ] '))), [])
+
+  def test_malformed_json_array_ends_with_error(self):
+    stream = io.BytesIO(b'[{"title": "ok"} {"title": "bad"}]')
+
+    rows = list(bulk.iter_json_array(stream))
+
+    self.assertEqual(rows[0], {'title': 'ok'})
+    self.assertIsInstance(rows[1], bulk.ImportStreamError)
+
+  @patch('recipe.bulk.READ_SIZE', 4)
+  def test_ndjson_lines(self):
+    stream = io.BytesIO('{"a": "é"}\n\nnot json\n{"b": 2}'.encode())
+
+    rows = list(bulk.iter_ndjson(stream))
+
+    self.assertEqual(rows[0], {'a': 'é'})
+    self.assertIsInstance(rows[1], bulk.ImportStreamError)
+    self.assertEqual(rows[2], {'b': 2})
+
+
+class BulkImportAPITests(TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'bulk@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+
+  def test_import_ndjson(self):
+    Tag.objects.create(user=self.user, name='Dinner')
+    rows = [
+      {'title': 'Curry', 'time_minutes': 30, 'price': '5.00',
+       'tags': [{'name': 'Dinner'}, {'name': 'Thai'}],
+       'ingredients': [{'name': 'Rice'}, {'name': 'Rice'}]},
+      {'title': 'Toast', 'time_minutes': 5, 'price': '1.00',
+       'tags': [{'name': 'Thai'}]},
+    ]
+    body = '\n'.join(json.dumps(row) for row in rows)
+
+    res = self.client.post(BULK_URL, body, content_type='application/x-ndjson')
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    report = read_report(res)
+    self.assertEqual(report[-1], {'summary': {'created': 2, 'failed': 0}})
+    curry = Recipe.objects.get(id=report[0]['id'])
+    self.assertEqual(curry.user, self.user)
+    self.assertEqual(
+      sorted(tag.name for tag in curry.tags.all()), ['Dinner', 'Thai']
+    )
+    self.assertEqual(curry.ingredients.count(), 1)
+    self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+    self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+
+  def test_import_json_array_reports_row_errors(self):
+    rows = [
+      {'title': 'Valid', 'time_minutes': 10, 'price': '2.00'},
+      {'title': 'Missing price', 'time_minutes': 10},
+    ]
+
+    res = self.client.post(
+      BULK_URL, json.dumps(rows), content_type='application/json'
+    )
+
+    report = read_report(res)
+    self.assertEqual(report[0]['status'], 'created')
+    self.assertEqual(report[1]['row'], 1)
+    self.assertEqual(report[1]['status'], 'error')
+    self.assertIn('price', report[1]['errors'])
+    self.assertEqual(report[-1], {'summary': {'created': 1, 'failed': 1}})
+    self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+
+  @override_settings(RECIPE_IMPORT_CHUNK_SIZE=2)
+  def test_import_in_chunks(self):
+    rows = [
+      {'title': f'recipe {i}', 'time_minutes': 1, 'price': '1.00'}
+      for i in range(5)
+    ]
+
+    res = self.client.post(
+      BULK_URL, json.dumps(rows), content_type='application/json'
+    )
+
+    report = read_report(res)
+    self.assertEqual([r['row'] for r in report[:-1]], list(range(5)))
+    self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+
+  @override_settings(DATABASE_REPLICAS=['replica_0'])
+  def test_each_chunk_keeps_reads_on_primary(self):
+    rows = [{'title': 'Soup', 'time_minutes': 1, 'price': '1.00'}]
+    res = self.client.post(
+      BULK_URL, json.dumps(rows), content_type='application/json'
+    )
+    # As if the window opened with the response had run out
+    router.get_sticky_cache().clear()
+
+    with self.captureOnCommitCallbacks(execute=True):
+      read_report(res)
+
+    self.assertTrue(router.is_sticky(self.user.id))
+
+  def test_unsupported_content_type(self):
+    res = self.client.post(BULK_URL, 'title', content_type='text/plain')
+
+    self.assertEqual(res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
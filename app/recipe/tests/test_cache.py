@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.cache import get_user_version, invalidate_user
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+  return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+  defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00')}
+  defaults.update(params)
+  return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'cache@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+
+  def test_repeated_list_is_served_from_cache(self):
+    create_recipe(self.user)
+    first = self.client.get(RECIPES_URL)
+
+    with self.assertNumQueries(0):
+      second = self.client.get(RECIPES_URL)
+
+    self.assertEqual(second.status_code, status.HTTP_200_OK)
+    self.assertEqual(second.content, first.content)
+
+  def test_query_string_is_part_of_key(self):
+    create_recipe(self.user, price=Decimal('1.00'))
+    create_recipe(self.user, price=Decimal('9.00'))
+
+    all_recipes = self.client.get(RECIPES_URL)
+    cheap = self.client.get(RECIPES_URL, {'price_max': '5.00'})
+
+    self.assertEqual(len(all_recipes.data['results']), 2)
+    self.assertEqual(len(cheap.data['results']), 1)
+
+  def test_create_invalidates_list(self):
+    self.client.get(RECIPES_URL)
+    payload = {'title': 'New', 'time_minutes': 5, 'price': '2.00'}
+    self.client.post(RECIPES_URL, payload)
+
+    res = self.client.get(RECIPES_URL)
+
+    self.assertEqual(len(res.data['results']), 1)
+
+  def test_update_invalidates_detail(self):
+    recipe = create_recipe(self.user, title='Old')
+    self.client.get(detail_url(recipe.id))
+    self.client.patch(detail_url(recipe.id), {'title': 'New'})
+
+    res = self.client.get(detail_url(recipe.id))
+
+    self.assertEqual(res.data['title'], 'New')
+
+  def test_tag_update_invalidates_recipes(self):
+    recipe = create_recipe(self.user)
+    tag = Tag.objects.create(user=self.user, name='Lunch')
+    recipe.tags.add(tag)
+    self.client.get(detail_url(recipe.id))
+
+    self.client.patch(
+      reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Dinner'}
+    )
+    res = self.client.get(detail_url(recipe.id))
+
+    self.assertEqual(res.data['tags'][0]['name'], 'Dinner')
+
+  def test_cache_is_per_user(self):
+    create_recipe(self.user)
+    self.client.get(RECIPES_URL)
+
+    other = get_user_model().objects.create_user(
+      'other@example.com', 'test1234'
+    )
+    client = APIClient()
+    client.force_authenticate(user=other)
+    res = client.get(RECIPES_URL)
+
+    self.assertEqual(res.data['results'], [])
+
+  def test_failed_write_keeps_cache(self):
+    version = get_user_version(self.user.id)
+
+    self.client.post(RECIPES_URL, {'title': 'No price'})
+
+    self.assertEqual(get_user_version(self.user.id), version)
+
+  def test_invalidate_user_bumps_version(self):
+    version = get_user_version(self.user.id)
+
+    invalidate_user(self.user.id)
+
+    self.assertNotEqual(get_user_version(self.user.id), version)
+
+  def test_orm_write_invalidates(self):
+    self.client.get(RECIPES_URL)
+
+    create_recipe(self.user)
+    res = self.client.get(RECIPES_URL)
+
+    self.assertEqual(len(res.data['results']), 1)
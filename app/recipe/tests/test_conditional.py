@@ -0,0 +1,183 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+  return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+  defaults = {'title': 'Sample', 'time_minutes': 10, 'price': Decimal('5.00')}
+  defaults.update(params)
+  return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False)
+class ConditionalGetTests(TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'etag@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+
+  def test_list_sends_validators(self):
+    create_recipe(self.user)
+
+    res = self.client.get(RECIPES_URL)
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertTrue(res['ETag'].startswith('"'))
+    # Deletes don't move max(updated_at), so lists are not dated
+    self.assertNotIn('Last-Modified', res)
+
+  def test_list_not_modified_without_serializing(self):
+    create_recipe(self.user)
+    etag = self.client.get(RECIPES_URL)['ETag']
+
+    with self.assertNumQueries(1):
+      res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+    self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+    self.assertEqual(res['ETag'], etag)
+    self.assertEqual(res.content, b'')
+
+  def test_list_modified_after_create_and_delete(self):
+    recipe = create_recipe(self.user)
+    etag = self.client.get(RECIPES_URL)['ETag']
+
+    create_recipe(self.user)
+    res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    etag = res['ETag']
+    recipe.delete()
+    res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+  def test_detail_modified_when_tags_change(self):
+    recipe = create_recipe(self.user)
+    etag = self.client.get(detail_url(recipe.id))['ETag']
+    self.assertEqual(
+      self.client.get(
+        detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag
+      ).status_code,
+      status.HTTP_304_NOT_MODIFIED,
+    )
+
+    tag = Tag.objects.create(user=self.user, name='Vegan')
+    recipe.tags.add(tag)
+    res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    etag = res['ETag']
+    tag.name = 'Vegetarian'
+    tag.save()
+    res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+  def test_if_modified_since(self):
+    recipe = create_recipe(self.user)
+    last_modified = self.client.get(detail_url(recipe.id))['Last-Modified']
+
+    res = self.client.get(
+      detail_url(recipe.id), HTTP_IF_MODIFIED_SINCE=last_modified
+    )
+
+    self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+  def test_if_modified_since_after_delete(self):
+    for url, create in (
+      (RECIPES_URL, lambda name: create_recipe(self.user, title=name)),
+      (TAGS_URL, lambda name: Tag.objects.create(user=self.user, name=name)),
+    ):
+      with self.subTest(url=url):
+        create('first')
+        second = create('second')
+        since = self.client.get(url).get('Last-Modified', http_date())
+
+        second.delete()
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+  def test_etag_differs_per_query(self):
+    create_recipe(self.user)
+
+    first = self.client.get(RECIPES_URL)['ETag']
+    second = self.client.get(RECIPES_URL, {'page_size': 1})['ETag']
+
+    self.assertNotEqual(first, second)
+
+  def test_missing_recipe_is_not_found(self):
+    for recipe_id in (999999, 'abc'):
+      res = self.client.get(detail_url(recipe_id))
+      self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+  def test_tag_list_not_modified(self):
+    Tag.objects.create(user=self.user, name='Dinner')
+    etag = self.client.get(TAGS_URL)['ETag']
+
+    res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+    self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+  def test_assigned_only_tags_follow_recipe_links(self):
+    tag = Tag.objects.create(user=self.user, name='Dinner')
+    recipe = create_recipe(self.user)
+    params = {'assigned_only': 1}
+    etag = self.client.get(TAGS_URL, params)['ETag']
+
+    recipe.tags.add(tag)
+    res = self.client.get(TAGS_URL, params, HTTP_IF_NONE_MATCH=etag)
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertEqual(len(res.data['results']), 1)
+
+
+class CachedConditionalGetTests(TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'cached-etag@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+
+  def test_cached_response_answers_conditional_get(self):
+    create_recipe(self.user)
+    first = self.client.get(RECIPES_URL)
+
+    with self.assertNumQueries(0):
+      res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+  def test_cached_response_keeps_validators(self):
+    create_recipe(self.user)
+    first = self.client.get(RECIPES_URL)
+
+    second = self.client.get(RECIPES_URL)
+
+    self.assertEqual(second['ETag'], first['ETag'])
+    self.assertNotIn('Last-Modified', second)
+
+  def test_cached_detail_keeps_last_modified(self):
+    recipe = create_recipe(self.user)
+    first = self.client.get(detail_url(recipe.id))
+
+    second = self.client.get(detail_url(recipe.id))
+
+    self.assertEqual(second['Last-Modified'], first['Last-Modified'])
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, title):
+  return Recipe.objects.create(
+    user=user, title=title, time_minutes=10, price=Decimal('4.50')
+  )
+
+
+class ExportAPITests(TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'export@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+
+    self.recipes = [create_recipe(self.user, f'recipe {i}') for i in range(3)]
+    self.recipes[0].tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+    self.recipes[0].ingredients.add(
+      Ingredient.objects.create(user=self.user, name='Tofu'),
+      Ingredient.objects.create(user=self.user, name='Rice'),
+    )
+    other = get_user_model().objects.create_user(
+      'other@example.com', 'test1234'
+    )
+    create_recipe(other, 'not mine')
+
+  @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+  def test_export_ndjson(self):
+    res = self.client.get(EXPORT_URL)
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+    body = b''.join(res.streaming_content)
+    rows = [json.loads(line) for line in body.splitlines()]
+    self.assertEqual([row['id'] for row in rows], [r.id for r in self.recipes])
+    self.assertEqual(rows[0]['price'], '4.50')
+    self.assertEqual(rows[0]['tags'][0]['name'], 'Vegan')
+    self.assertEqual(len(rows[0]['ingredients']), 2)
+
+  def test_export_csv(self):
+    res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    body = b''.join(res.streaming_content).decode()
+    rows = list(csv.DictReader(io.StringIO(body)))
+    self.assertEqual(len(rows), 3)
+    self.assertEqual(rows[0]['tags'], 'Vegan')
+    self.assertEqual(
+      sorted(rows[0]['ingredients'].split(';')), ['Rice', 'Tofu']
+    )
+    self.assertEqual(rows[1]['images'], '')
+
+  def test_export_rejects_unknown_output(self):
+    res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
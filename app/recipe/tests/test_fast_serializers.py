@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient, RecipeImageRendition
+from recipe.fast_serializers import (
+  FastListSerializer, get_field_plan, INT, STR, MANY, FIELD
+)
+from recipe.serializers import (
+  RecipeSerializer,
+  RecipeDetailSerializer,
+  TagCountSerializer,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False)
+class FastListSerializerTests(TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'fast@example.com', 'test1234'
+    )
+    tags = [
+      Tag.objects.create(user=self.user, name=name)
+      for name in ('Vegan', 'Quick', 'Spicy')
+    ]
+    ingredients = [
+      Ingredient.objects.create(user=self.user, name=name)
+      for name in ('Rice', 'Salt')
+    ]
+    for i in range(4):
+      recipe = Recipe.objects.create(
+        user=self.user,
+        title=f'Recipe {i}',
+        description='Ünïcode "quoted"' if i % 2 else '',
+        time_minutes=5 * i,
+        price=Decimal('10.5') + i,
+        link='https://example.com/r' if i % 2 else '',
+        images=f'uploads/recipe/{i}.png' if i % 2 else None,
+      )
+      recipe.tags.set(tags[:i])
+      recipe.ingredients.set(ingredients[:i % 3])
+      if i % 2:
+        RecipeImageRendition.objects.create(
+          recipe=recipe, name='thumb', format='webp',
+          file=f'renditions/{i}.webp', width=320, height=240,
+          source=f'uploads/recipe/{i}.png',
+        )
+    self.request = APIRequestFactory().get(RECIPES_URL)
+
+  def render(self, serializer_class, queryset, fast):
+    with self.settings(RECIPE_FAST_SERIALIZATION=fast):
+      serializer = serializer_class(
+        queryset, many=True, context={'request': self.request}
+      )
+      return JSONRenderer().render(serializer.data)
+
+  def assertSameBytes(self, serializer_class, queryset):
+    fast = self.render(serializer_class, queryset, True)
+    self.assertEqual(fast, self.render(serializer_class, queryset, False))
+    return fast
+
+  def test_recipe_serializers_render_identical_bytes(self):
+    queryset = Recipe.objects.prefetch_related(
+      'tags', 'ingredients', 'renditions'
+    ).order_by('id')
+
+    for serializer_class in (RecipeSerializer, RecipeDetailSerializer):
+      with self.subTest(serializer=serializer_class.__name__):
+        body = self.assertSameBytes(serializer_class, queryset)
+        self.assertIn(b'"price":"11.50"', body)
+
+  def test_annotated_serializer_renders_identical_bytes(self):
+    queryset = Tag.objects.annotate(
+      recipe_count=Count('recipe')
+    ).order_by('id')
+
+    body = self.assertSameBytes(TagCountSerializer, queryset)
+    self.assertIn(b'"recipe_count":', body)
+
+  def test_list_endpoints_render_identical_bytes(self):
+    client = APIClient()
+    client.force_authenticate(self.user)
+    for url in (RECIPES_URL, TAGS_URL, f'{TAGS_URL}?with_counts=1'):
+      with self.subTest(url=url):
+        with self.settings(RECIPE_FAST_SERIALIZATION=False):
+          expected = client.get(url).content
+        self.assertEqual(client.get(url).content, expected)
+
+  def test_field_plan_is_computed_once_per_class(self):
+    plan = get_field_plan(RecipeSerializer)
+
+    self.assertIs(get_field_plan(RecipeSerializer), plan)
+    kinds = {name: kind for name, getter, kind in plan}
+    self.assertEqual(kinds['id'], INT)
+    self.assertEqual(kinds['title'], STR)
+    self.assertEqual(kinds['price'], FIELD)
+    self.assertEqual(kinds['tags'], MANY)
+    self.assertIsInstance(RecipeSerializer(many=True), FastListSerializer)
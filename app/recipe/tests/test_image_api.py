@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload_url(recipe_id):
+  return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+  return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_file(name='dish.png', fmt='PNG', size=(640, 480)):
+  buffer = BytesIO()
+  Image.new('RGB', size, color=(10, 120, 60)).save(buffer, format=fmt)
+  return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(
+  MEDIA_ROOT=MEDIA_ROOT,
+  RECIPE_IMAGE_PROCESSING='sync',
+  RECIPE_IMAGE_RENDITIONS={'thumbnail': (160, 160)},
+  RECIPE_IMAGE_RENDITION_FORMATS=['jpeg'],
+)
+class RecipeImageUploadTests(TestCase):
+  @classmethod
+  def tearDownClass(cls):
+    super().tearDownClass()
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'upload@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+    self.recipe = Recipe.objects.create(
+      user=self.user, title='Salad', time_minutes=5, price='2.00'
+    )
+
+  def test_upload_generates_renditions(self):
+    with self.captureOnCommitCallbacks(execute=True):
+      res = self.client.post(
+        image_upload_url(self.recipe.id),
+        {'images': image_file()},
+        format='multipart',
+      )
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    res = self.client.get(detail_url(self.recipe.id))
+    self.assertEqual(len(res.data['renditions']), 1)
+    rendition = res.data['renditions'][0]
+    self.assertEqual(rendition['name'], 'thumbnail')
+    self.assertEqual(rendition['format'], 'jpeg')
+    self.assertEqual((rendition['width'], rendition['height']), (160, 120))
+    self.assertTrue(rendition['url'].startswith('http'))
+
+  @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+  def test_upload_too_large_rejected(self):
+    res = self.client.post(
+      image_upload_url(self.recipe.id),
+      {'images': image_file()},
+      format='multipart',
+    )
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+  @override_settings(RECIPE_IMAGE_UPLOAD_FORMATS=['JPEG'])
+  def test_upload_unsupported_format_rejected(self):
+    res = self.client.post(
+      image_upload_url(self.recipe.id),
+      {'images': image_file()},
+      format='multipart',
+    )
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertFalse(self.recipe.renditions.exists())
@@ -4,7 +4,8 @@ from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
+from decimal import Decimal
 from recipe.serializers import IngredientSerializer
 
 
@@ -43,7 +44,7 @@ class PrivateIngredientAPITests(TestCase):
     serializer = IngredientSerializer(ingredients, many=True)
     
     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    self.assertEqual(res.data, serializer.data)
+    self.assertEqual(res.data['results'], serializer.data)
     
   def test_recipe_list_limited_to_user(self):
     other_user = create_user(email='test12@example.com', password='test1234')
@@ -57,7 +58,7 @@ class PrivateIngredientAPITests(TestCase):
     serializer = IngredientSerializer(ingredients, many=True)
     
     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    self.assertEqual(res.data, serializer.data)
+    self.assertEqual(res.data['results'], serializer.data)
     
   def test_update_ingredients(self):
     ingredient = Ingredient.objects.create(user=self.user, name='Kale')
@@ -80,5 +81,61 @@ class PrivateIngredientAPITests(TestCase):
     ingredients = Ingredient.objects.filter(user=self.user)
     self.assertFalse(ingredients.exists())
     
-  
-    
\ No newline at end of file
+  def test_filter_ingredients_assigned_to_recipes(self):
+    in1 = Ingredient.objects.create(user=self.user, name='Apples')
+    in2 = Ingredient.objects.create(user=self.user, name='Turkey')
+    recipe = Recipe.objects.create(
+      title='Apple Crumble',
+      time_minutes=5,
+      price=Decimal('4.50'),
+      user=self.user,
+    )
+    recipe.ingredients.add(in1)
+    
+    res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+    
+    s1 = IngredientSerializer(in1)
+    s2 = IngredientSerializer(in2)
+    self.assertIn(s1.data, res.data['results'])
+    self.assertNotIn(s2.data, res.data['results'])
+    
+  def test_filtered_ingredients_unique(self):
+    ing = Ingredient.objects.create(user=self.user, name='Eggs')
+    Ingredient.objects.create(user=self.user, name='Lentils')
+    recipe1 = Recipe.objects.create(
+      title='Eggs Benedict',
+      time_minutes=60,
+      price=Decimal('7.00'),
+      user=self.user,
+    )
+    recipe2 = Recipe.objects.create(
+      title='Herb Eggs',
+      time_minutes=20,
+      price=Decimal('4.00'),
+      user=self.user,
+    )
+    recipe1.ingredients.add(ing)
+    recipe2.ingredients.add(ing)
+    
+    res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+    
+    self.assertEqual(len(res.data['results']), 1)
+    
+  def test_ingredients_with_recipe_counts(self):
+    ing = Ingredient.objects.create(user=self.user, name='Eggs')
+    unused = Ingredient.objects.create(user=self.user, name='Lentils')
+    for title in ['Omelette', 'Frittata']:
+      recipe = Recipe.objects.create(
+        title=title, time_minutes=10, price=Decimal('3.00'), user=self.user,
+      )
+      recipe.ingredients.add(ing)
+      
+    res = self.client.get(INGREDIENT_URL, {'with_counts': 1})
+    
+    counts = {i['id']: i['recipe_count'] for i in res.data['results']}
+    self.assertEqual(counts, {ing.id: 2, unused.id: 0})
+    
+  def test_assigned_only_rejects_invalid_flag(self):
+    res = self.client.get(INGREDIENT_URL, {'assigned_only': 'yes'})
+    
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,155 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.query_plans import get_query_plan
+from recipe.serializers import (
+  RecipeSerializer,
+  RecipeDetailSerializer,
+  RecipeImageSerializer,
+  TagSerializer,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+  return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class QueryCountTestMixin:
+  '''Assert that a request costs the same number of queries at any size'''
+  sizes = (1, 5, 20)
+
+  def count_queries(self, func):
+    with CaptureQueriesContext(connection) as ctx:
+      func()
+    return len(ctx.captured_queries)
+
+  def assertConstantQueries(self, seed, func, sizes=None):
+    counts = []
+    for size in sizes or self.sizes:
+      seed(size)
+      counts.append(self.count_queries(func))
+    self.assertEqual(
+      len(set(counts)), 1,
+      f'query count grows with rows: {dict(zip(sizes or self.sizes, counts))}'
+    )
+    return counts[0]
+
+
+class QueryPlanTests(TestCase):
+  def test_list_plan_prefetches_nested(self):
+    select, prefetch = get_query_plan(RecipeSerializer)
+    self.assertEqual(select, ())
+    self.assertEqual(set(prefetch), {'tags', 'ingredients', 'renditions'})
+
+  def test_detail_plan_prefetches_nested(self):
+    select, prefetch = get_query_plan(RecipeDetailSerializer)
+    self.assertEqual(set(prefetch), {'tags', 'ingredients', 'renditions'})
+
+  def test_flat_serializers_have_empty_plan(self):
+    self.assertEqual(get_query_plan(RecipeImageSerializer), ((), ()))
+    self.assertEqual(get_query_plan(TagSerializer), ((), ()))
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False)
+class RecipeQueryCountTests(QueryCountTestMixin, TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user(
+      'queries@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+
+  def seed_recipes(self, total):
+    for i in range(Recipe.objects.filter(user=self.user).count(), total):
+      recipe = Recipe.objects.create(
+        user=self.user,
+        title=f'recipe {i}',
+        time_minutes=10,
+        price=Decimal('1.00'),
+      )
+      recipe.tags.add(Tag.objects.create(user=self.user, name=f'tag {i}'))
+      recipe.ingredients.add(
+        Ingredient.objects.create(user=self.user, name=f'ingredient {i}'),
+        Ingredient.objects.create(user=self.user, name=f'extra {i}'),
+      )
+
+  def test_recipe_list_query_count_is_constant(self):
+    self.assertConstantQueries(
+      self.seed_recipes,
+      lambda: self.client.get(RECIPES_URL),
+    )
+
+  def test_recipe_detail_query_count_is_constant(self):
+    recipe = Recipe.objects.create(
+      user=self.user, title='detail', time_minutes=5, price=Decimal('2.00')
+    )
+
+    def seed(total):
+      for i in range(recipe.tags.count(), total):
+        recipe.tags.add(Tag.objects.create(user=self.user, name=f'tag {i}'))
+
+    self.assertConstantQueries(
+      seed,
+      lambda: self.client.get(detail_url(recipe.id)),
+    )
+
+  def test_tag_list_query_count_is_constant(self):
+    def seed(total):
+      for i in range(Tag.objects.filter(user=self.user).count(), total):
+        Tag.objects.create(user=self.user, name=f'tag {i}')
+
+    self.assertConstantQueries(seed, lambda: self.client.get(TAGS_URL))
+
+  def test_create_recipe_query_count_is_constant_in_payload_size(self):
+    Tag.objects.create(user=self.user, name='existing')
+    payload = {}
+
+    def seed(size):
+      payload.update({
+        'title': f'recipe {size}',
+        'time_minutes': 10,
+        'price': '3.50',
+        'tags': [{'name': 'existing'}] +
+          [{'name': f'tag {size}-{i}'} for i in range(size)],
+        'ingredients':
+          [{'name': f'ingredient {size}-{i}'} for i in range(size)] * 2,
+      })
+
+    self.assertConstantQueries(
+      seed,
+      lambda: self.client.post(RECIPES_URL, payload, format='json'),
+      sizes=(1, 10, 30),
+    )
+
+  def test_update_recipe_query_count_is_constant_in_payload_size(self):
+    recipe = Recipe.objects.create(
+      user=self.user, title='update', time_minutes=5, price=Decimal('2.00')
+    )
+    # Every measurement, the first included, replaces existing links
+    recipe.tags.add(Tag.objects.create(user=self.user, name='old'))
+    recipe.ingredients.add(
+      Ingredient.objects.create(user=self.user, name='old')
+    )
+    payload = {}
+
+    def seed(size):
+      payload['tags'] = [{'name': f'tag {size}-{i}'} for i in range(size)]
+      payload['ingredients'] = [
+        {'name': f'ing {size}-{i}'} for i in range(size)
+      ]
+
+    self.assertConstantQueries(
+      seed,
+      lambda: self.client.patch(detail_url(recipe.id), payload, format='json'),
+      sizes=(1, 10, 30),
+    )
@@ -1,11 +1,13 @@
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.request import Request
 from django.contrib.auth import get_user_model
 from core.models import Recipe, Tag, Ingredient
 from decimal import Decimal
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.pagination import RecipeCursorPagination
 
 RECIPES_URL = reverse('recipe:recipe-list')
 
@@ -54,7 +56,7 @@ class PrivateRecipeAPITests(TestCase):
     serializer = RecipeSerializer(recipes, many=True)
     
     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    self.assertEqual(res.data, serializer.data)
+    self.assertEqual(res.data['results'], serializer.data)
     
   def test_recipe_list_limited_to_user(self):
     other_user = create_user(email='test@example.com', password='test1234')
@@ -68,7 +70,7 @@ class PrivateRecipeAPITests(TestCase):
     serializer = RecipeSerializer(recipes, many=True)
     
     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    self.assertEqual(res.data, serializer.data)
+    self.assertEqual(res.data['results'], serializer.data)
     
   def test_get_recipe_detail(self):
     recipe = create_recipe(user=self.user)
@@ -265,4 +267,151 @@ class PrivateRecipeAPITests(TestCase):
     self.assertIn(ingredient, recipe.ingredients.all())
     
     
-    
\ No newline at end of file
+  def test_recipe_list_is_cursor_paginated(self):
+    for i in range(5):
+      create_recipe(user=self.user, title=f'recipe {i}')
+      
+    res = self.client.get(RECIPES_URL, {'page_size': 2})
+    
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertEqual(len(res.data['results']), 2)
+    self.assertIsNone(res.data['previous'])
+    self.assertIsNotNone(res.data['next'])
+    
+  def test_recipe_cursor_walks_all_pages(self):
+    recipes = [create_recipe(user=self.user) for _ in range(5)]
+    
+    seen = []
+    url = f'{RECIPES_URL}?page_size=2'
+    while url:
+      res = self.client.get(url)
+      self.assertEqual(res.status_code, status.HTTP_200_OK)
+      seen.extend(r['id'] for r in res.data['results'])
+      url = res.data['next']
+      
+    self.assertEqual(seen, sorted((r.id for r in recipes), reverse=True))
+    
+  def test_recipe_page_size_is_bounded(self):
+    paginator = RecipeCursorPagination()
+    request = Request(
+      APIRequestFactory().get(RECIPES_URL, {'page_size': 100000})
+    )
+    
+    self.assertEqual(paginator.get_page_size(request), paginator.max_page_size)
+    
+  def test_create_recipe_deduplicates_tags(self):
+    payload = {
+      'title': 'Pancakes',
+      'time_minutes': 15,
+      'price': Decimal('1.50'),
+      'tags': [{ 'name': 'Breakfast'}, { 'name': 'Breakfast'}],
+    }
+    
+    res = self.client.post(RECIPES_URL, payload, format='json')
+    
+    self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+    recipe = Recipe.objects.get(id=res.data['id'])
+    self.assertEqual(recipe.tags.count(), 1)
+    self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+    
+  def test_update_recipe_ingredients(self):
+    ingredient = Ingredient.objects.create(user=self.user, name='Pepper')
+    recipe = create_recipe(user=self.user)
+    recipe.ingredients.add(ingredient)
+    
+    payload = { 'ingredients': [{ 'name': 'Chili'}] }
+    url = detail_url(recipe.id)
+    res = self.client.patch(url, payload, format='json')
+    
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    new_ingredient = Ingredient.objects.get(user=self.user, name='Chili')
+    self.assertIn(new_ingredient, recipe.ingredients.all())
+    self.assertNotIn(ingredient, recipe.ingredients.all())
+    
+  def test_filter_by_tags_any(self):
+    r1 = create_recipe(user=self.user, title='Thai curry')
+    r2 = create_recipe(user=self.user, title='Tahini salad')
+    r3 = create_recipe(user=self.user, title='Fish and chips')
+    tag1 = Tag.objects.create(user=self.user, name='Vegan')
+    tag2 = Tag.objects.create(user=self.user, name='Vegetarian')
+    r1.tags.add(tag1, tag2)
+    r2.tags.add(tag2)
+    
+    res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+    
+    ids = [r['id'] for r in res.data['results']]
+    self.assertEqual(ids, [r2.id, r1.id])
+    self.assertNotIn(r3.id, ids)
+    
+  def test_filter_by_tags_all(self):
+    r1 = create_recipe(user=self.user, title='Thai curry')
+    r2 = create_recipe(user=self.user, title='Tahini salad')
+    tag1 = Tag.objects.create(user=self.user, name='Vegan')
+    tag2 = Tag.objects.create(user=self.user, name='Vegetarian')
+    r1.tags.add(tag1, tag2)
+    r2.tags.add(tag2)
+    
+    res = self.client.get(
+      RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+    )
+    
+    self.assertEqual([r['id'] for r in res.data['results']], [r1.id])
+    
+  def test_filter_by_ingredients(self):
+    r1 = create_recipe(user=self.user, title='Posh beans on toast')
+    r2 = create_recipe(user=self.user, title='Chicken cacciatore')
+    in1 = Ingredient.objects.create(user=self.user, name='Feta cheese')
+    r1.ingredients.add(in1)
+    
+    res = self.client.get(RECIPES_URL, {'ingredients': f'{in1.id}'})
+    
+    ids = [r['id'] for r in res.data['results']]
+    self.assertIn(r1.id, ids)
+    self.assertNotIn(r2.id, ids)
+    
+  def test_filter_by_price_and_time_range(self):
+    cheap = create_recipe(
+      user=self.user, price=Decimal('2.00'), time_minutes=10
+    )
+    create_recipe(user=self.user, price=Decimal('9.00'), time_minutes=10)
+    create_recipe(user=self.user, price=Decimal('2.50'), time_minutes=90)
+    
+    res = self.client.get(RECIPES_URL, {'price_max': '5.00', 'time_max': 30})
+    
+    self.assertEqual([r['id'] for r in res.data['results']], [cheap.id])
+    
+  def test_filter_rejects_invalid_values(self):
+    res = self.client.get(RECIPES_URL, {'tags': 'a,b'})
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    res = self.client.get(RECIPES_URL, {'price_min': 'cheap'})
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+    
+  def test_filter_rejects_values_out_of_column_range(self):
+    for params in (
+      {'tags': '99999999999999999999999'},
+      {'ingredients': f'1,{2 ** 63}'},
+      {'time_min': '99999999999999999999'},
+      {'time_max': str(-2 ** 31 - 1)},
+      {'price_max': '1000'},
+    ):
+      with self.subTest(params=params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        
+  def test_filter_rejects_non_finite_prices(self):
+    for value in ('NaN', 'sNaN', 'Infinity', '-inf'):
+      with self.subTest(value=value):
+        res = self.client.get(RECIPES_URL, {'price_min': value})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        
+  def test_filter_accepts_column_limits(self):
+    recipe = create_recipe(
+      user=self.user, price=Decimal('999.99'), time_minutes=2 ** 31 - 1
+    )
+    
+    res = self.client.get(
+      RECIPES_URL, {'price_min': '999.99', 'time_min': 2 ** 31 - 1}
+    )
+    
+    self.assertEqual([r['id'] for r in res.data['results']], [recipe.id])
@@ -5,7 +5,8 @@ from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from core.models import Tag
+from core.models import Tag, Recipe
+from decimal import Decimal
 from recipe.serializers import TagSerializer
 
 
@@ -45,7 +46,7 @@ class PrivateTagAPITest(TestCase):
     serializer = TagSerializer(tags, many=True)
     
     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    self.assertEqual(res.data, serializer.data)
+    self.assertEqual(res.data['results'], serializer.data)
     
   def test_tags_limited_to_user(self):
     user2 = create_user(email='user2@example.com', password='test123')
@@ -54,8 +55,8 @@ class PrivateTagAPITest(TestCase):
     
     res = self.client.get(TAGS_URL)
     self.assertEqual(res.status_code, status.HTTP_200_OK)
-    self.assertEqual(len(res.data), 1)
-    self.assertEqual(res.data[0]['id'], tag.id)
+    self.assertEqual(len(res.data['results']), 1)
+    self.assertEqual(res.data['results'][0]['id'], tag.id)
     
   def test_update_tag(self):
     tag = Tag.objects.create(user=self.user,name='Dinner')
@@ -82,4 +83,37 @@ class PrivateTagAPITest(TestCase):
     
     
 
-    
\ No newline at end of file
+  def test_tag_cursor_orders_by_name_then_id(self):
+    for name in ['Vegan', 'Dessert', 'Vegan', 'Breakfast']:
+      Tag.objects.create(user=self.user, name=name)
+      
+    seen = []
+    url = f'{TAGS_URL}?page_size=1'
+    while url:
+      res = self.client.get(url)
+      self.assertEqual(res.status_code, status.HTTP_200_OK)
+      seen.extend(t['id'] for t in res.data['results'])
+      url = res.data['next']
+      
+    expected = Tag.objects.filter(user=self.user).order_by('-name', 'id')
+    self.assertEqual(seen, [t.id for t in expected])
+    
+  def test_filter_tags_assigned_to_recipes(self):
+    tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+    tag2 = Tag.objects.create(user=self.user, name='Lunch')
+    recipe = Recipe.objects.create(
+      title='Green Eggs on Toast',
+      time_minutes=10,
+      price=Decimal('2.50'),
+      user=self.user,
+    )
+    recipe.tags.add(tag1)
+    
+    res = self.client.get(TAGS_URL, {'assigned_only': 1, 'with_counts': 1})
+    
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertEqual(
+      res.data['results'],
+      [{'id': tag1.id, 'name': 'Breakfast', 'recipe_count': 1}],
+    )
+    self.assertNotIn(tag2.id, [t['id'] for t in res.data['results']])
@@ -0,0 +1,212 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files import locks
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeImageUpload
+
+MEDIA_ROOT = tempfile.mkdtemp()
+OCTET_STREAM = 'application/offset+octet-stream'
+
+
+def start_url(recipe_id):
+  return reverse('recipe:recipe-start-upload', args=[recipe_id])
+
+
+def chunk_url(recipe_id, upload_id):
+  return reverse('recipe:recipe-upload-chunk', args=[recipe_id, upload_id])
+
+
+def finish_url(recipe_id, upload_id):
+  return reverse('recipe:recipe-finish-upload', args=[recipe_id, upload_id])
+
+
+def image_bytes():
+  buffer = BytesIO()
+  Image.new('RGB', (300, 200), color=(90, 30, 200)).save(buffer, format='PNG')
+  return buffer.getvalue()
+
+
+@override_settings(
+  MEDIA_ROOT=MEDIA_ROOT,
+  RECIPE_IMAGE_PROCESSING='sync',
+  RECIPE_IMAGE_RENDITION_FORMATS=['jpeg'],
+)
+class ResumableUploadTests(TestCase):
+  @classmethod
+  def tearDownClass(cls):
+    super().tearDownClass()
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+  def setUp(self):
+    self.upload_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.upload_dir, ignore_errors=True)
+    upload_settings = override_settings(RECIPE_UPLOAD_DIR=self.upload_dir)
+    upload_settings.enable()
+    self.addCleanup(upload_settings.disable)
+    self.user = get_user_model().objects.create_user(
+      'resume@example.com', 'test1234'
+    )
+    self.client = APIClient()
+    self.client.force_authenticate(user=self.user)
+    self.recipe = Recipe.objects.create(
+      user=self.user, title='Pie', time_minutes=40, price='6.00'
+    )
+
+  def start(self, data):
+    res = self.client.post(
+      start_url(self.recipe.id),
+      {'filename': 'pie.png', 'size': len(data)},
+      format='json',
+    )
+    self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+    return res.data['id']
+
+  def put_chunk(self, upload_id, offset, chunk):
+    return self.client.put(
+      chunk_url(self.recipe.id, upload_id),
+      chunk,
+      content_type=OCTET_STREAM,
+      HTTP_UPLOAD_OFFSET=str(offset),
+    )
+
+  def test_upload_in_chunks_and_finish(self):
+    data = image_bytes()
+    upload_id = self.start(data)
+    middle = len(data) // 2
+
+    res = self.put_chunk(upload_id, 0, data[:middle])
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.assertEqual(res['Upload-Offset'], str(middle))
+
+    # A client that lost track asks where to resume from
+    res = self.client.get(chunk_url(self.recipe.id, upload_id))
+    self.assertEqual(res.data['offset'], middle)
+
+    self.put_chunk(upload_id, middle, data[middle:])
+    with self.captureOnCommitCallbacks(execute=True):
+      res = self.client.post(finish_url(self.recipe.id, upload_id))
+
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.recipe.refresh_from_db()
+    with self.recipe.images.open('rb') as stored:
+      self.assertEqual(stored.read(), data)
+    self.assertTrue(self.recipe.renditions.exists())
+    self.assertFalse(RecipeImageUpload.objects.exists())
+    self.assertEqual(os.listdir(self.upload_dir), [])
+
+  def test_wrong_offset_conflicts(self):
+    data = image_bytes()
+    upload_id = self.start(data)
+    self.put_chunk(upload_id, 0, data[:10])
+
+    res = self.put_chunk(upload_id, 20, data[20:30])
+
+    self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+    self.assertEqual(res.data['offset'], 10)
+
+  def test_chunk_being_written_conflicts(self):
+    data = image_bytes()
+    upload_id = self.start(data)
+    upload = RecipeImageUpload.objects.get(pk=upload_id)
+
+    with open(upload.path, 'r+b') as part:
+      self.assertTrue(locks.lock(part, locks.LOCK_EX | locks.LOCK_NB))
+      res = self.put_chunk(upload_id, 0, data[:10])
+
+    self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+    self.assertEqual(res.data['offset'], 0)
+    upload.refresh_from_db()
+    self.assertEqual(upload.offset, 0)
+    self.assertEqual(os.path.getsize(upload.path), 0)
+
+  def test_chunk_past_declared_size_rejected(self):
+    upload_id = self.start(b'12345')
+
+    res = self.put_chunk(upload_id, 0, b'123456')
+
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+  def test_finish_incomplete_upload_conflicts(self):
+    data = image_bytes()
+    upload_id = self.start(data)
+    self.put_chunk(upload_id, 0, data[:10])
+
+    res = self.client.post(finish_url(self.recipe.id, upload_id))
+
+    self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+    self.recipe.refresh_from_db()
+    self.assertFalse(self.recipe.images)
+
+  def test_finish_in_progress_conflicts(self):
+    data = image_bytes()
+    upload_id = self.start(data)
+    self.put_chunk(upload_id, 0, data)
+    upload = RecipeImageUpload.objects.get(pk=upload_id)
+
+    with open(upload.path, 'rb') as part:
+      self.assertTrue(locks.lock(part, locks.LOCK_EX | locks.LOCK_NB))
+      res = self.client.post(finish_url(self.recipe.id, upload_id))
+
+    self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+    self.assertEqual(res.data['offset'], len(data))
+    self.assertTrue(RecipeImageUpload.objects.filter(pk=upload_id).exists())
+
+  def test_finish_after_file_removed_not_found(self):
+    data = image_bytes()
+    upload_id = self.start(data)
+    self.put_chunk(upload_id, 0, data)
+    os.remove(RecipeImageUpload.objects.get(pk=upload_id).path)
+
+    res = self.client.post(finish_url(self.recipe.id, upload_id))
+
+    self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+  @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+  def test_start_too_large_rejected(self):
+    res = self.client.post(
+      start_url(self.recipe.id),
+      {'filename': 'big.png', 'size': 101},
+      format='json',
+    )
+    self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+  def test_other_users_recipe_not_found(self):
+    other = get_user_model().objects.create_user(
+      'other@example.com', 'test1234'
+    )
+    recipe = Recipe.objects.create(
+      user=other, title='X', time_minutes=1, price='1.00'
+    )
+
+    res = self.client.post(
+      start_url(recipe.id), {'filename': 'x.png', 'size': 10}, format='json'
+    )
+
+    self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+  def test_cleanup_removes_expired_uploads(self):
+    expired_id = self.start(b'expired')
+    active_id = self.start(b'active')
+    RecipeImageUpload.objects.filter(pk=expired_id).update(
+      expires_at=timezone.now() - timedelta(seconds=1)
+    )
+
+    res = self.client.get(chunk_url(self.recipe.id, expired_id))
+    self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    call_command('cleanup_uploads', stdout=StringIO())
+
+    self.assertEqual(str(RecipeImageUpload.objects.get().pk), active_id)
+    self.assertEqual(os.listdir(self.upload_dir), [f'{active_id}.part'])
@@ -0,0 +1,143 @@
+'''
+Resumable recipe image uploads.
+
+    POST   /recipes/{id}/uploads/                    {"filename", "size"}
+    GET    /recipes/{id}/uploads/{upload}/           current offset
+    PUT    /recipes/{id}/uploads/{upload}/           raw bytes at Upload-Offset
+    POST   /recipes/{id}/uploads/{upload}/finalize/  attach to Recipe.images
+
+Chunks are appended to a file under RECIPE_UPLOAD_DIR straight from the
+request stream, so a dropped connection only loses the chunk in flight.
+The client asks for the offset and carries on from there. Unfinished
+uploads expire after RECIPE_UPLOAD_EXPIRY seconds and are removed by the
+cleanup_uploads command.
+'''
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File, locks
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from core.models import RecipeImageUpload
+
+READ_SIZE = 64 * 1024
+OFFSET_HEADER = 'Upload-Offset'
+
+
+class UploadConflict(APIException):
+  status_code = status.HTTP_409_CONFLICT
+  default_detail = 'Upload offset does not match.'
+  default_code = 'upload_conflict'
+
+  def __init__(self, offset, detail=None):
+    # The current offset tells the client where to resume from
+    super().__init__({'detail': detail or self.default_detail})
+    self.detail['offset'] = offset
+
+
+def create_upload(recipe, filename, size):
+  '''Start an upload of size bytes for recipe'''
+  os.makedirs(settings.RECIPE_UPLOAD_DIR, exist_ok=True)
+  upload = RecipeImageUpload.objects.create(
+    recipe=recipe,
+    filename=os.path.basename(filename),
+    size=size,
+    expires_at=(
+      timezone.now() + timedelta(seconds=settings.RECIPE_UPLOAD_EXPIRY)
+    ),
+  )
+  open(upload.path, 'xb').close()
+  return upload
+
+
+def get_upload(recipe, upload_id):
+  upload = RecipeImageUpload.objects.filter(
+    pk=upload_id, recipe=recipe, expires_at__gt=timezone.now()
+  ).first()
+  if upload is None:
+    raise NotFound('Upload not found or expired.')
+  return upload
+
+
+def parse_offset(value):
+  try:
+    offset = int(value)
+  except (TypeError, ValueError):
+    raise ValidationError({OFFSET_HEADER: 'Must be a non-negative integer'})
+  if offset < 0:
+    raise ValidationError({OFFSET_HEADER: 'Must be a non-negative integer'})
+  return offset
+
+
+def write_chunk(upload, offset, stream, length):
+  '''Append length bytes from stream at offset and return the new offset
+
+  The file is locked for the duration of the write, so two requests for
+  the same upload cannot interleave; the loser gets a 409.
+  '''
+  if length is None:
+    raise ValidationError('Content-Length is required.')
+  if offset + length > upload.size:
+    raise ValidationError('Chunk extends past the declared upload size.')
+
+  try:
+    part = open(upload.path, 'r+b')
+  except FileNotFoundError:
+    raise NotFound('Upload not found or expired.')
+  with part:
+    # A non-blocking lock that is already held returns False, not an error
+    if not locks.lock(part, locks.LOCK_EX | locks.LOCK_NB):
+      raise UploadConflict(upload.offset, 'Another chunk is being written.')
+    upload.refresh_from_db(fields=['offset'])
+    if offset != upload.offset:
+      raise UploadConflict(upload.offset)
+
+    part.seek(offset)
+    part.truncate()
+    remaining = length
+    while remaining:
+      data = stream.read(min(READ_SIZE, remaining))
+      if not data:
+        break
+      part.write(data)
+      remaining -= len(data)
+    part.flush()
+    # Keep whatever arrived before a dropped connection
+    upload.offset = part.tell()
+    RecipeImageUpload.objects.filter(pk=upload.pk).update(offset=upload.offset)
+
+  if remaining:
+    raise ValidationError('Request body ended before Content-Length bytes.')
+  return upload.offset
+
+
+def finalize_upload(upload, save_image):
+  '''Hand the assembled file to save_image and discard the upload
+
+  save_image receives a File and is expected to validate and store it.
+  The file is locked like write_chunk does, so of two racing requests
+  one finishes and the other gets a 409, or a 404 once it's gone.
+  '''
+  if upload.offset != upload.size:
+    raise UploadConflict(upload.offset, 'Upload is incomplete.')
+  try:
+    part = open(upload.path, 'rb')
+  except FileNotFoundError:
+    raise NotFound('Upload not found or expired.')
+  with part:
+    if not locks.lock(part, locks.LOCK_EX | locks.LOCK_NB):
+      raise UploadConflict(upload.offset, 'Upload is in use.')
+    try:
+      # The file may have been finished and removed since it was opened
+      upload.refresh_from_db(fields=['offset'])
+    except RecipeImageUpload.DoesNotExist:
+      raise NotFound('Upload not found or expired.')
+    if upload.offset != upload.size:
+      raise UploadConflict(upload.offset, 'Upload is incomplete.')
+    result = save_image(File(part, name=upload.filename))
+    # The post_delete signal removes the assembled file
+    upload.delete()
+  return result
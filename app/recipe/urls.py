@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from core.async_views import offload_patterns, READ_METHODS
+
 from recipe.views import (
   RecipeViewSet,
   TagViewSet,
@@ -15,5 +17,8 @@ router.register('ingredients', IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-  path('', include(router.urls))
+  # Reads run concurrently in the api-read pool under ASGI
+  path('', include(
+    offload_patterns(router.urls, pool='api-read', methods=READ_METHODS)
+  ))
 ]
\ No newline at end of file
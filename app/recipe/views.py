@@ -1,40 +1,145 @@
+import json
+from functools import partial
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework import mixins, status
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from drf_spectacular.utils import (
+  extend_schema_view,
+  extend_schema,
+  OpenApiParameter,
+)
+from drf_spectacular.types import OpenApiTypes
 
 from core.models import Recipe, Tag, Ingredient
+from core.images import schedule_renditions
+from core.db.router import ReplicaReadMixin
+from user.authentication import TokenUserAuthentication
 from recipe.serializers import (
   RecipeSerializer, 
   RecipeDetailSerializer,
   TagSerializer, 
+  TagCountSerializer,
   IngredientSerializer,
+  IngredientCountSerializer,
   RecipeImageSerializer,
+  RecipeImageUploadSerializer,
+)
+from recipe.query_plans import plan_queryset
+from recipe.cache import CachedResponseMixin
+from recipe.conditional import ConditionalGetMixin, aggregate_state
+from recipe.pagination import (
+  RecipeCursorPagination,
+  RecipeAttrCursorPagination,
+)
+from recipe.filters import (
+  filter_recipes,
+  parse_flag,
+  assigned_only,
+  with_recipe_counts,
+)
+from recipe.export import export_recipes, EXPORT_FORMATS
+from recipe.uploads import (
+  OFFSET_HEADER,
+  create_upload,
+  get_upload,
+  parse_offset,
+  write_chunk,
+  finalize_upload,
+)
+from recipe.bulk import (
+  RecipeImporter,
+  iter_rows,
+  NDJSON_CONTENT_TYPES,
+  JSON_CONTENT_TYPES,
 )
 
 
-class RecipeViewSet(ModelViewSet):
+@extend_schema_view(
+  list=extend_schema(
+    parameters=[
+      OpenApiParameter(
+        'tags', OpenApiTypes.STR, description='Comma separated tag ids'
+      ),
+      OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma separated ingredient ids',
+      ),
+      OpenApiParameter(
+        'match',
+        OpenApiTypes.STR,
+        enum=['any', 'all'],
+        description='Require any or all of the ids',
+      ),
+      OpenApiParameter('price_min', OpenApiTypes.DECIMAL),
+      OpenApiParameter('price_max', OpenApiTypes.DECIMAL),
+      OpenApiParameter('time_min', OpenApiTypes.INT),
+      OpenApiParameter('time_max', OpenApiTypes.INT),
+      OpenApiParameter(
+        'q',
+        OpenApiTypes.STR,
+        description=(
+          'Full-text search over titles, descriptions, tags and ingredients'
+        ),
+      ),
+    ]
+  )
+)
+class RecipeViewSet(
+  ReplicaReadMixin,
+  CachedResponseMixin,
+  ConditionalGetMixin,
+  ModelViewSet
+):
   '''View for managing Recipe APIs'''
   queryset = Recipe.objects.all()
   serializer_class = RecipeDetailSerializer
-  sauthentication_classes = [JWTAuthentication]
+  authentication_classes = [TokenUserAuthentication]
   permission_classes = [IsAuthenticated]
+  pagination_class = RecipeCursorPagination
   lookup_field = 'pk'
   
   def get_queryset(self):
-    return self.queryset.filter(user=self.request.user).order_by('-id')
+    queryset = self.queryset.filter(
+      user_id=self.request.user.id
+    ).order_by('-id')
+    if self.action == 'list':
+      queryset = filter_recipes(queryset, self.request.query_params)
+    return plan_queryset(queryset, self.get_serializer_class())
   
   def get_serializer_class(self):
-    if self.action == 'list':
+    if self.action in ('list', 'bulk'):
       return RecipeSerializer
-    if self.action == 'upload_image':
+    if self.action in ('upload_image', 'finish_upload'):
       return RecipeImageSerializer
+    if self.action in ('start_upload', 'upload_chunk'):
+      return RecipeImageUploadSerializer
     return self.serializer_class
   
+  def list(self, request, *args, **kwargs):
+    return self.cached_response(
+      partial(self.conditional_response, super().list),
+      request,
+      *args,
+      **kwargs
+    )
+  
+  def retrieve(self, request, *args, **kwargs):
+    return self.cached_response(
+      partial(self.conditional_response, super().retrieve),
+      request,
+      *args,
+      **kwargs
+    )
+  
   def perform_create(self, serializer):
-    serializer.save(user=self.request.user)
+    serializer.save(user_id=self.request.user.id)
     
   @action(methods=['POST'], detail=True, url_path='upload-image')
   def upload_image(self, request, *args, **kwargs):
@@ -42,27 +147,193 @@ class RecipeViewSet(ModelViewSet):
     serializer = self.get_serializer(instance, data=request.data)
     serializer.is_valid(raise_exception=True)
     serializer.save()
+    schedule_renditions(instance.id)
     return Response(serializer.data, status=status.HTTP_200_OK)
+  
+  @action(methods=['POST'], detail=True, url_path='uploads')
+  def start_upload(self, request, *args, **kwargs):
+    '''Start a resumable image upload'''
+    recipe = self.get_object()
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    upload = create_upload(
+      recipe,
+      serializer.validated_data['filename'],
+      serializer.validated_data['size'],
+    )
+    return Response(
+      self.get_serializer(upload).data,
+      status=status.HTTP_201_CREATED,
+      headers={OFFSET_HEADER: str(upload.offset)},
+    )
+  
+  @action(
+    methods=['GET', 'PUT'],
+    detail=True,
+    url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)',
+  )
+  def upload_chunk(self, request, upload_id, *args, **kwargs):
+    '''Report the offset to resume from (GET) or append a chunk (PUT)'''
+    upload = get_upload(self.get_object(), upload_id)
+    if request.method == 'PUT':
+      length = request.META.get('CONTENT_LENGTH')
+      write_chunk(
+        upload,
+        parse_offset(request.headers.get(OFFSET_HEADER)),
+        request.stream,
+        int(length) if length else None,
+      )
+    return Response(
+      self.get_serializer(upload).data,
+      headers={OFFSET_HEADER: str(upload.offset)},
+    )
+  
+  @action(
+    methods=['POST'],
+    detail=True,
+    url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)/finalize',
+  )
+  def finish_upload(self, request, upload_id, *args, **kwargs):
+    '''Attach a completed upload to the recipe'''
+    instance = self.get_object()
+    upload = get_upload(instance, upload_id)
+    
+    def save_image(image):
+      serializer = self.get_serializer(instance, data={'images': image})
+      serializer.is_valid(raise_exception=True)
+      serializer.save()
+      return serializer.data
+      
+    data = finalize_upload(upload, save_image)
+    schedule_renditions(instance.id)
+    return Response(data, status=status.HTTP_200_OK)
+  
+  @action(methods=['POST'], detail=False, url_path='bulk')
+  def bulk(self, request, *args, **kwargs):
+    '''Import recipes from a streamed NDJSON or JSON array body'''
+    content_type = request.content_type.split(';')[0].strip()
+    if content_type not in NDJSON_CONTENT_TYPES + JSON_CONTENT_TYPES:
+      raise UnsupportedMediaType(content_type)
+    
+    importer = RecipeImporter(
+      request.user,
+      self.get_serializer_context(),
+      chunk_size=settings.RECIPE_IMPORT_CHUNK_SIZE,
+    )
+    results = importer.run(iter_rows(request.stream, content_type))
+    return StreamingHttpResponse(
+      (json.dumps(result) + '\n' for result in results),
+      content_type='application/x-ndjson',
+    )
+  
+  @action(methods=['GET'], detail=False, url_path='export')
+  def export(self, request, *args, **kwargs):
+    '''Stream all of the user's recipes as NDJSON (default) or CSV'''
+    output = request.query_params.get('output', 'ndjson')
+    if output not in EXPORT_FORMATS:
+      raise ValidationError(
+        {'output': f'Choose one of {", ".join(EXPORT_FORMATS)}'}
+      )
+    
+    queryset = filter_recipes(
+      self.queryset.filter(user_id=request.user.id).order_by('id'),
+      request.query_params,
+    )
+    response = StreamingHttpResponse(
+      export_recipes(
+        queryset,
+        output,
+        self.get_serializer_context(),
+        chunk_size=settings.RECIPE_EXPORT_CHUNK_SIZE,
+      ),
+      content_type=EXPORT_FORMATS[output],
+    )
+    response['Content-Disposition'] = (
+      f'attachment; filename="recipes.{output}"'
+    )
+    return response
     
 
+@extend_schema_view(
+  list=extend_schema(
+    parameters=[
+      OpenApiParameter(
+        'assigned_only',
+        OpenApiTypes.INT,
+        enum=[0, 1],
+        description='Only items assigned to a recipe',
+      ),
+      OpenApiParameter(
+        'with_counts',
+        OpenApiTypes.INT,
+        enum=[0, 1],
+        description='Include the number of recipes per item',
+      ),
+    ]
+  )
+)
 class RecipeBaseAttrViewSet(
+  ReplicaReadMixin,
+  CachedResponseMixin,
+  ConditionalGetMixin,
   mixins.ListModelMixin,
   mixins.UpdateModelMixin,
   mixins.DestroyModelMixin,
   GenericViewSet
 ):
-  authentication_classes = [JWTAuthentication]
+  authentication_classes = [TokenUserAuthentication]
   permission_classes = [IsAuthenticated]
+  pagination_class = RecipeAttrCursorPagination
+  recipe_field = None
+  count_serializer_class = None
 
   def get_queryset(self):
-    return self.queryset.filter(user=self.request.user).order_by('-name')
+    queryset = self.queryset.filter(
+      user_id=self.request.user.id
+    ).order_by('-name', 'id')
+    if self.action == 'list':
+      params = self.request.query_params
+      if parse_flag(params, 'assigned_only'):
+        queryset = assigned_only(queryset, self.recipe_field)
+      if parse_flag(params, 'with_counts'):
+        queryset = with_recipe_counts(queryset, self.recipe_field)
+    return plan_queryset(queryset, self.get_serializer_class())
+  
+  def list(self, request, *args, **kwargs):
+    return self.cached_response(
+      partial(self.conditional_response, super().list),
+      request,
+      *args,
+      **kwargs
+    )
+  
+  def get_conditional_state(self):
+    state = super().get_conditional_state()
+    params = self.request.query_params
+    if (
+      parse_flag(params, 'assigned_only')
+      or parse_flag(params, 'with_counts')
+    ):
+      # Which items are assigned, and how often, changes with the recipes
+      recipes = Recipe.objects.filter(user_id=self.request.user.id)
+      state.append(aggregate_state(recipes))
+    return state
+  
+  def get_serializer_class(self):
+    with_counts = parse_flag(self.request.query_params, 'with_counts')
+    if self.action == 'list' and with_counts:
+      return self.count_serializer_class
+    return self.serializer_class
   
   
 class TagViewSet(RecipeBaseAttrViewSet):
   queryset = Tag.objects.all()
   serializer_class = TagSerializer
+  count_serializer_class = TagCountSerializer
+  recipe_field = 'tags'
 
 class IngredientViewSet(RecipeBaseAttrViewSet):
   queryset = Ingredient.objects.all()
   serializer_class = IngredientSerializer
-  
\ No newline at end of file
+  count_serializer_class = IngredientCountSerializer
+  recipe_field = 'ingredients'
@@ -0,0 +1,147 @@
+'''
+JWT authentication without a user lookup per request.
+
+TokenUserAuthentication builds request.user from the claims in the
+access token (a simplejwt TokenUser carrying id, is_staff and
+is_superuser) instead of loading the User row. Only whether the user is
+still active is read from the database, and that answer is kept in a
+small per-process TTL cache, so a deactivated user is locked out within
+USER_ACTIVE_CACHE_TTL seconds (immediately in the process that saved
+the change).
+
+Both classes here also cache validated tokens. Checking the signature
+and decoding the claims is repeated on every request, and clients
+resend the same access token many times. Validated tokens are kept in a
+bounded LRU keyed by the SHA-256 of the raw token. Each entry is dropped
+when the token expires, so a cached token is never accepted for longer
+than it would have been without the cache.
+
+Views that need the User model itself, like ManageUserView, use
+CachedJWTAuthentication. So do staff-only views: the is_staff claim is
+only as fresh as the token, and access tokens live for a day.
+'''
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+class TTLCache:
+  '''A small thread-safe LRU mapping whose entries expire after ttl seconds'''
+
+  def __init__(self, ttl, max_size):
+    self.ttl = ttl
+    self.max_size = max_size
+    self._data = OrderedDict()
+    self._lock = Lock()
+    self.hits = self.misses = self.evictions = 0
+
+  def get(self, key, default=None):
+    with self._lock:
+      item = self._data.get(key)
+      if item is None:
+        self.misses += 1
+        return default
+      value, expires = item
+      if expires <= time.monotonic():
+        del self._data[key]
+        self.misses += 1
+        return default
+      self._data.move_to_end(key)
+      self.hits += 1
+      return value
+
+  def set(self, key, value, ttl=None):
+    '''Store value for ttl seconds, or the cache's default ttl'''
+    if self.max_size <= 0:
+      return
+    ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+    with self._lock:
+      self._data[key] = (value, time.monotonic() + ttl)
+      self._data.move_to_end(key)
+      while len(self._data) > self.max_size:
+        self._data.popitem(last=False)
+        self.evictions += 1
+
+  def discard(self, key):
+    with self._lock:
+      self._data.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+      self.hits = self.misses = self.evictions = 0
+
+  def stats(self):
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+        'size': len(self._data),
+        'max_size': self.max_size,
+        'hits': self.hits,
+        'misses': self.misses,
+        'evictions': self.evictions,
+        'hit_rate': self.hits / lookups if lookups else 0.0,
+      }
+
+
+active_users = TTLCache(
+  ttl=settings.USER_ACTIVE_CACHE_TTL,
+  max_size=settings.USER_ACTIVE_CACHE_SIZE,
+)
+
+# Entries live until their token's exp claim; ttl only caps that
+validated_tokens = TTLCache(
+  ttl=api_settings.ACCESS_TOKEN_LIFETIME.total_seconds(),
+  max_size=settings.JWT_VALIDATION_CACHE_SIZE,
+)
+
+
+def is_user_active(user_id):
+  '''Return whether user_id exists and is active, cached for a short while'''
+  active = active_users.get(user_id)
+  if active is None:
+    active = bool(
+      get_user_model().objects
+      .filter(**{api_settings.USER_ID_FIELD: user_id, 'is_active': True})
+      .exists()
+    )
+    active_users.set(user_id, active)
+  return active
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+  '''JWTAuthentication that reuses earlier validations of the same token'''
+
+  def get_validated_token(self, raw_token):
+    key = hashlib.sha256(raw_token).digest()
+    token = validated_tokens.get(key)
+    if token is None:
+      token = super().get_validated_token(raw_token)
+      validated_tokens.set(key, token, ttl=token['exp'] - time.time())
+    return token
+
+
+class TokenUserAuthentication(CachedJWTAuthentication):
+  '''JWTAuthentication that trusts the token for who the user is
+
+  Falls back to loading the User row when JWT_TOKEN_USER_MODE is off.
+  '''
+
+  def get_user(self, validated_token):
+    if not settings.JWT_TOKEN_USER_MODE:
+      return super().get_user(validated_token)
+
+    if api_settings.USER_ID_CLAIM not in validated_token:
+      raise InvalidToken('Token contained no recognizable user identification')
+    user = api_settings.TOKEN_USER_CLASS(validated_token)
+    if not is_user_active(user.id):
+      raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
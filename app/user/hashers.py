@@ -0,0 +1,41 @@
+'''
+Password hashers whose cost is read from settings.
+
+The PASSWORD_HASHER setting picks the hasher used for new and upgraded
+hashes: 'argon2', 'bcrypt' or 'pbkdf2'. The others stay in PASSWORD_HASHERS so
+existing hashes keep verifying. Django rehashes a password on the next
+successful login whenever its algorithm or cost differs from the
+preferred hasher, so changing these settings migrates users gradually.
+'''
+from django.conf import settings
+from django.contrib.auth.hashers import (
+  Argon2PasswordHasher,
+  BCryptSHA256PasswordHasher,
+  PBKDF2PasswordHasher,
+)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+  @property
+  def iterations(self):
+    return settings.PBKDF2_ITERATIONS
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+  @property
+  def time_cost(self):
+    return settings.ARGON2_TIME_COST
+
+  @property
+  def memory_cost(self):
+    return settings.ARGON2_MEMORY_COST
+
+  @property
+  def parallelism(self):
+    return settings.ARGON2_PARALLELISM
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+  @property
+  def rounds(self):
+    return settings.BCRYPT_ROUNDS
@@ -37,4 +37,12 @@ class UserSerializer(serializers.ModelSerializer):
     return user
   
 class TokenObtainPairSerializer(JwtTokenObtainPairSerializer):
-  username_field = get_user_model().USERNAME_FIELD
\ No newline at end of file
+  username_field = get_user_model().USERNAME_FIELD
+  
+  @classmethod
+  def get_token(cls, user):
+    # Carried into the access token for TokenUserAuthentication
+    token = super().get_token(user)
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    return token
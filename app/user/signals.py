@@ -0,0 +1,14 @@
+'''
+Drop cached authentication state when a user changes.
+'''
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from user.authentication import active_users
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+  active_users.discard(instance.pk)
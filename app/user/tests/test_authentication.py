@@ -0,0 +1,142 @@
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken
+
+from unittest.mock import patch
+
+from user.authentication import (
+  CachedJWTAuthentication,
+  TokenUserAuthentication,
+  TTLCache,
+  active_users,
+  validated_tokens,
+)
+from user.serializers import TokenObtainPairSerializer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def auth_request(token):
+  return APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+class TokenUserAuthenticationTests(TestCase):
+  def setUp(self):
+    active_users.clear()
+    validated_tokens.clear()
+    self.user = get_user_model().objects.create_user(
+      'token@example.com', 'test1234'
+    )
+    self.token = TokenObtainPairSerializer.get_token(self.user).access_token
+
+  def test_request_user_built_from_token(self):
+    user, _ = TokenUserAuthentication().authenticate(auth_request(self.token))
+
+    self.assertIsInstance(user, TokenUser)
+    self.assertEqual(user.id, self.user.id)
+    self.assertFalse(user.is_staff)
+
+  def test_active_status_is_cached(self):
+    auth = TokenUserAuthentication()
+    auth.authenticate(auth_request(self.token))
+
+    with self.assertNumQueries(0):
+      auth.authenticate(auth_request(self.token))
+
+  def test_deactivated_user_rejected(self):
+    auth = TokenUserAuthentication()
+    auth.authenticate(auth_request(self.token))
+
+    self.user.is_active = False
+    self.user.save()
+
+    with self.assertRaises(AuthenticationFailed):
+      auth.authenticate(auth_request(self.token))
+
+  def test_deleted_user_rejected(self):
+    token = AccessToken.for_user(self.user)
+    self.user.delete()
+
+    with self.assertRaises(AuthenticationFailed):
+      TokenUserAuthentication().authenticate(auth_request(token))
+
+  @override_settings(JWT_TOKEN_USER_MODE=False)
+  def test_model_user_when_mode_off(self):
+    user, _ = TokenUserAuthentication().authenticate(auth_request(self.token))
+
+    self.assertEqual(user, self.user)
+
+  def test_api_works_with_token_user(self):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    res = client.post(RECIPES_URL, {
+      'title': 'Toast', 'time_minutes': 2, 'price': '1.00',
+      'tags': [{'name': 'Breakfast'}],
+    }, format='json')
+    self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    res = client.get(TAGS_URL)
+    self.assertEqual(
+      [tag['name'] for tag in res.data['results']], ['Breakfast']
+    )
+
+
+  def test_validated_token_is_cached(self):
+    auth = CachedJWTAuthentication()
+    auth.authenticate(auth_request(self.token))
+
+    with patch(
+      'rest_framework_simplejwt.authentication.JWTAuthentication'
+      '.get_validated_token'
+    ) as validate:
+      user, token = auth.authenticate(auth_request(self.token))
+
+    validate.assert_not_called()
+    self.assertEqual(user, self.user)
+    self.assertEqual(validated_tokens.stats()['hits'], 1)
+    self.assertEqual(validated_tokens.stats()['hit_rate'], 0.5)
+
+  def test_cached_token_dropped_at_expiry(self):
+    auth = CachedJWTAuthentication()
+    auth.authenticate(auth_request(self.token))
+    remaining = self.token['exp'] - time.time()
+
+    key = hashlib.sha256(str(self.token).encode()).digest()
+    later = time.monotonic() + remaining + 1
+    with patch('user.authentication.time.monotonic', return_value=later):
+      self.assertIsNone(validated_tokens.get(key))
+
+  def test_invalid_token_not_cached(self):
+    with self.assertRaises(InvalidToken):
+      CachedJWTAuthentication().authenticate(auth_request('not-a-token'))
+
+    self.assertEqual(validated_tokens.stats()['size'], 0)
+
+
+class TTLCacheTests(TestCase):
+  def test_entries_expire(self):
+    cache = TTLCache(ttl=0, max_size=10)
+    cache.set(1, True)
+
+    self.assertIsNone(cache.get(1))
+
+  def test_least_recently_used_evicted(self):
+    cache = TTLCache(ttl=60, max_size=2)
+    cache.set(1, True)
+    cache.set(2, True)
+    cache.get(1)
+    cache.set(3, True)
+
+    self.assertEqual(cache.get(1), True)
+    self.assertIsNone(cache.get(2))
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TOKEN_URL = reverse('user:token_obtain_pair')
+
+PBKDF2_FIRST = [
+  'user.hashers.TunedPBKDF2PasswordHasher',
+  'user.hashers.TunedArgon2PasswordHasher',
+]
+ARGON2_FIRST = list(reversed(PBKDF2_FIRST))
+
+
+@override_settings(PASSWORD_HASHERS=PBKDF2_FIRST, PBKDF2_ITERATIONS=1000)
+class PasswordHashingTests(TestCase):
+  def setUp(self):
+    self.client = APIClient()
+    self.user = get_user_model().objects.create_user(
+      'hash@example.com', 'test1234'
+    )
+
+  def login(self):
+    res = self.client.post(
+      TOKEN_URL, {'email': 'hash@example.com', 'password': 'test1234'}
+    )
+    self.assertEqual(res.status_code, status.HTTP_200_OK)
+    self.user.refresh_from_db()
+
+  def test_iterations_come_from_settings(self):
+    self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+  @override_settings(PBKDF2_ITERATIONS=1500)
+  def test_login_upgrades_iterations(self):
+    self.login()
+
+    self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1500$'))
+
+  @override_settings(
+    PASSWORD_HASHERS=ARGON2_FIRST,
+    ARGON2_TIME_COST=1,
+    ARGON2_MEMORY_COST=1024,
+    ARGON2_PARALLELISM=1,
+  )
+  def test_login_rehashes_with_preferred_algorithm(self):
+    self.login()
+
+    self.assertTrue(self.user.password.startswith('argon2$'))
+    self.assertTrue(self.user.check_password('test1234'))
+
+  def test_failed_login_keeps_hash(self):
+    password = self.user.password
+    with self.settings(PBKDF2_ITERATIONS=1500):
+      res = self.client.post(
+        TOKEN_URL, {'email': 'hash@example.com', 'password': 'wrong'}
+      )
+
+    self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+    self.user.refresh_from_db()
+    self.assertEqual(self.user.password, password)
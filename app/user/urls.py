@@ -1,12 +1,26 @@
 from django.urls import path
-from user.views import RegisterUserView, EmailTokenObtainPairView, ManageUserView
-from rest_framework_simplejwt.views import TokenRefreshView
+from user.views import (
+  RegisterUserView,
+  EmailTokenObtainPairView,
+  ThrottledTokenRefreshView,
+  ManageUserView,
+)
+from core.async_views import offload
 
 app_name = 'user'
 
 urlpatterns = [
-  path('create/', RegisterUserView.as_view(), name='create'),
-  path('token/obtain/', EmailTokenObtainPairView.as_view(), name='token_obtain_pair'),
-  path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-  path('me/', ManageUserView.as_view(), name='me'),
+  # These hash passwords, so they get their own threads under ASGI
+  path('create/', offload(RegisterUserView.as_view()), name='create'),
+  path(
+    'token/obtain/',
+    offload(EmailTokenObtainPairView.as_view()),
+    name='token_obtain_pair',
+  ),
+  path(
+    'token/refresh/',
+    ThrottledTokenRefreshView.as_view(),
+    name='token_refresh',
+  ),
+  path('me/', offload(ManageUserView.as_view()), name='me'),
 ]
\ No newline at end of file
@@ -1,22 +1,32 @@
 from rest_framework import generics
 from rest_framework import permissions
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import (
+  TokenObtainPairView, TokenRefreshView
+)
 from user.serializers import UserSerializer, TokenObtainPairSerializer
-from rest_framework_simplejwt import authentication
+from core.throttling import AuthBucketThrottle
+from core.db.router import ReplicaReadMixin
+from user.authentication import CachedJWTAuthentication
 
 # Create your views here.
 #Register View
 class RegisterUserView(generics.CreateAPIView):
   serializer_class = UserSerializer
+  throttle_classes = [AuthBucketThrottle]
   
 #Login View
 class EmailTokenObtainPairView(TokenObtainPairView):
   serializer_class = TokenObtainPairSerializer
+  throttle_classes = [AuthBucketThrottle]
+  
+#Refresh View
+class ThrottledTokenRefreshView(TokenRefreshView):
+  throttle_classes = [AuthBucketThrottle]
   
 #Manage User View
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
   serializer_class = UserSerializer
-  authentication_classes = [authentication.JWTAuthentication]
+  authentication_classes = [CachedJWTAuthentication]
   permission_classes = [permissions.IsAuthenticated]
   
   def get_object(self):